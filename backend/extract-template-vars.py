@@ -4,109 +4,43 @@ Identifica variáveis simples {{ var }} e loops {% for %}
 """
 
 import sys
-import re
 from pathlib import Path
 
-try:
-    from docx import Document
-    from docx.oxml.text.paragraph import CT_P
-    from docx.oxml.table import CT_Tbl
-    from docx.table import _Cell, Table
-    from docx.text.paragraph import Paragraph
-except ImportError:
-    print("ERROR: python-docx não instalado")
-    print("Execute: pip install python-docx")
-    sys.exit(1)
-
-
-def extract_variables_from_text(text):
-    """Extrai variáveis {{ var }} e loops {% for %} do texto"""
-    variables = set()
-    loops = []
-    
-    # Variáveis simples: {{ NOME }}
-    simple_vars = re.findall(r'\{\{\s*([^}]+)\s*\}\}', text)
-    for var in simple_vars:
-        var = var.strip()
-        # Remover filtros (ex: {{ valor|default:"" }})
-        var = var.split('|')[0].strip()
-        variables.add(var)
-    
-    # Loops: {% for item in items %}
-    for_loops = re.findall(r'\{%\s*for\s+(\w+)\s+in\s+(\w+)\s*%\}', text)
-    for item_var, collection_var in for_loops:
-        loops.append({
-            'collection': collection_var,
-            'item': item_var,
-            'variables': set()
-        })
-    
-    # Variáveis dentro de loops: {{ item.campo }}
-    loop_vars = re.findall(r'\{\{\s*(\w+)\.(\w+)\s*\}\}', text)
-    for obj, field in loop_vars:
-        # Adicionar à variável composta
-        variables.add(f"{obj}.{field}")
-        
-        # Se é uma variável de loop, adicionar ao loop correspondente
-        for loop in loops:
-            if obj == loop['item']:
-                loop['variables'].add(field)
-    
-    return variables, loops
+# Motor de introspecção compartilhado com o gerador
+sys.path.insert(0, str(Path(__file__).resolve().parent / 'src' / 'services' / 'python'))
+from template_introspection import introspectar
 
 
 def extract_all_variables(docx_path):
-    """Extrai todas as variáveis do documento"""
+    """
+    Extrai todas as variáveis do documento
+    
+    Corpo, tabelas, caixas de texto, cabeçalhos, rodapés e notas são lidos em uma
+    única passada pelo template_introspection (tags quebradas em vários runs incluídas).
+    """
     print(f"\n{'='*80}")
     print(f"📄 ANALISANDO: {docx_path}")
     print(f"{'='*80}\n")
     
-    doc = Document(docx_path)
-    
-    all_variables = set()
-    all_loops = []
-    
-    # 1. Parágrafos
-    print("🔍 Analisando parágrafos...")
-    for para in doc.paragraphs:
-        if para.text:
-            vars, loops = extract_variables_from_text(para.text)
-            all_variables.update(vars)
-            all_loops.extend(loops)
-    
-    # 2. Tabelas
-    print("🔍 Analisando tabelas...")
-    for table in doc.tables:
-        for row in table.rows:
-            for cell in row.cells:
-                for para in cell.paragraphs:
-                    if para.text:
-                        vars, loops = extract_variables_from_text(para.text)
-                        all_variables.update(vars)
-                        all_loops.extend(loops)
+    print("🔍 Analisando partes do documento...")
+    resultado = introspectar(docx_path, imagens=())
+    for parte in sorted(resultado.partes):
+        print(f"   - {parte}")
     
-    # 3. Cabeçalhos e rodapés
-    print("🔍 Analisando cabeçalhos e rodapés...")
-    for section in doc.sections:
-        # Cabeçalho
-        if section.header:
-            for para in section.header.paragraphs:
-                if para.text:
-                    vars, loops = extract_variables_from_text(para.text)
-                    all_variables.update(vars)
-                    all_loops.extend(loops)
-        
-        # Rodapé
-        if section.footer:
-            for para in section.footer.paragraphs:
-                if para.text:
-                    vars, loops = extract_variables_from_text(para.text)
-                    all_variables.update(vars)
-                    all_loops.extend(loops)
+    all_loops = [
+        {
+            'collection': collection,
+            'item': loop['item'],
+            'variables': set(loop['campos'])
+        }
+        for collection, loop in resultado.loops.items()
+    ]
     
     # Separar variáveis simples de variáveis de loops
-    simple_vars = {v for v in all_variables if '.' not in v}
-    loop_vars = {v for v in all_variables if '.' in v}
+    simple_vars = set(resultado.variaveis_simples)
+    loop_vars = {
+        f"{loop['item']}.{campo}" for loop in all_loops for campo in loop['variables']
+    }
     
     return simple_vars, loop_vars, all_loops
 
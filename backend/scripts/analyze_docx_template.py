@@ -6,122 +6,69 @@ Autor: Sistema de Análise de Templates
 Data: 2025-12-03
 """
 
-import re
 import json
-import zipfile
+import sys
 from pathlib import Path
 from typing import Dict, List, Set
-from collections import defaultdict
+
+# Motor de introspecção compartilhado com o gerador (src/services/python)
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'src' / 'services' / 'python'))
+from template_introspection import IMAGENS_CONHECIDAS, introspectar
+
 
 class TemplateAnalyzer:
     """Analisador de templates DOCX com sintaxe Jinja2"""
     
     def __init__(self, template_path: str):
         self.template_path = Path(template_path)
-        self.document_xml = None
-        
-        # Padrões regex para identificar variáveis
-        self.simple_var_pattern = re.compile(r'\{\{\s*([a-zA-Z_][a-zA-Z0-9_\.]*)\s*\}\}')
-        self.loop_start_pattern = re.compile(r'\{%\s*tr\s+for\s+([a-zA-Z_][a-zA-Z0-9_]*)\s+in\s+([a-zA-Z_][a-zA-Z0-9_]*)\s*%\}')
-        self.loop_var_pattern = re.compile(r'\{\{\s*([a-zA-Z_][a-zA-Z0-9_]*)\.(.*?)\s*\}\}')
+        self.introspeccao = None
         
         # Gráficos conhecidos (imagens a serem geradas)
-        self.known_images = ['grafico_retorno', 'grafico_comparativo', 'grafico_geracao', 'grafico_economia']
+        self.known_images = sorted(IMAGENS_CONHECIDAS)
         
-    def extract_xml(self) -> str:
-        """Extrai o document.xml do arquivo DOCX"""
+    def extract_xml(self):
+        """
+        Lê todas as partes com texto do DOCX (corpo, cabeçalhos, rodapés, notas)
+        
+        A leitura é feita em streaming pelo template_introspection, que junta os runs
+        de cada parágrafo: tags quebradas pelo Word ({{<w:t>nome</w:t>_cliente}})
+        são reconhecidas sem limpar o XML com regex.
+        """
         if not self.template_path.exists():
             raise FileNotFoundError(f"Template não encontrado: {self.template_path}")
         
         try:
-            with zipfile.ZipFile(self.template_path, 'r') as docx_zip:
-                # Ler o document.xml principal
-                with docx_zip.open('word/document.xml') as xml_file:
-                    raw_xml = xml_file.read().decode('utf-8')
-            
-            # Limpar tags XML do Word que quebram as variáveis Jinja2
-            # Problema: Word insere <w:t> tags que podem quebrar {{ variavel }}
-            # Exemplo: {{<w:t>nome</w:t>_<w:t>cliente</w:t>}}
-            
-            # Remove todas as tags XML, mantendo apenas o texto
-            clean_xml = re.sub(r'<w:t[^>]*>', '', raw_xml)
-            clean_xml = re.sub(r'</w:t>', '', clean_xml)
-            clean_xml = re.sub(r'<w:r[^>]*>', '', clean_xml)
-            clean_xml = re.sub(r'</w:r>', '', clean_xml)
-            
-            self.document_xml = clean_xml
-            
-            print(f"✅ XML extraído com sucesso ({len(self.document_xml)} caracteres)")
-            print(f"   (XML limpo para melhor detecção de variáveis)")
-            return self.document_xml
-            
+            self.introspeccao = introspectar(self.template_path, set(self.known_images))
         except Exception as e:
-            raise Exception(f"Erro ao extrair XML do DOCX: {str(e)}")
+            raise Exception(f"Erro ao ler o DOCX: {str(e)}")
+        
+        partes = sorted(self.introspeccao.partes)
+        print(f"✅ Template lido com sucesso ({len(partes)} partes com tags)")
+        for parte in partes:
+            print(f"   - {parte}")
+        return self.introspeccao
+    
+    def _exigir_introspeccao(self):
+        if self.introspeccao is None:
+            raise ValueError("Template não foi lido. Execute extract_xml() primeiro.")
+        return self.introspeccao
     
     def find_simple_variables(self) -> Set[str]:
         """Encontra todas as variáveis simples {{ variavel }}"""
-        if not self.document_xml:
-            raise ValueError("XML não foi extraído. Execute extract_xml() primeiro.")
-        
-        variables = set()
-        matches = self.simple_var_pattern.findall(self.document_xml)
-        
-        for var in matches:
-            # Remover espaços e adicionar
-            clean_var = var.strip()
-            # Ignorar variáveis de loop (com ponto) e imagens
-            if '.' not in clean_var and clean_var not in self.known_images:
-                variables.add(clean_var)
-        
-        return variables
+        return set(self._exigir_introspeccao().variaveis_simples)
     
     def find_dynamic_tables(self) -> Dict[str, List[str]]:
         """Encontra tabelas dinâmicas e suas colunas"""
-        if not self.document_xml:
-            raise ValueError("XML não foi extraído. Execute extract_xml() primeiro.")
-        
-        tables = defaultdict(set)
-        
-        # Encontrar todos os loops
-        loop_matches = self.loop_start_pattern.finditer(self.document_xml)
-        
-        for match in loop_matches:
-            loop_var = match.group(1)  # Variável do loop (ex: 'item')
-            list_name = match.group(2)  # Nome da lista (ex: 'equipamentos')
-            
-            # Encontrar o fim do loop
-            start_pos = match.end()
-            end_pattern = r'\{%\s*tr\s+endfor\s*%\}'
-            end_match = re.search(end_pattern, self.document_xml[start_pos:])
-            
-            if end_match:
-                # Extrair conteúdo entre o início e fim do loop
-                loop_content = self.document_xml[start_pos:start_pos + end_match.start()]
-                
-                # Encontrar todas as propriedades usadas dentro do loop
-                # Padrão: {{ item.propriedade }}
-                property_pattern = re.compile(rf'\{{\{{\s*{loop_var}\.([a-zA-Z_][a-zA-Z0-9_]*)\s*\}}\}}')
-                properties = property_pattern.findall(loop_content)
-                
-                for prop in properties:
-                    tables[list_name].add(prop)
-        
-        # Converter sets para listas ordenadas
-        return {table: sorted(list(columns)) for table, columns in tables.items()}
+        loops = self._exigir_introspeccao().loops
+        return {
+            table: sorted(loop['campos'])
+            for table, loop in sorted(loops.items())
+            if loop['loop'] == 'tr'
+        }
     
     def find_images(self) -> List[str]:
         """Encontra tags de imagens/gráficos"""
-        if not self.document_xml:
-            raise ValueError("XML não foi extraído. Execute extract_xml() primeiro.")
-        
-        images = []
-        
-        for img_name in self.known_images:
-            pattern = rf'\{{\{{\s*{img_name}\s*\}}\}}'
-            if re.search(pattern, self.document_xml):
-                images.append(img_name)
-        
-        return sorted(images)
+        return sorted(self._exigir_introspeccao().imagens)
     
     def analyze(self) -> Dict:
         """Executa análise completa do template"""
@@ -132,8 +79,8 @@ class TemplateAnalyzer:
         print(f"📂 Caminho: {self.template_path}")
         print()
         
-        # Extrair XML
-        print("1️⃣ Extraindo XML do documento...")
+        # Ler partes do documento
+        print("1️⃣ Lendo partes do documento...")
         self.extract_xml()
         print()
         
@@ -0,0 +1,136 @@
+"""
+Microbenchmark da formatação de valores (formatacao.py x cadeias de .replace)
+
+Compara, com timeit, a forma antiga usada no gerador com o módulo formatacao:
+
+- moeda:    f"R$ {v:,.2f}".replace(',', 'X')... x formatacao.moeda (um valor)
+- coluna:   a mesma cadeia célula a célula em uma coluna NumPy x formatar_lote
+- leitura:  .replace('R$', '').replace('.', '').replace(',', '.') x interpretar_numero (um valor)
+- coluna_leitura: a mesma cadeia célula a célula em uma coluna x interpretar_lote
+- fluxo:    formatação completa das 25 linhas da tabela 'fluxo' (cash_flow.formatar_fluxo)
+
+Antes de medir, confere que as duas formas produzem exatamente o mesmo texto para
+valores aleatórios (negativos, centavos e milhões incluídos).
+
+    python scripts/benchmark_formatacao.py
+    python scripts/benchmark_formatacao.py --values 1000 --output bench_formatacao.json
+"""
+
+import argparse
+import json
+import sys
+import timeit
+from pathlib import Path
+
+import numpy as np
+
+DIRETORIO_PYTHON = Path(__file__).resolve().parent.parent / 'src' / 'services' / 'python'
+sys.path.insert(0, str(DIRETORIO_PYTHON))
+
+import cash_flow  # noqa: E402
+from formatacao import formatar_lote, interpretar_lote, interpretar_numero, moeda  # noqa: E402
+
+
+def moeda_antiga(valor):
+    return f"R$ {valor:,.2f}".replace(',', 'X').replace('.', ',').replace('X', '.')
+
+
+def leitura_antiga(texto):
+    return float(texto.replace('R$', '').replace('.', '').replace(',', '.').strip())
+
+
+def formatar_fluxo_antigo(fluxo):
+    """Formatação linha a linha como era feita antes de formatacao.py"""
+    linhas = []
+    for i in range(len(fluxo['eco_ac'])):
+        saldo = fluxo['saldo'][i]
+        linha = {
+            'ano': str(fluxo['ano'][i]),
+            'tar': f"{fluxo['tar'][i]:.2f}".replace('.', ','),
+            'tar_fb': f"{fluxo['tar_fb'][i]:.2f}".replace('.', ','),
+            'en_g': f"{fluxo['en_g'][i]:,.0f}".replace(',', '.'),
+            'en_cons': f"{fluxo['en_cons'][i]:,.0f}".replace(',', '.'),
+            'cred_ac': f"{fluxo['cred_ac'][i]:,.0f}".replace(',', '.'),
+            'fat_s_sol': moeda_antiga(fluxo['fat_s_sol'][i]),
+            'fat_c_sol': moeda_antiga(fluxo['fat_c_sol'][i]),
+            'eco': moeda_antiga(fluxo['eco'][i]),
+            'eco_ac': moeda_antiga(fluxo['eco_ac'][i]),
+            'payback': moeda_antiga(saldo) if saldo > 0 else '-' + moeda_antiga(abs(saldo)),
+            'inves': moeda_antiga(fluxo['investimento'][i]),
+            'mensal': moeda_antiga(fluxo['mensal'][i]),
+        }
+        for chave, indice in (('anoa', 0), ('anob', 4), ('anoc', 9), ('anod', 24)):
+            alcancado = indice < len(fluxo['eco_ac']) and i >= indice
+            linha[chave] = moeda_antiga(fluxo['eco_ac'][indice]) if alcancado else 'R$ 0,00'
+        linhas.append(linha)
+    return linhas
+
+
+def conferir(valores, fluxo):
+    """Garante que a forma nova produz o mesmo texto que a antiga"""
+    antigos = [moeda_antiga(v) for v in valores]
+    assert [moeda(v) for v in valores.tolist()] == antigos, 'moeda difere'
+    assert formatar_lote(valores, 'moeda') == antigos, 'formatar_lote difere'
+    assert [interpretar_numero(t) for t in antigos] == [leitura_antiga(t) for t in antigos], \
+        'interpretar_numero difere'
+    assert interpretar_lote(antigos) == [leitura_antiga(t) for t in antigos], 'interpretar_lote difere'
+    assert cash_flow.formatar_fluxo(fluxo) == formatar_fluxo_antigo(fluxo), 'formatar_fluxo difere'
+
+
+def medir(funcao, repeticoes):
+    """Melhor tempo por chamada em microssegundos"""
+    numero, _ = timeit.Timer(funcao).autorange()
+    return min(timeit.repeat(funcao, number=numero, repeat=repeticoes)) / numero * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Microbenchmark de formatacao.py')
+    parser.add_argument('--values', type=int, default=25, help='Tamanho da coluna (padrão: 25 anos)')
+    parser.add_argument('--repeat', type=int, default=5, help='Repetições do timeit')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help='Arquivo JSON de resultados')
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    valores = np.concatenate([
+        rng.uniform(-50_000, 2_000_000, args.values),
+        [0.0, 0.005, -0.004, 999.995, 1e9 + 0.125],
+    ])
+    coluna = valores[:args.values]
+    textos = [moeda_antiga(v) for v in coluna]
+    escalar = float(coluna[0])
+    fluxo = cash_flow.calcular_fluxo(
+        valor_investimento=32000, economia_mensal=1142.5, tarifa=0.92,
+        producao_mensal=1500, consumo_mensal=1350,
+    )
+
+    conferir(valores, fluxo)
+
+    casos = [
+        ('moeda', lambda: moeda_antiga(escalar), lambda: moeda(escalar)),
+        ('coluna', lambda: [moeda_antiga(v) for v in coluna], lambda: formatar_lote(coluna, 'moeda')),
+        ('leitura', lambda: leitura_antiga(textos[0]), lambda: interpretar_numero(textos[0])),
+        ('coluna_leitura', lambda: [leitura_antiga(t) for t in textos], lambda: interpretar_lote(textos)),
+        ('fluxo', lambda: formatar_fluxo_antigo(fluxo), lambda: cash_flow.formatar_fluxo(fluxo)),
+    ]
+
+    resultados = []
+    print(f"\n{'caso':<14} {'antigo us':>10} {'novo us':>10} {'ganho':>7}")
+    for nome, antigo, novo in casos:
+        tempo_antigo = medir(antigo, args.repeat)
+        tempo_novo = medir(novo, args.repeat)
+        resultados.append({
+            'case': nome,
+            'old_us': round(tempo_antigo, 3),
+            'new_us': round(tempo_novo, 3),
+            'speedup': round(tempo_antigo / tempo_novo, 2),
+        })
+        print(f"{nome:<14} {tempo_antigo:>10.2f} {tempo_novo:>10.2f} {tempo_antigo / tempo_novo:>6.2f}x")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({'values': args.values, 'results': resultados}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,379 @@
+"""
+Benchmark do pipeline de propostas (GeradorPropostaSolar)
+
+Gera templates DOCX sintéticos de tamanho crescente (mais parágrafos, mais tabelas
+{%tr for %} e mais imagens) e payloads dados_cliente sintéticos, e mede três modos:
+
+- cold:  um processo "--production" por proposta (backend sem pool de workers)
+- warm:  um processo "--worker" recebendo jobs em sequência (pool do backend)
+- batch: "--batch" com process pool (regeneração em massa)
+
+Relata propostas/s, percentis de latência (total e por etapa, a partir de "timings"
+no resultado de cada job) e pico de RSS, e grava um JSON para comparar entre commits:
+
+    python scripts/benchmark_propostas.py --output bench_antes.json
+    git checkout outro-commit
+    python scripts/benchmark_propostas.py --output bench_depois.json --compare bench_antes.json
+
+Roda offline em qualquer Linux com as dependências de requirements.txt
+(LibreOffice só é necessário com --pdf).
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+import numpy as np
+from docx import Document
+
+
+DIRETORIO_PYTHON = Path(__file__).resolve().parent.parent / 'src' / 'services' / 'python'
+SCRIPT_GERADOR = DIRETORIO_PYTHON / 'proposal_generator.py'
+
+# Tamanhos dos templates sintéticos
+TAMANHOS = {
+    'pequeno': {'paragrafos': 20, 'tabelas_fluxo': 1, 'tabelas_simulacao': 1, 'imagens': 2},
+    'medio': {'paragrafos': 200, 'tabelas_fluxo': 3, 'tabelas_simulacao': 2, 'imagens': 6},
+    'grande': {'paragrafos': 1000, 'tabelas_fluxo': 8, 'tabelas_simulacao': 4, 'imagens': 12},
+}
+
+MODOS = ('cold', 'warm', 'batch')
+
+PERCENTIS = (50, 90, 99)
+
+# Jobs do modo warm descartados das estatísticas (compilação do template, caches frios)
+JOBS_AQUECIMENTO = 2
+
+# Os modos repetem as mesmas propostas: com o cache de saídas ligado o benchmark mediria
+# acertos do cache. Desligado, a não ser com --output-cache
+MEDIR_CACHE_SAIDAS = False
+
+FRASES = [
+    'Proposta para {{ NOME_CLIENTE }} ({{ CPF_CNPJ_CLIENTE }}), {{ ENDE_CLIENTE }}.',
+    'Investimento de {{ VAL_INVEST }} com economia mensal de {{ VALOR_ECONOMIA }}.',
+    'Sistema de {{ POT_TOTAL }} com {{ NUM_PAINEL }} módulos e produção de {{ PRODU_MEDIA }}.',
+    'Consumo médio atual de {{ CONSU_MEDIO }}; conta atual {{ VALOR_CONTA_ATUAL }}.',
+    'Garantias: painéis {{ GARAN_PAINEL }}, inversor {{ GARAN_INVER }}, estrutura {{ GARAN_ESTRU }}.',
+    'Vendedor responsável: {{ NOME_VENDEDOR }} - {{ EMAIL_VENDEDOR }} - {{ CELULAR_VENDEDOR }}.',
+    'Texto institucional sem variáveis, presente em todo template real de proposta.',
+]
+
+COLUNAS_FLUXO = ['ano', 'tar', 'en_g', 'en_cons', 'fat_s_sol', 'fat_c_sol', 'eco', 'eco_ac', 'payback']
+
+
+def criar_template(caminho, paragrafos, tabelas_fluxo, tabelas_simulacao, imagens):
+    """Cria um template DOCX sintético com a sintaxe usada nos templates reais"""
+    doc = Document()
+    doc.sections[0].header.paragraphs[0].text = 'Proposta {{ NOME_EMPRESA_DOC }} - {{ VALID_PROP }}'
+    doc.add_heading('Proposta Comercial - Energia Solar', level=1)
+
+    blocos = max(tabelas_fluxo, tabelas_simulacao, imagens, 1)
+    por_bloco = max(paragrafos // blocos, 1)
+
+    for bloco in range(blocos):
+        for i in range(por_bloco):
+            doc.add_paragraph(FRASES[(bloco * por_bloco + i) % len(FRASES)])
+
+        if bloco < tabelas_fluxo:
+            tabela = doc.add_table(rows=3, cols=len(COLUNAS_FLUXO))
+            tabela.cell(0, 0).text = '{%tr for f in fluxo %}'
+            for coluna, campo in enumerate(COLUNAS_FLUXO):
+                tabela.cell(1, coluna).text = '{{ f.%s }}' % campo
+            tabela.cell(2, 0).text = '{%tr endfor %}'
+
+        if bloco < tabelas_simulacao:
+            tabela = doc.add_table(rows=3, cols=3)
+            tabela.cell(0, 0).text = '{%tr for s in simulacao %}'
+            tabela.cell(1, 0).text = '{{ s.banco }}'
+            tabela.cell(1, 1).text = '{{ s.parcelas }}'
+            tabela.cell(1, 2).text = '{{ s.valor }}'
+            tabela.cell(2, 0).text = '{%tr endfor %}'
+
+        if bloco < imagens:
+            grafico = 'grafico_comparativo' if bloco % 2 == 0 else 'grafico_retorno'
+            doc.add_paragraph('{{ %s }}' % grafico)
+
+    doc.save(caminho)
+    return caminho
+
+
+def dados_sinteticos(rng, indice):
+    """Payload dados_cliente plausível e variado (séries diferentes -> gráficos diferentes)"""
+    consumo = rng.randrange(300, 5000, 10)
+    producao = int(consumo * rng.uniform(0.9, 1.3))
+    investimento = round(producao * rng.uniform(18, 26), 2)
+    return {
+        'nome': f'Cliente Sintético {indice}',
+        'doc': f'{rng.randrange(10**10, 10**11):011d}',
+        'email': f'cliente{indice}@exemplo.com',
+        'telefone': '(11) 90000-0000',
+        'endereco': f'Rua Benchmark, {indice} - São Paulo/SP',
+        'empresa': 'Solar Benchmark',
+        'vendedor': 'Vendedor Teste',
+        'valor_investimento': investimento,
+        'consumo_medio': str(consumo),
+        'producao_media': str(producao),
+        'tarifa': round(rng.uniform(0.75, 1.1), 2),
+        'economia_mensal': round(consumo * rng.uniform(0.7, 0.95), 2),
+        'potencia': f'{producao / 120:.1f} kWp',
+        'num_paineis': str(max(producao // 60, 4)),
+        'simulacoes': [
+            {'banco': banco, 'parcelas': f'{n}x', 'valor': f'R$ {investimento / n * 1.2:,.2f}'}
+            for banco, n in (('Santander', 24), ('BV Financeira', 36), ('Banco do Brasil', 48))
+        ],
+    }
+
+
+def percentis(valores):
+    if not valores:
+        return None
+    resultado = {f'p{p}': round(float(v), 2) for p, v in zip(PERCENTIS, np.percentile(valores, PERCENTIS))}
+    resultado['mean'] = round(float(np.mean(valores)), 2)
+    return resultado
+
+
+def _ambiente():
+    ambiente = {**os.environ, 'PYTHONIOENCODING': 'utf-8'}
+    if not MEDIR_CACHE_SAIDAS:
+        ambiente['PROPOSAL_OUTPUT_CACHE_MB'] = '0'
+    return ambiente
+
+
+def _eventos_terminais(saida):
+    for linha in saida.splitlines():
+        linha = linha.strip()
+        if linha.startswith('{'):
+            evento = json.loads(linha)
+            if evento.get('event') in ('result', 'error'):
+                yield evento
+
+
+def _montar_jobs(template, quantidade, diretorio, seed, pdf):
+    rng = random.Random(seed)
+    jobs = []
+    for i in range(quantidade):
+        job = {
+            'id': f'job{i}',
+            'template_path': str(template),
+            'output_path': str(Path(diretorio) / f'saida_{i}.docx'),
+            'dados_cliente': dados_sinteticos(rng, i),
+        }
+        if pdf:
+            job['pdf_path'] = str(Path(diretorio) / f'saida_{i}.pdf')
+        jobs.append(job)
+    return jobs
+
+
+def medir_cold(jobs):
+    """Um interpretador novo por proposta"""
+    latencias, resultados = [], []
+    inicio = time.perf_counter()
+    for job in jobs:
+        t0 = time.perf_counter()
+        processo = subprocess.run(
+            [sys.executable, '-u', str(SCRIPT_GERADOR), '--production'],
+            input=json.dumps(job), capture_output=True, text=True,
+            cwd=DIRETORIO_PYTHON, env=_ambiente(),
+        )
+        latencias.append((time.perf_counter() - t0) * 1000)
+        resultados.extend(_eventos_terminais(processo.stdout))
+    return latencias, resultados, time.perf_counter() - inicio, {}
+
+
+def medir_warm(jobs):
+    """Um worker persistente recebendo os jobs em sequência"""
+    t0 = time.perf_counter()
+    processo = subprocess.Popen(
+        [sys.executable, '-u', str(SCRIPT_GERADOR), '--worker'],
+        stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+        text=True, cwd=DIRETORIO_PYTHON, env=_ambiente(),
+    )
+    try:
+        for linha in processo.stdout:
+            if json.loads(linha).get('event') == 'ready':
+                break
+        extras = {'startup_ms': round((time.perf_counter() - t0) * 1000, 2)}
+
+        latencias, resultados = [], []
+        inicio = None
+        for i, job in enumerate(jobs):
+            if i == JOBS_AQUECIMENTO:
+                inicio = time.perf_counter()
+            t_job = time.perf_counter()
+            processo.stdin.write(json.dumps(job) + '\n')
+            processo.stdin.flush()
+            for linha in processo.stdout:
+                evento = json.loads(linha)
+                if evento.get('event') in ('result', 'error') and evento.get('job_id') == job['id']:
+                    break
+            latencia = (time.perf_counter() - t_job) * 1000
+            if i < JOBS_AQUECIMENTO:
+                extras.setdefault('warmup_ms', []).append(round(latencia, 2))
+            else:
+                latencias.append(latencia)
+                resultados.append(evento)
+        duracao = time.perf_counter() - inicio if inicio else 0.0
+    finally:
+        processo.stdin.close()
+        processo.wait(timeout=30)
+    return latencias, resultados, duracao, extras
+
+
+def medir_batch(jobs, workers=None):
+    """Modo --batch (process pool); latência por job vem de timings.total_ms"""
+    entrada = {'jobs': jobs}
+    if workers:
+        entrada['workers'] = workers
+    inicio = time.perf_counter()
+    processo = subprocess.run(
+        [sys.executable, '-u', str(SCRIPT_GERADOR), '--batch'],
+        input=json.dumps(entrada), capture_output=True, text=True,
+        cwd=DIRETORIO_PYTHON, env=_ambiente(),
+    )
+    duracao = time.perf_counter() - inicio
+    resultados = list(_eventos_terminais(processo.stdout))
+    latencias = [r['timings']['total_ms'] for r in resultados if 'timings' in r]
+    return latencias, resultados, duracao, {'workers': workers or os.cpu_count()}
+
+
+def resumir(modo, tamanho, latencias, resultados, duracao, extras):
+    etapas = {}
+    for resultado in resultados:
+        for etapa, ms in resultado.get('timings', {}).get('stages_ms', {}).items():
+            etapas.setdefault(etapa, []).append(ms)
+    rss = [r['timings']['peak_rss_mb'] for r in resultados
+           if r.get('timings', {}).get('peak_rss_mb') is not None]
+    erros = [r.get('error') for r in resultados if not r.get('success')]
+
+    return {
+        'mode': modo,
+        'template': tamanho,
+        'jobs': len(resultados),
+        'errors': len(erros),
+        'first_error': erros[0] if erros else None,
+        'duration_s': round(duracao, 3),
+        'proposals_per_s': round(len(latencias) / duracao, 3) if duracao else None,
+        'latency_ms': percentis(latencias),
+        'stages_ms': {etapa: percentis(valores) for etapa, valores in etapas.items()},
+        'peak_rss_mb': max(rss) if rss else None,
+        **extras,
+    }
+
+
+def metadados():
+    try:
+        commit = subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+            cwd=DIRETORIO_PYTHON,
+        ).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        'commit': commit,
+        'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'output_cache': MEDIR_CACHE_SAIDAS,
+    }
+
+
+def imprimir(resultados, anterior=None):
+    referencia = {}
+    if anterior:
+        referencia = {(r['mode'], r['template']): r for r in anterior.get('results', [])}
+
+    print(f"\n{'modo':<6} {'template':<8} {'jobs':>4} {'prop/s':>8} {'p50 ms':>9} "
+          f"{'p90 ms':>9} {'p99 ms':>9} {'RSS MB':>7}  {'vs. anterior':<20}")
+    for r in resultados:
+        lat = r['latency_ms'] or {}
+        comparacao = ''
+        antigo = referencia.get((r['mode'], r['template']))
+        if antigo and antigo.get('proposals_per_s') and r['proposals_per_s']:
+            delta = (r['proposals_per_s'] / antigo['proposals_per_s'] - 1) * 100
+            comparacao = f'{delta:+.1f}% prop/s'
+        print(f"{r['mode']:<6} {r['template']:<8} {r['jobs']:>4} "
+              f"{r['proposals_per_s'] or 0:>8.2f} {lat.get('p50', 0):>9.1f} "
+              f"{lat.get('p90', 0):>9.1f} {lat.get('p99', 0):>9.1f} "
+              f"{r['peak_rss_mb'] or 0:>7.1f}  {comparacao:<20}")
+        if r['errors']:
+            print(f"       {r['errors']} erro(s): {r['first_error']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark do gerador de propostas')
+    parser.add_argument('--sizes', default=','.join(TAMANHOS),
+                        help=f'Tamanhos de template ({", ".join(TAMANHOS)})')
+    parser.add_argument('--modes', default=','.join(MODOS), help=f'Modos ({", ".join(MODOS)})')
+    parser.add_argument('--jobs', type=int, default=20, help='Propostas por medição (warm/batch)')
+    parser.add_argument('--cold-jobs', type=int, default=3, help='Propostas no modo cold')
+    parser.add_argument('--workers', type=int, default=None, help='Processos do modo batch')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--pdf', action='store_true', help='Incluir conversão para PDF')
+    parser.add_argument('--output', help='Arquivo JSON de resultados')
+    parser.add_argument('--compare', help='JSON de uma execução anterior para comparar')
+    parser.add_argument('--keep', action='store_true', help='Manter templates e saídas gerados')
+    parser.add_argument('--output-cache', action='store_true',
+                        help='Manter o cache de saídas (PROPOSAL_OUTPUT_CACHE_MB) ligado')
+    args = parser.parse_args()
+
+    global MEDIR_CACHE_SAIDAS
+    MEDIR_CACHE_SAIDAS = args.output_cache
+
+    tamanhos = [t for t in args.sizes.split(',') if t]
+    modos = [m for m in args.modes.split(',') if m]
+    for valor, validos in ((tamanhos, TAMANHOS), (modos, MODOS)):
+        invalidos = set(valor) - set(validos)
+        if invalidos:
+            parser.error(f'Valores inválidos: {", ".join(sorted(invalidos))}')
+
+    diretorio = Path(tempfile.mkdtemp(prefix='bench_propostas_'))
+    resultados = []
+    try:
+        for tamanho in tamanhos:
+            template = criar_template(diretorio / f'template_{tamanho}.docx', **TAMANHOS[tamanho])
+            for modo in modos:
+                print(f'[bench] {modo} / {tamanho}...', file=sys.stderr, flush=True)
+                saida = diretorio / f'{modo}_{tamanho}'
+                saida.mkdir()
+                if modo == 'cold':
+                    medicao = medir_cold(_montar_jobs(template, args.cold_jobs, saida, args.seed, args.pdf))
+                elif modo == 'warm':
+                    medicao = medir_warm(_montar_jobs(
+                        template, args.jobs + JOBS_AQUECIMENTO, saida, args.seed, args.pdf))
+                else:
+                    medicao = medir_batch(
+                        _montar_jobs(template, args.jobs, saida, args.seed, args.pdf), args.workers)
+                resultados.append(resumir(modo, tamanho, *medicao))
+    finally:
+        if args.keep:
+            print(f'[bench] Arquivos mantidos em {diretorio}', file=sys.stderr)
+        else:
+            shutil.rmtree(diretorio, ignore_errors=True)
+
+    anterior = None
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            anterior = json.load(f)
+
+    imprimir(resultados, anterior)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({'meta': metadados(), 'results': resultados}, f, indent=2, ensure_ascii=False)
+        print(f'\nResultados gravados em {args.output}')
+
+    return 0 if all(r['errors'] == 0 for r in resultados) else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
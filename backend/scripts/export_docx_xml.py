@@ -3,12 +3,19 @@ Script auxiliar: Exporta o XML limpo do DOCX para inspeção manual
 Útil para verificar se há variáveis simples {{ }} que não foram detectadas
 """
 
-import re
-import zipfile
+import sys
 from pathlib import Path
 
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'src' / 'services' / 'python'))
+from template_introspection import introspectar, texto_paragrafos
+
 def export_clean_xml(template_path: str, output_path: str = None):
-    """Exporta o XML limpo do DOCX para um arquivo de texto"""
+    """
+    Exporta o texto de cada parágrafo do DOCX (runs já reunidos) para um arquivo de texto
+    
+    Inclui cabeçalhos, rodapés e notas, separados por parte. A leitura é em streaming,
+    então templates grandes não são carregados inteiros na memória.
+    """
     
     template_path = Path(template_path)
     
@@ -21,31 +28,26 @@ def export_clean_xml(template_path: str, output_path: str = None):
     
     print(f"📄 Lendo: {template_path.name}")
     
-    # Extrair XML
-    with zipfile.ZipFile(template_path, 'r') as docx_zip:
-        with docx_zip.open('word/document.xml') as xml_file:
-            raw_xml = xml_file.read().decode('utf-8')
-    
-    # Limpar tags do Word
-    clean_xml = re.sub(r'<w:t[^>]*>', '', raw_xml)
-    clean_xml = re.sub(r'</w:t>', '', clean_xml)
-    clean_xml = re.sub(r'<w:r[^>]*>', '', clean_xml)
-    clean_xml = re.sub(r'</w:r>', '', clean_xml)
-    
-    # Salvar
+    # Texto por parágrafo, agrupado por parte do pacote
+    tamanho = 0
+    parte_atual = None
     with open(output_path, 'w', encoding='utf-8') as f:
-        f.write(clean_xml)
-    
-    print(f"✅ XML limpo salvo em: {output_path}")
-    print(f"📊 Tamanho: {len(clean_xml):,} caracteres")
-    
-    # Buscar variáveis simples manualmente
-    simple_vars = re.findall(r'\{\{\s*([a-zA-Z_][a-zA-Z0-9_]*)\s*\}\}', clean_xml)
+        for parte, texto in texto_paragrafos(template_path):
+            if parte != parte_atual:
+                f.write(f"{'' if parte_atual is None else chr(10)}===== {parte} =====\n")
+                parte_atual = parte
+            f.write(texto + '\n')
+            tamanho += len(texto) + 1
+    
+    print(f"✅ Texto limpo salvo em: {output_path}")
+    print(f"📊 Tamanho: {tamanho:,} caracteres")
+    
+    # Variáveis simples detectadas pelo motor de introspecção
+    simple_vars = introspectar(template_path).variaveis_simples
     if simple_vars:
         print(f"\n🔍 Possíveis variáveis simples encontradas:")
-        for var in sorted(set(simple_vars)):
-            if '.' not in var:  # Ignorar variáveis de loop
-                print(f"   - {var}")
+        for var in simple_vars:
+            print(f"   - {var}")
     else:
         print("\n⚠️  Nenhuma variável simples {{ }} detectada")
         print("   Isso é normal se todas as variáveis estão dentro de loops")
@@ -33,6 +33,15 @@ export const JWT_COOKIE_DOMAIN = process.env.JWT_COOKIE_DOMAIN || undefined;
 
 export const DOCS_BUCKET = process.env.DOCS_BUCKET || "documents";
 
+// Pool de workers Python (gerador de propostas)
+export const PYTHON_WORKER_POOL_SIZE = Number(process.env.PYTHON_WORKER_POOL_SIZE || 2);
+export const PYTHON_WORKER_MAX_JOBS = Number(process.env.PYTHON_WORKER_MAX_JOBS || 200);
+export const PYTHON_WORKER_PIPELINE = Number(process.env.PYTHON_WORKER_PIPELINE || 1);
+export const PYTHON_STAGE_TIMEOUT_MS = Number(process.env.PYTHON_STAGE_TIMEOUT_MS || 60_000);
+export const PYTHON_QUEUE_TIMEOUT_MS = Number(process.env.PYTHON_QUEUE_TIMEOUT_MS || 300_000);
+// Servidor de jobs Python compartilhado por host (python/job_server.py); vazio = pool local
+export const PYTHON_JOB_SERVER_SOCKET = process.env.PYTHON_JOB_SERVER_SOCKET || "";
+
 export const ENCRYPTION_KEY = process.env.ENCRYPTION_KEY || "";
 
 // URL do frontend para redirects (onboarding, etc)
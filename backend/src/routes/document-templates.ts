@@ -14,7 +14,13 @@ import {
   downloadGeneratedDocument,
 } from "../services/document-generator.service.js";
 import { getAvailableVariables } from "../services/document-variables.service.js";
-import { generateSolarProposal } from "../services/python-generator.service.js";
+import {
+  generateSolarProposal,
+  extractTemplateSchema,
+  uploadTemplateSchema,
+  downloadTemplateSchema,
+  templateSchemaPath,
+} from "../services/python-generator.service.js";
 import { mapDatabaseToPython, validateProposalData } from "../services/python-data-mapper.service.js";
 
 const upload = multer({ storage: multer.memoryStorage(), limits: { fileSize: 10 * 1024 * 1024 } });
@@ -171,6 +177,18 @@ export function registerDocumentTemplateRoutes(app: express.Application) {
           return res.status(500).json({ error: `Erro ao fazer upload: ${uploadError.message}` });
         }
 
+        // Schema das variáveis: calculado uma vez por versão do template e salvo ao lado dele
+        // (falha não impede o upload: a geração funciona sem schema)
+        if (generatorType === 'python_solar') {
+          const schemaResult = await extractTemplateSchema(file.buffer);
+          const schemaUpload = schemaResult.schema
+            ? await uploadTemplateSchema(templatePath, schemaResult.schema)
+            : schemaResult;
+          if (!schemaUpload.success) {
+            console.warn("[TemplateUpload] Schema não gerado:", schemaUpload.error);
+          }
+        }
+
         // Se for default, remover default dos outros templates do mesmo tipo
         if (isDefault) {
           await supabaseAdmin
@@ -203,7 +221,9 @@ export function registerDocumentTemplateRoutes(app: express.Application) {
 
         if (insertError) {
           // Tentar deletar o arquivo do storage
-          await supabaseAdmin.storage.from(DOCS_BUCKET).remove([templatePath]);
+          await supabaseAdmin.storage
+            .from(DOCS_BUCKET)
+            .remove([templatePath, templateSchemaPath(templatePath)]);
           return res.status(500).json({ error: insertError.message });
         }
 
@@ -308,7 +328,9 @@ export function registerDocumentTemplateRoutes(app: express.Application) {
       }
 
       // Deletar arquivo do storage
-      await supabaseAdmin.storage.from(DOCS_BUCKET).remove([template.template_path]);
+      await supabaseAdmin.storage
+        .from(DOCS_BUCKET)
+        .remove([template.template_path, templateSchemaPath(template.template_path)]);
 
       // Deletar registro do banco
       const { error: deleteError } = await supabaseAdmin
@@ -413,8 +435,9 @@ export function registerDocumentTemplateRoutes(app: express.Application) {
           seller: sellerRes.data,
         });
 
-        // Validar dados mínimos
-        const validation = validateProposalData(pythonData);
+        // Validar dados mínimos (pelo schema do template, quando existir)
+        const schema = await downloadTemplateSchema(template.template_path);
+        const validation = validateProposalData(pythonData, schema);
         if (!validation.valid) {
           return res.status(400).json({
             error: "Dados insuficientes para gerar proposta",
@@ -437,11 +460,17 @@ export function registerDocumentTemplateRoutes(app: express.Application) {
           template.template_path,
           outputStoragePath,
           pythonData,
-          shouldConvertToPdf
+          shouldConvertToPdf,
+          schema
         );
 
         if (!result.success) {
           console.error("[DocGen] Falha na geração:", result.error);
+          // Servidor de jobs Python com fila cheia: o cliente pode tentar de novo
+          if (result.status === 429) {
+            if (result.retryAfter) res.set("Retry-After", String(result.retryAfter));
+            return res.status(429).json({ error: result.error });
+          }
           return res.status(500).json({ error: result.error });
         }
 
@@ -649,8 +678,9 @@ export function registerDocumentTemplateRoutes(app: express.Application) {
 
       console.log("[SolarGen] Dados mapeados:", Object.keys(pythonData));
 
-      // Validar dados mínimos
-      const validation = validateProposalData(pythonData);
+      // Validar dados mínimos (pelo schema do template, quando existir)
+      const schema = await downloadTemplateSchema(template.template_path);
+      const validation = validateProposalData(pythonData, schema);
       if (!validation.valid) {
         return res.status(400).json({
           error: "Dados insuficientes para gerar proposta",
@@ -673,11 +703,17 @@ export function registerDocumentTemplateRoutes(app: express.Application) {
         template.template_path,
         outputStoragePath,
         pythonData,
-        shouldConvertToPdf
+        shouldConvertToPdf,
+        schema
       );
 
       if (!result.success) {
         console.error("[SolarGen] Falha na geração:", result.error);
+        // Servidor de jobs Python com fila cheia: o cliente pode tentar de novo
+        if (result.status === 429) {
+          if (result.retryAfter) res.set("Retry-After", String(result.retryAfter));
+          return res.status(429).json({ error: result.error });
+        }
         return res.status(500).json({ error: result.error });
       }
 
@@ -340,6 +340,13 @@ export function getAvailableVariables(): Array<{ key: string; description: strin
     { key: "MES_PAYBACK", description: "Payback em meses", category: "Solar" },
     { key: "TIR", description: "Taxa Interna de Retorno", category: "Solar" },
     { key: "VPL", description: "Valor Presente Líquido", category: "Solar" },
+    { key: "PAYBACK_P10", description: "Payback otimista (P10 da simulação: 10% dos cenários pagam antes)", category: "Solar" },
+    { key: "PAYBACK_P50", description: "Payback mediano (P50 da simulação)", category: "Solar" },
+    { key: "PAYBACK_P90", description: "Payback pessimista (P90 da simulação: 90% dos cenários pagam antes)", category: "Solar" },
+    { key: "ECONOMIA_25_P10", description: "Economia em 25 anos pessimista (P10 da simulação)", category: "Solar" },
+    { key: "ECONOMIA_25_P50", description: "Economia em 25 anos mediana (P50 da simulação)", category: "Solar" },
+    { key: "ECONOMIA_25_P90", description: "Economia em 25 anos otimista (P90 da simulação)", category: "Solar" },
+    { key: "CHANCE_PAYBACK", description: "Chance de pagar o investimento em 25 anos", category: "Solar" },
 
     // Pagamento
     { key: "CONDICAO_PAGAMENTO", description: "Condição de pagamento", category: "Pagamento" },
@@ -2,7 +2,7 @@
  * Mapeamento de dados do banco para formato do gerador Python
  */
 
-import { PythonGeneratorData } from "./python-generator.service.js";
+import { PythonGeneratorData, TemplateSchema } from "./python-generator.service.js";
 
 export interface DatabaseData {
   company?: any;
@@ -165,22 +165,46 @@ export function mapDatabaseToPython(data: DatabaseData): PythonGeneratorData {
   };
 }
 
+/**
+ * Campos mínimos e as variáveis do template que dependem de cada um
+ * (ver contexto montado em python/proposal_generator.py)
+ */
+const REQUIRED_FIELDS: Array<{
+  field: keyof PythonGeneratorData;
+  label: string;
+  templateKeys: string[];
+}> = [
+  { field: "nome", label: "Nome do cliente", templateKeys: ["NOME_CLIENTE"] },
+  {
+    field: "valor_investimento",
+    label: "Valor do investimento",
+    templateKeys: [
+      "VAL_INVEST", "inves", "mensal", "fluxo", "rentabilidade", "grafico_retorno",
+      "ano_1", "ano_5", "ano_10", "ano_25", "anoa", "anob", "anoc", "anod",
+      "PAYBACK_P10", "PAYBACK_P50", "PAYBACK_P90", "ECONOMIA_25_P10", "ECONOMIA_25_P50",
+      "ECONOMIA_25_P90", "CHANCE_PAYBACK", "ANO_PAYBACK", "MES_PAYBACK", "PERC_RETORNO",
+      "TIR", "VPL", "LCOE",
+    ],
+  },
+  { field: "empresa", label: "Nome da empresa", templateKeys: ["NOME_EMPRESA_DOC"] },
+];
+
 /**
  * Valida se os dados mínimos necessários estão presentes
+ * @param schema Schema do template: só exige os campos que o template realmente usa
  */
 export function validateProposalData(
-  data: PythonGeneratorData
+  data: PythonGeneratorData,
+  schema?: TemplateSchema | null
 ): { valid: boolean; missing: string[] } {
-  const required = [
-    { field: "nome", label: "Nome do cliente" },
-    { field: "valor_investimento", label: "Valor do investimento" },
-    { field: "empresa", label: "Nome da empresa" },
-  ];
-
+  const usedKeys = schema ? new Set(schema.root_keys) : null;
   const missing: string[] = [];
 
-  for (const req of required) {
-    const value = data[req.field as keyof PythonGeneratorData];
+  for (const req of REQUIRED_FIELDS) {
+    if (usedKeys && !req.templateKeys.some((key) => usedKeys.has(key))) {
+      continue;
+    }
+    const value = data[req.field];
     if (!value || value === "" || value === 0) {
       missing.push(req.label);
     }
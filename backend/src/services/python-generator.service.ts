@@ -3,12 +3,22 @@
  * Chama proposal_generator.py com dados do sistema
  */
 
-import { spawn } from "child_process";
+import { spawn, type ChildProcessWithoutNullStreams } from "child_process";
+import { randomUUID } from "crypto";
+import net from "net";
 import path from "path";
 import fs from "fs";
 import { fileURLToPath } from "url";
 import { supabaseAdmin } from "../lib/supabase.js";
-import { DOCS_BUCKET } from "../config/env.js";
+import {
+  DOCS_BUCKET,
+  PYTHON_WORKER_POOL_SIZE,
+  PYTHON_WORKER_MAX_JOBS,
+  PYTHON_WORKER_PIPELINE,
+  PYTHON_STAGE_TIMEOUT_MS,
+  PYTHON_QUEUE_TIMEOUT_MS,
+  PYTHON_JOB_SERVER_SOCKET,
+} from "../config/env.js";
 
 const __filename = fileURLToPath(import.meta.url);
 const __dirname = path.dirname(__filename);
@@ -44,6 +54,7 @@ export interface PythonGeneratorData {
   producao_media?: string;
   consumo_medio?: string;
   tarifa?: string;
+  /** Não usado pelo gerador: ANO_PAYBACK/PERC_RETORNO são calculados do fluxo de caixa */
   payback_anos?: string;
   economia_mensal?: string;
   economia_anual?: string;
@@ -90,17 +101,575 @@ export interface PythonGeneratorResult {
   success: boolean;
   generated_path?: string;
   file_size?: number;
+  pdf_path?: string;
+  pdf_file_size?: number;
+  pdf_error?: string;
+  /** Tempo de cada etapa da geração (ms) e pico de memória do processo Python */
+  timings?: {
+    stages_ms: Record<string, number>;
+    total_ms: number;
+    peak_rss_mb: number | null;
+  };
+  /** Arquivo de perfil (PROPOSAL_PROFILE=cprofile|tracemalloc) */
+  profile_path?: string;
+  /** Variáveis usadas pelo template que ficaram sem valor (AST Jinja2 do template compilado ou schema) */
+  missing_keys?: string[];
+  /** Cache de saídas: proposta idêntica reaproveitada ("hit") ou gerada agora ("miss") */
+  output_cache?: "hit" | "miss";
+  pdf_cache?: "hit" | "miss";
+  /** PDF montado por trechos (PROPOSAL_PDF_STATIC_PAGES): páginas estáticas reaproveitadas do cache */
+  pdf_static_pages?: { segments: number; static: number; cached: number };
+  /** Servidor de jobs: 429 quando a fila está cheia (com retry_after em segundos) */
+  status?: number;
+  retry_after?: number;
   error?: string;
   traceback?: string;
 }
 
+/**
+ * Schema das variáveis de um template (ver python/template_schema.py).
+ * Calculado no upload e salvo no Storage ao lado do template.
+ */
+export interface TemplateSchema {
+  schema_version: number;
+  content_hash: string;
+  simple_keys: string[];
+  dynamic_tables: Record<string, string[]>;
+  images_to_generate: string[];
+  root_keys: string[];
+}
+
+// Tempo máximo de um job no worker, a partir do evento "started", antes de matar o processo
+const PYTHON_JOB_TIMEOUT_MS = 120_000;
+
+/**
+ * Evento do protocolo dos scripts Python (ver python/protocolo.py).
+ * Eventos terminais (result/error) trazem os campos de PythonGeneratorResult.
+ */
+export type PythonWorkerEvent = {
+  event:
+    | "ready"
+    | "started"
+    | "charts_done"
+    | "rendered"
+    | "saved"
+    | "result"
+    | "error"
+    | "done"
+    | "health";
+  job_id: string | null;
+  ts: number;
+  [key: string]: unknown;
+};
+
+const TERMINAL_EVENTS = new Set(["result", "error"]);
+
+type WorkerJob = {
+  payload: Record<string, unknown>;
+  resolve: (result: PythonGeneratorResult) => void;
+  onEvent?: (event: PythonWorkerEvent) => void;
+};
+
+type InFlightJob = {
+  job: WorkerJob;
+  /** Limite de fila (PYTHON_QUEUE_TIMEOUT_MS) até "started", depois o total do job */
+  timer: NodeJS.Timeout;
+  stageTimer?: NodeJS.Timeout;
+  stage?: string;
+};
+
+/**
+ * Extrai o resultado de um evento terminal (remove os campos do protocolo)
+ */
+function eventToResult(message: PythonWorkerEvent): PythonGeneratorResult {
+  const { event: _event, job_id: _jobId, ts: _ts, ...result } = message;
+  return result as unknown as PythonGeneratorResult;
+}
+
+/**
+ * Processo Python de longa duração em modo --worker.
+ * Protocolo: um JSON por linha no stdin (job) e eventos JSON por linha no stdout
+ * (started, charts_done, rendered, saved e, por fim, result/error), todos com o job_id.
+ * Vários jobs podem ser enviados em sequência (pipeline); o Python os processa em ordem.
+ * Se um job estoura o tempo, o worker é finalizado e os jobs que esperavam atrás dele
+ * voltam para a fila do pool (onRequeue).
+ */
+class PythonWorker {
+  private readonly process: ChildProcessWithoutNullStreams;
+  private buffer = "";
+  private stderr = "";
+  private readonly jobs = new Map<string, InFlightJob>();
+  jobsHandled = 0;
+  alive = true;
+
+  constructor(
+    scriptPath: string,
+    private readonly onExit: (worker: PythonWorker) => void,
+    private readonly onRequeue: (jobs: WorkerJob[]) => void
+  ) {
+    this.process = spawn("python", ["-u", scriptPath, "--worker"], {
+      cwd: path.dirname(scriptPath),
+      stdio: ["pipe", "pipe", "pipe"],
+      env: {
+        ...process.env,
+        PYTHONIOENCODING: "utf-8",
+        PYTHONLEGACYWINDOWSSTDIO: "0",
+      },
+    });
+    this.process.stdin.setDefaultEncoding("utf-8");
+
+    // Worker ocioso não deve impedir o processo Node de encerrar
+    // (durante um job o timer de timeout mantém o event loop ativo)
+    this.process.unref();
+    for (const stream of [this.process.stdin, this.process.stdout, this.process.stderr]) {
+      (stream as unknown as { unref?: () => void }).unref?.();
+    }
+
+    this.process.stdout.on("data", (data) => {
+      this.buffer += data.toString("utf-8");
+      let newline = this.buffer.indexOf("\n");
+      while (newline >= 0) {
+        const line = this.buffer.slice(0, newline).trim();
+        this.buffer = this.buffer.slice(newline + 1);
+        if (line) this.handleLine(line);
+        newline = this.buffer.indexOf("\n");
+      }
+    });
+
+    this.process.stderr.on("data", (data) => {
+      // Manter apenas o final do stderr para diagnóstico em caso de falha
+      this.stderr = (this.stderr + data.toString("utf-8")).slice(-8000);
+    });
+
+    this.process.on("error", (error) => {
+      console.error("[PythonPool] Erro ao executar Python:", error);
+      this.handleExit(`Erro ao executar Python: ${error.message}`);
+    });
+
+    this.process.on("close", (code) => {
+      this.handleExit(`Worker Python finalizado inesperadamente (código ${code})`);
+    });
+  }
+
+  get inFlight(): number {
+    return this.jobs.size;
+  }
+
+  run(job: WorkerJob): void {
+    const id = randomUUID();
+    // Na fila do worker (atrás de outros jobs do pipeline) o limite é o de fila; o
+    // tempo total do job só começa a contar no evento "started"
+    const timer = setTimeout(() => {
+      console.error("[PythonPool] Job", id, "não começou no tempo limite de fila");
+      this.finish(id, { success: false, error: "Tempo limite excedido na fila do worker Python" });
+    }, PYTHON_QUEUE_TIMEOUT_MS);
+
+    this.jobs.set(id, { job, timer });
+    this.jobsHandled++;
+    this.process.stdin.write(JSON.stringify({ ...job.payload, id }) + "\n");
+  }
+
+  retire(): void {
+    this.alive = false;
+    this.process.stdin.end();
+  }
+
+  kill(): void {
+    this.alive = false;
+    this.process.kill();
+  }
+
+  private handleLine(line: string): void {
+    let message: PythonWorkerEvent;
+    try {
+      message = JSON.parse(line);
+    } catch {
+      console.warn("[PythonPool] Linha inesperada no stdout:", line);
+      return;
+    }
+
+    if (message.event === "ready") {
+      console.log("[PythonPool] Worker pronto, pid:", message.pid);
+      return;
+    }
+
+    const inFlight = message.job_id ? this.jobs.get(message.job_id) : undefined;
+    if (!inFlight) {
+      console.warn("[PythonPool] Evento sem job correspondente:", message.event, message.job_id);
+      return;
+    }
+
+    if (TERMINAL_EVENTS.has(message.event)) {
+      this.finish(message.job_id!, eventToResult(message));
+      return;
+    }
+
+    if (message.event === "started") {
+      this.armJobTimer(message.job_id!, inFlight);
+    }
+    inFlight.job.onEvent?.(message);
+    this.armStageTimer(message.job_id!, inFlight, message.event);
+  }
+
+  /**
+   * Troca o limite de fila pelo limite total do job (PYTHON_JOB_TIMEOUT_MS)
+   */
+  private armJobTimer(id: string, inFlight: InFlightJob): void {
+    clearTimeout(inFlight.timer);
+    inFlight.timer = setTimeout(() => {
+      console.error("[PythonPool] Timeout no job", id, "- finalizando worker");
+      this.abort(id, "Tempo limite excedido na geração Python");
+    }, PYTHON_JOB_TIMEOUT_MS);
+  }
+
+  /**
+   * Cada etapa do job tem PYTHON_STAGE_TIMEOUT_MS para emitir o próximo evento;
+   * um worker travado em uma etapa é finalizado sem esperar o timeout total do job.
+   */
+  private armStageTimer(id: string, inFlight: InFlightJob, stage: string): void {
+    if (inFlight.stageTimer) clearTimeout(inFlight.stageTimer);
+    inFlight.stage = stage;
+    inFlight.stageTimer = setTimeout(() => {
+      console.error("[PythonPool] Job", id, "parado após a etapa", stage, "- finalizando worker");
+      this.abort(id, `Tempo limite excedido na geração Python (última etapa: ${stage})`);
+    }, PYTHON_STAGE_TIMEOUT_MS);
+  }
+
+  /**
+   * Finaliza o worker por causa de um job travado: esse job falha e os demais do
+   * pipeline (ainda não começados, o Python processa em ordem) voltam para o pool
+   */
+  private abort(id: string, error: string): void {
+    const pending: WorkerJob[] = [];
+    for (const [otherId, inFlight] of [...this.jobs]) {
+      if (otherId === id) continue;
+      clearTimeout(inFlight.timer);
+      if (inFlight.stageTimer) clearTimeout(inFlight.stageTimer);
+      this.jobs.delete(otherId);
+      pending.push(inFlight.job);
+    }
+    this.kill();
+    this.finish(id, { success: false, error });
+    if (pending.length > 0) {
+      console.warn("[PythonPool] Reenfileirando", pending.length, "job(s) do worker finalizado");
+      this.onRequeue(pending);
+    }
+  }
+
+  private finish(id: string, result: PythonGeneratorResult): void {
+    const inFlight = this.jobs.get(id);
+    if (!inFlight) return;
+    clearTimeout(inFlight.timer);
+    if (inFlight.stageTimer) clearTimeout(inFlight.stageTimer);
+    this.jobs.delete(id);
+    inFlight.job.resolve(result);
+  }
+
+  private handleExit(reason: string): void {
+    const wasAlive = this.alive;
+    this.alive = false;
+    for (const id of [...this.jobs.keys()]) {
+      this.finish(id, { success: false, error: reason, traceback: this.stderr });
+    }
+    if (wasAlive) {
+      console.warn("[PythonPool]", reason);
+    }
+    this.onExit(this);
+  }
+}
+
+/**
+ * Pool de workers Python mantidos aquecidos entre propostas.
+ * Evita pagar a cada proposta o start do interpretador e os imports de
+ * matplotlib/docxtpl. Cada worker é reciclado após maxJobs propostas e recebe
+ * até pipelineDepth jobs de uma vez.
+ */
+class PythonWorkerPool {
+  private readonly workers: PythonWorker[] = [];
+  private readonly queue: WorkerJob[] = [];
+
+  constructor(
+    private readonly scriptPath: string,
+    private readonly size: number,
+    private readonly maxJobs: number,
+    private readonly pipelineDepth: number = 1
+  ) {}
+
+  run(
+    payload: Record<string, unknown>,
+    onEvent?: (event: PythonWorkerEvent) => void
+  ): Promise<PythonGeneratorResult> {
+    return new Promise((resolve) => {
+      this.queue.push({
+        payload,
+        onEvent,
+        resolve: (result) => {
+          resolve(result);
+          this.dispatch();
+        },
+      });
+      this.dispatch();
+    });
+  }
+
+  private dispatch(): void {
+    // Reciclar workers que atingiram o limite de jobs
+    for (const worker of this.workers) {
+      if (worker.alive && worker.inFlight === 0 && worker.jobsHandled >= this.maxJobs) {
+        worker.retire();
+      }
+    }
+
+    while (this.queue.length > 0) {
+      // Worker disponível com menos jobs em andamento
+      let worker = this.workers
+        .filter(
+          (w) =>
+            w.alive &&
+            w.inFlight < this.pipelineDepth &&
+            w.jobsHandled < this.maxJobs
+        )
+        .sort((a, b) => a.inFlight - b.inFlight)[0];
+      if (!worker || worker.inFlight > 0) {
+        // Preferir um worker novo a enfileirar atrás de um job em andamento
+        // (workers em reciclagem ainda podem estar na lista, mas não contam no limite)
+        if (this.workers.filter((w) => w.alive).length < this.size) {
+          worker = new PythonWorker(
+            this.scriptPath,
+            (w) => this.remove(w),
+            (jobs) => this.requeue(jobs)
+          );
+          this.workers.push(worker);
+        }
+      }
+      if (!worker) return;
+      worker.run(this.queue.shift()!);
+    }
+  }
+
+  /** Jobs devolvidos por um worker finalizado voltam para o início da fila */
+  private requeue(jobs: WorkerJob[]): void {
+    this.queue.unshift(...jobs);
+    this.dispatch();
+  }
+
+  private remove(worker: PythonWorker): void {
+    const index = this.workers.indexOf(worker);
+    if (index >= 0) this.workers.splice(index, 1);
+    this.dispatch();
+  }
+}
+
+// Um pool por script (proposal_generator.py, docx_to_pdf.py)
+const workerPools = new Map<string, PythonWorkerPool>();
+
+function getWorkerPool(scriptPath: string): PythonWorkerPool {
+  let pool = workerPools.get(scriptPath);
+  if (!pool) {
+    pool = new PythonWorkerPool(
+      scriptPath,
+      PYTHON_WORKER_POOL_SIZE,
+      PYTHON_WORKER_MAX_JOBS,
+      Math.max(1, PYTHON_WORKER_PIPELINE)
+    );
+    workerPools.set(scriptPath, pool);
+  }
+  return pool;
+}
+
+type JobServerJob = {
+  resolve: (result: PythonGeneratorResult) => void;
+  timer: NodeJS.Timeout;
+  onEvent?: (event: PythonWorkerEvent) => void;
+};
+
+/**
+ * Cliente do servidor de jobs Python (python/job_server.py) em socket Unix.
+ * Uma conexão por processo Node, com os jobs multiplexados pelo id; o servidor é
+ * compartilhado pelas instâncias do backend no mesmo host.
+ */
+class PythonJobServerClient {
+  private socket: net.Socket | null = null;
+  private connecting: Promise<net.Socket | null> | null = null;
+  private buffer = "";
+  private readonly jobs = new Map<string, JobServerJob>();
+
+  constructor(private readonly socketPath: string) {}
+
+  /**
+   * Envia um job ({ type: "generate" | "convert", ...params }).
+   * Resolve null se o servidor não estiver acessível: o chamador usa o caminho local.
+   */
+  async run(
+    payload: Record<string, unknown>,
+    onEvent?: (event: PythonWorkerEvent) => void
+  ): Promise<PythonGeneratorResult | null> {
+    const socket = await this.connect();
+    if (!socket) return null;
+
+    return new Promise((resolve) => {
+      const id = randomUUID();
+      const timer = setTimeout(() => {
+        console.error("[PythonJobServer] Timeout no job", id);
+        this.finish(id, { success: false, error: "Tempo limite excedido no servidor de jobs Python" });
+      }, PYTHON_JOB_TIMEOUT_MS);
+
+      this.jobs.set(id, { resolve, timer, onEvent });
+      socket.write(JSON.stringify({ ...payload, id }) + "\n");
+    });
+  }
+
+  private connect(): Promise<net.Socket | null> {
+    if (this.socket) return Promise.resolve(this.socket);
+    if (!this.connecting) {
+      this.connecting = new Promise((resolve) => {
+        const socket = net.createConnection(this.socketPath);
+        socket.setEncoding("utf-8");
+
+        socket.once("connect", () => {
+          // Conexão ociosa não deve impedir o processo Node de encerrar
+          socket.unref();
+          this.socket = socket;
+          this.connecting = null;
+          resolve(socket);
+        });
+
+        socket.on("error", (error) => {
+          if (this.socket !== socket) {
+            console.warn("[PythonJobServer] Servidor indisponível, usando workers locais:", error.message);
+            this.connecting = null;
+            resolve(null);
+          }
+        });
+
+        socket.on("data", (chunk: string) => {
+          this.buffer += chunk;
+          let newline = this.buffer.indexOf("\n");
+          while (newline >= 0) {
+            const line = this.buffer.slice(0, newline).trim();
+            this.buffer = this.buffer.slice(newline + 1);
+            if (line) this.handleLine(line);
+            newline = this.buffer.indexOf("\n");
+          }
+        });
+
+        socket.on("close", () => {
+          if (this.socket !== socket) return;
+          this.socket = null;
+          this.buffer = "";
+          for (const id of [...this.jobs.keys()]) {
+            this.finish(id, { success: false, error: "Conexão com o servidor de jobs Python encerrada" });
+          }
+        });
+      });
+    }
+    return this.connecting;
+  }
+
+  private handleLine(line: string): void {
+    let message: PythonWorkerEvent;
+    try {
+      message = JSON.parse(line);
+    } catch {
+      console.warn("[PythonJobServer] Linha inesperada:", line);
+      return;
+    }
+
+    const job = message.job_id ? this.jobs.get(message.job_id) : undefined;
+    if (!job) {
+      console.warn("[PythonJobServer] Evento sem job correspondente:", message.event, message.job_id);
+      return;
+    }
+
+    if (TERMINAL_EVENTS.has(message.event)) {
+      this.finish(message.job_id!, eventToResult(message));
+      return;
+    }
+    job.onEvent?.(message);
+  }
+
+  private finish(id: string, result: PythonGeneratorResult): void {
+    const job = this.jobs.get(id);
+    if (!job) return;
+    clearTimeout(job.timer);
+    this.jobs.delete(id);
+    job.resolve(result);
+  }
+}
+
+let jobServerClient: PythonJobServerClient | null = null;
+
+function getJobServerClient(): PythonJobServerClient | null {
+  if (!PYTHON_JOB_SERVER_SOCKET) return null;
+  if (!jobServerClient) {
+    jobServerClient = new PythonJobServerClient(PYTHON_JOB_SERVER_SOCKET);
+  }
+  return jobServerClient;
+}
+
+/**
+ * Job do proposal_generator.py (processar_job)
+ */
+function buildGeneratorInput(
+  templatePath: string,
+  outputPath: string,
+  data: PythonGeneratorData,
+  pdfPath?: string,
+  schema?: TemplateSchema | null
+): Record<string, unknown> {
+  return {
+    template_path: templatePath,
+    output_path: outputPath,
+    ...(pdfPath && { pdf_path: pdfPath }),
+    ...(schema && { schema }),
+    dados_cliente: data,
+  };
+}
+
 /**
  * Chama o gerador Python para criar documento de proposta
+ * Com PYTHON_JOB_SERVER_SOCKET o job vai para o servidor compartilhado do host; se ele
+ * estiver fora do ar, para os workers locais (ou um processo por proposta).
+ * @param pdfPath Se informado, o mesmo processo também converte o DOCX (em memória) para PDF
+ * @param schema Schema do template: o Python valida e poda o contexto sem reler o DOCX
  */
 export async function generateWithPython(
   templatePath: string,
   outputPath: string,
-  data: PythonGeneratorData
+  data: PythonGeneratorData,
+  pdfPath?: string,
+  schema?: TemplateSchema | null
+): Promise<PythonGeneratorResult> {
+  const jobServer = getJobServerClient();
+  if (jobServer && fs.existsSync(templatePath)) {
+    const startedAt = Date.now();
+    const result = await jobServer.run(
+      { type: "generate", ...buildGeneratorInput(templatePath, outputPath, data, pdfPath, schema) },
+      (event) => {
+        console.log(`[PythonGen] Servidor de jobs: ${event.event} (+${Date.now() - startedAt}ms)`);
+      }
+    );
+    if (result) {
+      if (result.success) {
+        console.log("[PythonGen] Resultado:", result);
+      } else {
+        console.error("[PythonGen] Erro no resultado:", result.error);
+      }
+      return result;
+    }
+  }
+  return generateLocally(templatePath, outputPath, data, pdfPath, schema);
+}
+
+/**
+ * Geração no próprio host do backend: pool de workers ou um processo por proposta
+ */
+function generateLocally(
+  templatePath: string,
+  outputPath: string,
+  data: PythonGeneratorData,
+  pdfPath?: string,
+  schema?: TemplateSchema | null
 ): Promise<PythonGeneratorResult> {
   return new Promise((resolve) => {
     try {
@@ -117,6 +686,9 @@ export async function generateWithPython(
       console.log("[PythonGen] Script:", scriptPath);
       console.log("[PythonGen] Template:", templatePath);
       console.log("[PythonGen] Output:", outputPath);
+      if (pdfPath) {
+        console.log("[PythonGen] PDF:", pdfPath);
+      }
       
       // Verificar se script existe
       if (!fs.existsSync(scriptPath)) {
@@ -135,14 +707,27 @@ export async function generateWithPython(
       }
       
       // Preparar dados para o Python
-      const pythonInput = {
-        template_path: templatePath,
-        output_path: outputPath,
-        dados_cliente: data,
-      };
+      const pythonInput = buildGeneratorInput(templatePath, outputPath, data, pdfPath, schema);
       
       console.log("[PythonGen] Dados do cliente:", Object.keys(data));
       
+      // Pool de workers persistentes (PYTHON_WORKER_POOL_SIZE=0 desativa)
+      if (PYTHON_WORKER_POOL_SIZE > 0) {
+        const startedAt = Date.now();
+        return getWorkerPool(scriptPath)
+          .run(pythonInput, (event) => {
+            console.log(`[PythonGen] Etapa ${event.event} (+${Date.now() - startedAt}ms)`);
+          })
+          .then((result) => {
+            if (result.success) {
+              console.log("[PythonGen] Resultado:", result);
+            } else {
+              console.error("[PythonGen] Erro no resultado:", result.error);
+            }
+            resolve(result);
+          });
+      }
+      
       // Chamar Python com spawn - usar -u para unbuffered output
       // PYTHONIOENCODING=utf-8 força UTF-8 no Windows
       const pythonProcess = spawn("python", ["-u", scriptPath, "--production"], {
@@ -180,13 +765,13 @@ export async function generateWithPython(
         
         // Tentar parsear JSON primeiro antes de verificar código
         try {
-          // Pegar última linha do stdout (onde está o JSON)
+          // Pegar última linha do stdout (evento result/error com o JSON)
           const lines = stdout.trim().split("\n");
           const lastLine = lines[lines.length - 1];
           
           // Verificar se a última linha é JSON válido
           if (lastLine.startsWith("{")) {
-            const result = JSON.parse(lastLine);
+            const result = eventToResult(JSON.parse(lastLine));
             
             // Se o JSON indica sucesso, ignorar código de saída
             // (warnings do Python podem causar exit code 1)
@@ -247,10 +832,38 @@ export async function generateWithPython(
 
 /**
  * Converte arquivo DOCX para PDF usando Python
+ * (servidor de jobs do host se PYTHON_JOB_SERVER_SOCKET estiver definido)
  */
 export async function convertDocxToPdf(
   docxPath: string,
   pdfPath?: string
+): Promise<PythonGeneratorResult> {
+  const jobServer = getJobServerClient();
+  if (jobServer) {
+    const result: any = await jobServer.run({
+      type: "convert",
+      docx_path: docxPath,
+      ...(pdfPath && { pdf_path: pdfPath }),
+    });
+    if (result) {
+      if (!result.success) {
+        console.error("[PythonPDF] Erro na conversão:", result.error);
+        return result;
+      }
+      console.log("[PythonPDF] Conversão concluída:", result.pdf_path);
+      return {
+        success: true,
+        generated_path: result.pdf_path,
+        file_size: result.file_size,
+      };
+    }
+  }
+  return convertLocally(docxPath, pdfPath);
+}
+
+function convertLocally(
+  docxPath: string,
+  pdfPath?: string
 ): Promise<PythonGeneratorResult> {
   return new Promise((resolve) => {
     try {
@@ -282,6 +895,24 @@ export async function convertDocxToPdf(
         ...(pdfPath && { pdf_path: pdfPath }),
       };
 
+      // Pool de workers: mantém o LibreOffice aquecido entre conversões
+      if (PYTHON_WORKER_POOL_SIZE > 0) {
+        return getWorkerPool(scriptPath)
+          .run(inputData)
+          .then((result: any) => {
+            if (!result.success) {
+              console.error("[PythonPDF] Erro na conversão:", result.error);
+              return resolve(result);
+            }
+            console.log("[PythonPDF] Conversão concluída:", result.pdf_path);
+            resolve({
+              success: true,
+              generated_path: result.pdf_path,
+              file_size: result.file_size,
+            });
+          });
+      }
+
       const jsonInput = JSON.stringify(inputData);
       console.log("[PythonPDF] JSON enviado:", jsonInput);
 
@@ -318,7 +949,7 @@ export async function convertDocxToPdf(
           const lastLine = stdout.trim().split("\n").pop() || "";
 
           if (lastLine.startsWith("{")) {
-            const result = JSON.parse(lastLine);
+            const result: any = eventToResult(JSON.parse(lastLine));
 
             // Se o JSON indica sucesso, ignorar código de saída
             if (result.success) {
@@ -472,6 +1103,126 @@ export async function downloadTemplateToTemp(
   }
 }
 
+/**
+ * Caminho do schema no Storage, ao lado do template (x.docx -> x.schema.json)
+ */
+export function templateSchemaPath(templatePath: string): string {
+  return templatePath.replace(/\.docx$/i, "") + ".schema.json";
+}
+
+/**
+ * Calcula o schema de um template (variáveis, tabelas e imagens) com Python.
+ * Roda uma vez por versão do template, no upload.
+ */
+export async function extractTemplateSchema(
+  buffer: Buffer
+): Promise<{ success: boolean; schema?: TemplateSchema; error?: string }> {
+  const scriptPath = path.join(process.cwd(), "src", "services", "python", "template_schema.py");
+  const tempDir = path.join(process.cwd(), "temp");
+  if (!fs.existsSync(tempDir)) {
+    fs.mkdirSync(tempDir, { recursive: true });
+  }
+  const tempPath = path.join(tempDir, `schema_${Date.now()}_${randomUUID()}.docx`);
+  fs.writeFileSync(tempPath, buffer);
+
+  const result = await new Promise<PythonGeneratorResult & { schema?: TemplateSchema }>(
+    (resolve) => {
+      const pythonProcess = spawn("python", ["-u", scriptPath, "--production"], {
+        cwd: path.dirname(scriptPath),
+        env: {
+          ...process.env,
+          PYTHONIOENCODING: "utf-8",
+          PYTHONLEGACYWINDOWSSTDIO: "0",
+        },
+      });
+
+      let stdout = "";
+      let stderr = "";
+      pythonProcess.stdout.on("data", (data) => {
+        stdout += data.toString("utf-8");
+      });
+      pythonProcess.stderr.on("data", (data) => {
+        stderr += data.toString("utf-8");
+      });
+
+      pythonProcess.on("close", (code) => {
+        const lastLine = stdout.trim().split("\n").pop() || "";
+        try {
+          if (lastLine.startsWith("{")) {
+            return resolve(eventToResult(JSON.parse(lastLine)) as any);
+          }
+        } catch {
+          // Cai no erro abaixo
+        }
+        resolve({
+          success: false,
+          error: `Python falhou (código ${code})`,
+          traceback: stderr || stdout,
+        });
+      });
+
+      pythonProcess.on("error", (error) => {
+        resolve({ success: false, error: `Erro ao executar Python: ${error.message}` });
+      });
+
+      pythonProcess.stdin.write(
+        JSON.stringify({ template_path: tempPath, gravar: false }),
+        "utf-8"
+      );
+      pythonProcess.stdin.end();
+    }
+  );
+
+  try {
+    fs.unlinkSync(tempPath);
+  } catch (e) {
+    console.warn("[TemplateSchema] Não foi possível limpar template temporário:", e);
+  }
+
+  if (!result.success || !result.schema) {
+    return { success: false, error: result.error || "Schema não retornado" };
+  }
+  return { success: true, schema: result.schema };
+}
+
+/**
+ * Salva o schema no Storage ao lado do template
+ */
+export async function uploadTemplateSchema(
+  templatePath: string,
+  schema: TemplateSchema
+): Promise<{ success: boolean; error?: string }> {
+  const { error } = await supabaseAdmin.storage
+    .from(DOCS_BUCKET)
+    .upload(templateSchemaPath(templatePath), Buffer.from(JSON.stringify(schema)), {
+      contentType: "application/json",
+      upsert: true,
+    });
+
+  return error ? { success: false, error: error.message } : { success: true };
+}
+
+/**
+ * Baixa o schema do template (null se o template foi enviado antes do schema existir)
+ */
+export async function downloadTemplateSchema(
+  templatePath: string
+): Promise<TemplateSchema | null> {
+  try {
+    const { data, error } = await supabaseAdmin.storage
+      .from(DOCS_BUCKET)
+      .download(templateSchemaPath(templatePath));
+
+    if (error || !data) {
+      return null;
+    }
+    return JSON.parse(await data.text()) as TemplateSchema;
+  } catch (error) {
+    console.warn("[TemplateSchema] Schema inválido ignorado:", templatePath, error);
+    return null;
+  }
+}
+
 /**
  * Faz upload do documento gerado para o Supabase Storage
  */
@@ -541,18 +1292,23 @@ export async function uploadGeneratedDocument(
 /**
  * Fluxo completo: Download template -> Gerar com Python -> Upload resultado
  * @param convertToPdf Se true, também converte para PDF e faz upload
+ * @param schema Schema do template já baixado (ver downloadTemplateSchema)
  */
 export async function generateSolarProposal(
   templateStoragePath: string,
   outputStoragePath: string,
   data: PythonGeneratorData,
-  convertToPdf: boolean = false
+  convertToPdf: boolean = false,
+  schema?: TemplateSchema | null
 ): Promise<{
   success: boolean;
   generatedPath?: string;
   publicUrl?: string;
   pdfPath?: string;
   pdfUrl?: string;
+  /** 429 quando o servidor de jobs recusou por fila cheia */
+  status?: number;
+  retryAfter?: number;
   error?: string;
 }> {
   try {
@@ -578,12 +1334,17 @@ export async function generateSolarProposal(
     );
     console.log("[PythonGen] Output local:", outputLocalPath);
 
-    // 3. Gerar documento com Python
+    // 3. Gerar documento com Python (DOCX e, se solicitado, PDF na mesma chamada)
+    const pdfLocalPath = convertToPdf
+      ? outputLocalPath.replace(/\.docx$/i, '.pdf')
+      : undefined;
     console.log("[PythonGen] 2. Gerando documento com Python...");
     const generateResult = await generateWithPython(
       templateLocalPath,
       outputLocalPath,
-      data
+      data,
+      pdfLocalPath,
+      schema
     );
 
     // Limpar template temporário
@@ -597,18 +1358,33 @@ export async function generateSolarProposal(
       return {
         success: false,
         error: generateResult.error,
+        status: generateResult.status,
+        retryAfter: generateResult.retry_after,
       };
     }
     console.log("[PythonGen] Documento gerado com sucesso!");
+    if (generateResult.missing_keys?.length) {
+      console.warn("[PythonGen] ⚠️ Variáveis do template sem valor:", generateResult.missing_keys);
+    }
 
-    // 4. Upload DOCX para storage
-    console.log("[PythonGen] 3. Fazendo upload do DOCX...");
-    console.log("[PythonGen] deleteAfterUpload =", !convertToPdf, "(convertToPdf =", convertToPdf, ")");
-    const uploadResult = await uploadGeneratedDocument(
-      outputLocalPath,
-      outputStoragePath,
-      !convertToPdf // NÃO deletar se vamos converter para PDF
-    );
+    // 4. Upload DOCX e PDF em paralelo (o Python só responde com os arquivos já gravados)
+    console.log("[PythonGen] 3. Fazendo upload dos arquivos...");
+    const pdfStoragePath = outputStoragePath.replace(/\.docx$/i, '.pdf');
+    const [uploadResult, pdfUploadResult] = await Promise.all([
+      uploadGeneratedDocument(outputLocalPath, outputStoragePath),
+      pdfLocalPath && generateResult.pdf_path
+        ? uploadPdfDocument(generateResult.pdf_path, pdfStoragePath)
+        : Promise.resolve(undefined),
+    ]);
+
+    // Limpar PDF temporário caso o upload do DOCX tenha falhado antes
+    if (pdfLocalPath && fs.existsSync(pdfLocalPath)) {
+      try {
+        fs.unlinkSync(pdfLocalPath);
+      } catch (e) {
+        console.warn("[PythonGen] ⚠️ Erro ao limpar PDF temporário:", e);
+      }
+    }
 
     if (!uploadResult.success) {
       return {
@@ -618,32 +1394,6 @@ export async function generateSolarProposal(
     }
 
     console.log("[PythonGen] ✅ Upload DOCX concluído!");
-    
-    // Se vai converter PDF, NÃO deveria ter deletado
-    if (convertToPdf) {
-      console.log("[PythonGen] 🔍 Verificando arquivo para conversão PDF...");
-      
-      // Aguardar sistema de arquivos
-      await new Promise(resolve => setTimeout(resolve, 200));
-      
-      const docxExistsAfterUpload = fs.existsSync(outputLocalPath);
-      console.log("[PythonGen] 📁 Arquivo existe?", docxExistsAfterUpload);
-      console.log("[PythonGen] 📂 Caminho:", outputLocalPath);
-      
-      if (docxExistsAfterUpload) {
-        const stats = fs.statSync(outputLocalPath);
-        console.log("[PythonGen] 📊 Tamanho:", stats.size, "bytes");
-      } else {
-        console.error("[PythonGen] ❌ ARQUIVO FOI DELETADO!");
-        console.error("[PythonGen] deleteAfterUpload passou:", !convertToPdf);
-        console.error("[PythonGen] convertToPdf:", convertToPdf);
-        
-        // Listar arquivos no temp
-        const tempDir = path.dirname(outputLocalPath);
-        const files = fs.readdirSync(tempDir);
-        console.error("[PythonGen] Arquivos em temp:", files.filter(f => f.includes('generated')));
-      }
-    }
 
     const result: any = {
       success: true,
@@ -651,63 +1401,18 @@ export async function generateSolarProposal(
       publicUrl: uploadResult.publicUrl,
     };
 
-    // 5. Converter para PDF (opcional)
+    // 5. PDF (opcional) - falha no PDF não derruba a operação, apenas avisa
     if (convertToPdf) {
-      console.log("[PythonGen] 4. Convertendo para PDF...");
-      
-      // Verificar se arquivo DOCX ainda existe
-      if (!fs.existsSync(outputLocalPath)) {
-        console.error("[PythonGen] ❌ ERRO: Arquivo DOCX não existe mais:", outputLocalPath);
-        result.pdfError = "Arquivo DOCX foi deletado antes da conversão";
-        return result;
-      }
-      console.log("[PythonGen] ✅ Arquivo DOCX existe:", outputLocalPath);
-      
-      // Caminho do PDF temporário
-      const pdfLocalPath = outputLocalPath.replace(/\.docx$/i, '.pdf');
-      
-      // Converter
-      const pdfResult = await convertDocxToPdf(outputLocalPath, pdfLocalPath);
-      
-      if (!pdfResult.success) {
-        console.warn("[PythonGen] Erro ao converter PDF:", pdfResult.error);
-        // Não falha a operação toda, apenas avisa
-        result.pdfError = pdfResult.error;
+      if (!generateResult.pdf_path) {
+        console.warn("[PythonGen] Erro ao converter PDF:", generateResult.pdf_error);
+        result.pdfError = generateResult.pdf_error || "PDF não foi gerado";
+      } else if (!pdfUploadResult?.success) {
+        console.warn("[PythonGen] Erro ao fazer upload do PDF:", pdfUploadResult?.error);
+        result.pdfError = pdfUploadResult?.error;
       } else {
-        console.log("[PythonGen] PDF gerado com sucesso!");
-        
-        // Upload do PDF
-        console.log("[PythonGen] 5. Fazendo upload do PDF...");
-        const pdfStoragePath = outputStoragePath.replace(/\.docx$/i, '.pdf');
-        
-        const pdfUploadResult = await uploadPdfDocument(
-          pdfLocalPath,
-          pdfStoragePath
-        );
-        
-        if (!pdfUploadResult.success) {
-          console.warn("[PythonGen] Erro ao fazer upload do PDF:", pdfUploadResult.error);
-          result.pdfError = pdfUploadResult.error;
-        } else {
-          console.log("[PythonGen] PDF enviado com sucesso!");
-          result.pdfPath = pdfStoragePath;
-          result.pdfUrl = pdfUploadResult.publicUrl;
-        }
-      }
-      
-      // Limpar arquivos temporários após converter para PDF
-      try {
-        console.log("[PythonGen] 6. Limpando arquivos temporários...");
-        if (fs.existsSync(outputLocalPath)) {
-          fs.unlinkSync(outputLocalPath);
-          console.log("[PythonGen] ✅ DOCX temporário removido:", outputLocalPath);
-        }
-        if (fs.existsSync(pdfLocalPath)) {
-          fs.unlinkSync(pdfLocalPath);
-          console.log("[PythonGen] ✅ PDF temporário removido:", pdfLocalPath);
-        }
-      } catch (e) {
-        console.warn("[PythonGen] ⚠️ Erro ao limpar temporários:", e);
+        console.log("[PythonGen] PDF enviado com sucesso!");
+        result.pdfPath = pdfStoragePath;
+        result.pdfUrl = pdfUploadResult.publicUrl;
       }
     }
 
@@ -0,0 +1,181 @@
+"""
+Motor numérico do fluxo de caixa das propostas solares
+
+Calcula todas as colunas do fluxo (tarifa, faturas, economia, saldo...) como arrays
+NumPy, para uma proposta ou um lote de N propostas de uma vez. A formatação em texto
+(R$, kWh) fica separada em formatar_fluxo e só é aplicada na hora de renderizar,
+então gráficos e cálculos derivados usam os números direto, sem formatar e reconverter.
+
+Uso em lote (simulações "e se" sem gerar documento):
+    fluxo = calcular_fluxo(
+        valor_investimento=[25000, 32000],
+        economia_mensal=[900, 1100],
+        tarifa=0.92,
+        producao_mensal=[1500, 1800],
+        consumo_mensal=[1350, 1700],
+        inflacao=[[0.04], [0.05], [0.06]],  # 3 cenários x 2 leads
+    )
+    fluxo['eco_ac'][..., -1]  # economia acumulada no último ano
+"""
+
+import numpy as np
+
+try:
+    from .formatacao import formatar_lote
+except ImportError:
+    from formatacao import formatar_lote
+
+
+ANOS_PADRAO = 25
+
+# Inflação energética anual estimada
+INFLACAO_PADRAO = 0.05
+
+# Fatura mínima mantida com o sistema solar (custo de disponibilidade), em R$/ano
+FATURA_MINIMA = 100.0
+
+# Fator aplicado ao crédito de energia a cada ano
+DEGRADACAO_PADRAO = 0.01
+
+# Parcela da tarifa referente ao Fio B
+FATOR_FIO_B = 0.3
+
+
+def calcular_fluxo(valor_investimento, economia_mensal, tarifa, producao_mensal,
+                   consumo_mensal, anos=ANOS_PADRAO, inflacao=INFLACAO_PADRAO,
+                   degradacao=DEGRADACAO_PADRAO):
+    """
+    Calcula o fluxo de caixa projetado
+
+    Todos os parâmetros numéricos aceitam escalares ou arrays (broadcasting NumPy);
+    o eixo dos anos é sempre o último.
+
+    Args:
+        valor_investimento: Investimento inicial em R$
+        economia_mensal: Economia mensal no primeiro ano em R$
+        tarifa: Tarifa de energia no primeiro ano em R$/kWh
+        producao_mensal: Produção mensal média em kWh
+        consumo_mensal: Consumo mensal médio em kWh
+        anos (int): Horizonte da projeção
+        inflacao: Inflação energética anual (0.05 = 5%)
+        degradacao: Variação anual aplicada ao crédito acumulado
+
+    Returns:
+        dict: Arrays com shape (..., anos) por coluna; 'ano' tem shape (anos,)
+    """
+    ano = np.arange(1, anos + 1, dtype=float)
+
+    investimento = np.asarray(valor_investimento, dtype=float)[..., np.newaxis]
+    economia_anual_base = np.asarray(economia_mensal, dtype=float)[..., np.newaxis] * 12
+    tarifa_base = np.asarray(tarifa, dtype=float)[..., np.newaxis]
+    producao_anual = np.asarray(producao_mensal, dtype=float)[..., np.newaxis] * 12
+    consumo_anual = np.asarray(consumo_mensal, dtype=float)[..., np.newaxis] * 12
+    inflacao = np.asarray(inflacao, dtype=float)[..., np.newaxis]
+    degradacao = np.asarray(degradacao, dtype=float)[..., np.newaxis]
+
+    fator_inflacao = (1 + inflacao) ** (ano - 1)
+
+    eco = economia_anual_base * fator_inflacao
+    eco_ac = np.cumsum(np.broadcast_to(eco, np.broadcast_shapes(eco.shape, investimento.shape)),
+                       axis=-1)
+    saldo = eco_ac - investimento
+
+    tar = tarifa_base * fator_inflacao
+    credito = (producao_anual - consumo_anual) * (1 + ano * degradacao)
+
+    forma = np.broadcast_shapes(
+        eco_ac.shape, tar.shape, credito.shape, consumo_anual.shape, investimento.shape
+    )
+
+    def expandir(valores):
+        return np.broadcast_to(valores, forma)
+
+    return {
+        'ano': ano.astype(int),
+        'tar': expandir(tar),
+        'tar_fb': expandir(tar * FATOR_FIO_B),
+        'en_g': expandir(producao_anual),
+        'en_cons': expandir(consumo_anual),
+        'cred_ac': expandir(np.maximum(credito, 0)),
+        'fat_s_sol': expandir(consumo_anual * tar),
+        'fat_c_sol': expandir(np.full(ano.shape, FATURA_MINIMA)),
+        'eco': expandir(eco),
+        'eco_ac': expandir(eco_ac),
+        'saldo': expandir(saldo),
+        'mensal': expandir(eco / 12),
+        'investimento': expandir(investimento),
+    }
+
+
+def selecionar(fluxo, indice):
+    """
+    Extrai uma proposta de um fluxo calculado em lote
+
+    Args:
+        fluxo (dict): Resultado de calcular_fluxo
+        indice: Índice (ou tupla de índices) da proposta nos eixos de lote
+
+    Returns:
+        dict: Fluxo com arrays de shape (anos,)
+    """
+    return {
+        chave: (valores if chave == 'ano' else valores[indice])
+        for chave, valores in fluxo.items()
+    }
+
+
+def formatar_fluxo(fluxo):
+    """
+    Converte o fluxo numérico de UMA proposta nas linhas de texto da tabela 'fluxo' do template
+
+    Cada coluna é formatada de uma vez (formatacao.formatar_lote) e as linhas são
+    montadas a partir das colunas já em texto.
+
+    Args:
+        fluxo (dict): Resultado de calcular_fluxo com arrays de shape (anos,)
+
+    Returns:
+        list: Uma linha (dict de strings) por ano
+    """
+    total_anos = len(fluxo['eco_ac'])
+    eco_ac = formatar_lote(fluxo['eco_ac'], 'moeda')
+
+    # Payback: negativo até atingir break-even ("-R$ 1.234,56")
+    saldo = fluxo['saldo']
+    payback = [
+        texto if positivo else '-' + texto
+        for texto, positivo in zip(formatar_lote(np.abs(saldo), 'moeda'), (saldo > 0).tolist())
+    ]
+
+    colunas = {
+        'ano': [str(ano) for ano in fluxo['ano'].tolist()],
+
+        # Dados técnicos e financeiros de cada ano (nomes conforme template Word)
+        'tar': formatar_lote(fluxo['tar'], 'tarifa'),
+        'tar_fb': formatar_lote(fluxo['tar_fb'], 'tarifa'),
+        'en_g': formatar_lote(fluxo['en_g'], 'inteiro'),
+        'en_cons': formatar_lote(fluxo['en_cons'], 'inteiro'),
+        'cred_ac': formatar_lote(fluxo['cred_ac'], 'inteiro'),
+
+        'fat_s_sol': formatar_lote(fluxo['fat_s_sol'], 'moeda'),
+        'fat_c_sol': formatar_lote(fluxo['fat_c_sol'], 'moeda'),
+        'eco': formatar_lote(fluxo['eco'], 'moeda'),
+        'eco_ac': eco_ac,
+        'payback': payback,
+
+        # Valores para tabela de rentabilidade
+        'inves': formatar_lote(fluxo['investimento'], 'moeda'),
+        'mensal': formatar_lote(fluxo['mensal'], 'moeda'),
+    }
+
+    # Economia acumulada dos anos de referência da tabela de rentabilidade (1, 5, 10, 25):
+    # só aparece a partir do ano em que o marco já foi atingido
+    for chave, indice in (('anoa', 0), ('anob', 4), ('anoc', 9), ('anod', 24)):
+        marco = eco_ac[indice] if total_anos > indice else None
+        colunas[chave] = [
+            marco if marco is not None and i >= indice else 'R$ 0,00'
+            for i in range(total_anos)
+        ]
+
+    nomes = list(colunas)
+    return [dict(zip(nomes, linha)) for linha in zip(*colunas.values())]
@@ -0,0 +1,492 @@
+"""
+Motor de gráficos das propostas (Consumo x Geração e Retorno em 25 anos)
+
+Cada gráfico tem o layout (figura, eixos, barras, títulos, textos) montado uma única vez
+por processo; a cada proposta só alturas, cores, limites e rótulos são atualizados e a
+imagem é rasterizada direto pelo canvas Agg, sem a máquina de estados do pyplot.
+Os PNGs ficam em um cache LRU endereçado pelo conteúdo das séries: propostas com o
+mesmo par consumo/produção recebem os bytes prontos, sem desenhar nada.
+
+O matplotlib só é importado quando o primeiro layout é montado: importar este módulo
+não custa nada a jobs que não desenham gráficos.
+
+Os dois gráficos são a maior parte do tamanho do DOCX. PROPOSAL_CHART_PNG troca o PNG
+RGBA do Agg por versões menores (o tamanho no documento não muda, só a resolução):
+- paleta: mesmo dpi, 256 cores indexadas (~2,5x menor)
+- compacto: DPI_COMPACTO + paleta (~5x menor)
+A quantização lê o buffer RGBA do canvas por memoryview, sem copiar a imagem.
+
+Com PROPOSAL_CHART_FORMAT=svg os gráficos são escritos como SVG direto das séries
+(GraficoComparativoSvg/GraficoRetornoSvg, via graficos_svg.Cena), sem matplotlib, e
+vão para o DOCX com um PNG pequeno (DPI_FALLBACK) para versões do Word sem SVG.
+Com PROPOSAL_CHART_FORMAT=nativo viram gráficos do próprio Word (graficos_nativos),
+editáveis no documento entregue.
+"""
+
+import hashlib
+import io
+import os
+import threading
+from collections import OrderedDict
+
+try:
+    from . import graficos_nativos
+    from .graficos_svg import Cena, escala_eixo
+except ImportError:
+    import graficos_nativos
+    from graficos_svg import Cena, escala_eixo
+
+
+MESES = ['Jan', 'Fev', 'Mar', 'Abr', 'Mai', 'Jun', 'Jul', 'Ago', 'Set', 'Out', 'Nov', 'Dez']
+
+# Variação sazonal da produção ao longo do ano (±10%)
+FATORES_SAZONAIS = [1.00, 0.97, 1.07, 1.03, 0.93, 0.87, 0.90, 1.00, 1.07, 1.10, 1.00, 0.97]
+
+# Anos do gráfico de retorno que recebem o valor acumulado abaixo da barra
+ANOS_ROTULADOS = [1, 5, 10, 15, 20, 25]
+
+# Formato dos PNGs: vazio (RGBA no dpi de cada gráfico), paleta ou compacto
+MODO_PNG = os.environ.get('PROPOSAL_CHART_PNG', '').lower()
+MODOS_PNG = ('', 'paleta', 'compacto')
+DPI_COMPACTO = 100
+
+# Formato dos gráficos no DOCX: png (matplotlib), svg (com PNG de fallback) ou nativo
+FORMATO = os.environ.get('PROPOSAL_CHART_FORMAT', 'png').lower()
+FORMATOS = ('png', 'svg', 'nativo')
+DPI_FALLBACK = 60
+
+
+def _dpi(dpi_nativo):
+    """Resolução do gráfico no modo configurado"""
+    if MODO_PNG not in MODOS_PNG:
+        raise RuntimeError(f'PROPOSAL_CHART_PNG inválido: {MODO_PNG}')
+    return DPI_COMPACTO if MODO_PNG == 'compacto' else dpi_nativo
+
+
+def formato_graficos():
+    """Formato configurado em PROPOSAL_CHART_FORMAT ('png', 'svg' ou 'nativo')"""
+    if FORMATO not in FORMATOS:
+        raise RuntimeError(f'PROPOSAL_CHART_FORMAT inválido: {FORMATO}')
+    return FORMATO
+
+
+def _exportar_png(canvas):
+    """
+    Rasteriza a figura e codifica o PNG no modo configurado
+
+    Returns:
+        bytes: Imagem PNG
+    """
+    if not MODO_PNG:
+        buffer = io.BytesIO()
+        canvas.print_png(buffer)
+        return buffer.getvalue()
+
+    from PIL import Image
+
+    canvas.draw()
+    rgba = canvas.buffer_rgba()
+    altura, largura = rgba.shape[:2]
+    # O fundo é opaco: descartar o alfa antes de quantizar (MEDIANCUT mantém o branco puro)
+    imagem = Image.frombuffer('RGBA', (largura, altura), rgba, 'raw', 'RGBA', 0, 1)
+    imagem = imagem.convert('RGB').quantize(256, method=Image.Quantize.MEDIANCUT)
+    dpi = canvas.figure.dpi
+    buffer = io.BytesIO()
+    imagem.save(buffer, format='PNG', dpi=(dpi, dpi))
+    return buffer.getvalue()
+
+
+class GraficoComparativo:
+    """Gráfico de barras Consumo x Geração (12 meses), 8x4 pol a 150 dpi (ver PROPOSAL_CHART_PNG)"""
+
+    DPI = 150
+
+    def __init__(self):
+        from matplotlib.backends.backend_agg import FigureCanvasAgg
+        from matplotlib.figure import Figure
+
+        self.figura = Figure(figsize=(8, 4), dpi=_dpi(self.DPI))
+        self.canvas = FigureCanvasAgg(self.figura)
+        ax = self.figura.add_subplot()
+
+        x = range(len(MESES))
+        width = 0.35
+        self.barras_consumo = ax.bar([i - width/2 for i in x], [1] * 12, width=width,
+                                     color='#76b900', label='Consumo', alpha=0.8)
+        self.barras_geracao = ax.bar([i + width/2 for i in x], [1] * 12, width=width,
+                                     color='#008EC4', label='Geração', alpha=0.8)
+
+        # Configurações visuais
+        ax.set_title('COMPARATIVO CONSUMO x GERAÇÃO', fontsize=14, fontweight='bold')
+        ax.set_xlabel('Mês', fontsize=10)
+        ax.set_ylabel('Energia (kWh)', fontsize=10)
+        ax.set_xticks(list(x))
+        ax.set_xticklabels(MESES, rotation=45, ha='right')
+        ax.legend(loc='upper right')
+        ax.spines['top'].set_visible(False)
+        ax.spines['right'].set_visible(False)
+        ax.grid(axis='y', alpha=0.3, linestyle='--', linewidth=0.5)
+
+        # Layout calculado uma vez, com rótulos do eixo Y na largura máxima esperada
+        ax.set_ylim(0, 100000)
+        self.figura.tight_layout()
+        self.eixo = ax
+
+    def renderizar(self, consumo, geracao):
+        """
+        Args:
+            consumo (list): 12 valores mensais de consumo em kWh
+            geracao (list): 12 valores mensais de geração em kWh
+
+        Returns:
+            bytes: Imagem PNG
+        """
+        for barra, valor in zip(self.barras_consumo, consumo):
+            barra.set_height(valor)
+        for barra, valor in zip(self.barras_geracao, geracao):
+            barra.set_height(valor)
+
+        # Mesma margem superior (5%) que o autoscale do matplotlib aplicaria
+        self.eixo.set_ylim(0, max(max(consumo), max(geracao), 1) * 1.05)
+
+        return _exportar_png(self.canvas)
+
+
+class GraficoRetorno:
+    """Gráfico de barras do retorno financeiro acumulado (25 anos), 14x5 pol a 200 dpi (ver PROPOSAL_CHART_PNG)"""
+
+    DPI = 200
+    ANOS = 25
+    # Posição dos valores acumulados (fração da altura do eixo, abaixo de 0) e margem
+    # inferior extra reservada para eles (fração da altura da figura)
+    Y_ROTULOS = -0.07
+    MARGEM_ROTULOS = 0.05
+
+    def __init__(self):
+        from matplotlib.backends.backend_agg import FigureCanvasAgg
+        from matplotlib.figure import Figure
+        from matplotlib.ticker import FuncFormatter
+
+        self.figura = Figure(figsize=(14, 5), dpi=_dpi(self.DPI), facecolor='white')
+        self.canvas = FigureCanvasAgg(self.figura)
+        ax = self.figura.add_subplot()
+
+        anos = list(range(1, self.ANOS + 1))
+        self.barras = ax.bar(anos, [1] * self.ANOS, color='#28a745', width=0.7, alpha=0.85,
+                             edgecolor='white', linewidth=0.5)
+
+        # Linha zero
+        ax.axhline(y=0, color='black', linestyle='-', linewidth=1.5, alpha=0.5)
+
+        # Configurações visuais
+        ax.set_title('SEU RETORNO', fontsize=18, fontweight='bold', pad=20)
+        ax.set_xticks(anos)
+        ax.set_xticklabels([str(a) for a in anos], fontsize=8, rotation=0)
+        ax.yaxis.set_major_formatter(FuncFormatter(lambda x, p: f'{int(x/1000)}'))
+
+        # Valores acumulados abaixo das barras (anos alternados + marcos), abaixo dos
+        # rótulos do eixo X: x em dados, y em fração da altura do eixo, fora do recorte
+        self.rotulos = {}
+        for i, ano in enumerate(anos):
+            if i % 2 == 0 or ano in ANOS_ROTULADOS:
+                self.rotulos[i] = ax.text(ano, self.Y_ROTULOS, '', ha='center', va='top',
+                                          fontsize=7, color='#555', clip_on=False,
+                                          transform=ax.get_xaxis_transform())
+
+        ax.spines['top'].set_visible(False)
+        ax.spines['right'].set_visible(False)
+        ax.spines['left'].set_visible(False)
+        ax.grid(axis='y', alpha=0.2, linestyle='--', linewidth=0.5)
+        ax.set_axisbelow(True)
+
+        ax.set_ylim(-1000000, 1000000)
+        self.figura.tight_layout()
+        # O layout é fixo (sem bbox_inches='tight' na exportação): reservar embaixo o
+        # espaço da linha de valores acumulados
+        self.figura.subplots_adjust(bottom=self.figura.subplotpars.bottom + self.MARGEM_ROTULOS)
+        self.eixo = ax
+
+    def renderizar(self, valores_acumulados):
+        """
+        Args:
+            valores_acumulados (list): Economia acumulada (R$) de cada um dos 25 anos
+
+        Returns:
+            bytes: Imagem PNG
+        """
+        for barra, valor in zip(self.barras, valores_acumulados):
+            barra.set_height(valor)
+            barra.set_facecolor('#dc3545' if valor < 0 else '#28a745')
+
+        for i, texto in self.rotulos.items():
+            texto.set_text(f'{int(valores_acumulados[i]/1000)}')
+
+        minimo = min(valores_acumulados)
+        ymin = minimo * 1.2 if minimo < 0 else -10000
+        ymax = max(valores_acumulados) * 1.1
+        self.eixo.set_ylim(ymin, ymax)
+
+        return _exportar_png(self.canvas)
+
+
+class GraficoComparativoSvg:
+    """Consumo x Geração (12 meses) em SVG, 8x4 pol, mesmo visual do GraficoComparativo"""
+
+    LARGURA, ALTURA = 800, 400
+    ESQUERDA, DIREITA, TOPO, BASE = 85, 785, 50, 330
+
+    def renderizar(self, consumo, geracao):
+        """
+        Args:
+            consumo (list): 12 valores mensais de consumo em kWh
+            geracao (list): 12 valores mensais de geração em kWh
+
+        Returns:
+            tuple: (svg, png de fallback) em bytes
+        """
+        cena = Cena(self.LARGURA, self.ALTURA)
+        _, limite, passo = escala_eixo(0, max(max(consumo), max(geracao), 1) * 1.05)
+        altura_util = self.BASE - self.TOPO
+
+        def y(valor):
+            return self.BASE - valor / limite * altura_util
+
+        # Grade e rótulos do eixo Y
+        for indice in range(round(limite / passo) + 1):
+            valor = indice * passo
+            cena.linha(self.ESQUERDA, y(valor), self.DIREITA, y(valor), '#000000',
+                       opacidade=0.3, espessura=0.7, tracejada=True)
+            cena.texto(self.ESQUERDA - 8, y(valor) + 5, f'{valor:g}', 13, ancora='end')
+
+        # Barras lado a lado por mês (largura 0,35 do mês cada, como no matplotlib)
+        largura_mes = (self.DIREITA - self.ESQUERDA) / len(MESES)
+        largura_barra = largura_mes * 0.35
+        for i, mes in enumerate(MESES):
+            centro = self.ESQUERDA + largura_mes * (i + 0.5)
+            cena.retangulo(centro - largura_barra, y(consumo[i]), largura_barra,
+                           self.BASE - y(consumo[i]), '#76b900', 0.8)
+            cena.retangulo(centro, y(geracao[i]), largura_barra,
+                           self.BASE - y(geracao[i]), '#008EC4', 0.8)
+            cena.texto(centro, self.BASE + 18, mes, 13, ancora='middle')
+
+        # Eixos (sem as bordas superior e direita)
+        cena.linha(self.ESQUERDA, self.TOPO, self.ESQUERDA, self.BASE, '#000000')
+        cena.linha(self.ESQUERDA, self.BASE, self.DIREITA, self.BASE, '#000000')
+
+        cena.texto(self.LARGURA / 2, 30, 'COMPARATIVO CONSUMO x GERAÇÃO', 20,
+                   ancora='middle', negrito=True)
+        cena.texto((self.ESQUERDA + self.DIREITA) / 2, 385, 'Mês', 14, ancora='middle')
+        cena.texto(22, (self.TOPO + self.BASE) / 2, 'Energia (kWh)', 14, ancora='middle',
+                   vertical=True)
+
+        # Legenda no canto superior direito
+        cena.retangulo(self.DIREITA - 125, self.TOPO + 5, 120, 52, '#ffffff', 0.8, borda='#cccccc')
+        for linha, (rotulo, cor) in enumerate((('Consumo', '#76b900'), ('Geração', '#008EC4'))):
+            base = self.TOPO + 25 + linha * 22
+            cena.retangulo(self.DIREITA - 115, base - 11, 25, 12, cor, 0.8)
+            cena.texto(self.DIREITA - 82, base, rotulo, 13)
+
+        return cena.svg(), cena.png(DPI_FALLBACK)
+
+
+class GraficoRetornoSvg:
+    """Retorno acumulado (25 anos) em SVG, 14x5 pol, mesmo visual do GraficoRetorno"""
+
+    LARGURA, ALTURA = 1400, 500
+    ESQUERDA, DIREITA, TOPO, BASE = 75, 1385, 70, 430
+    ANOS = 25
+
+    def renderizar(self, valores_acumulados):
+        """
+        Args:
+            valores_acumulados (list): Economia acumulada (R$) de cada um dos 25 anos
+
+        Returns:
+            tuple: (svg, png de fallback) em bytes
+        """
+        cena = Cena(self.LARGURA, self.ALTURA)
+        minimo = min(valores_acumulados)
+        ymin = minimo * 1.2 if minimo < 0 else 0
+        ymax = max(max(valores_acumulados) * 1.1, 0)
+        inicio, fim, passo = escala_eixo(ymin, ymax)
+        altura_util = self.BASE - self.TOPO
+
+        def y(valor):
+            return self.BASE - (valor - inicio) / (fim - inicio) * altura_util
+
+        # Grade e rótulos do eixo Y (em milhares de R$)
+        for indice in range(round((fim - inicio) / passo) + 1):
+            valor = inicio + indice * passo
+            cena.linha(self.ESQUERDA, y(valor), self.DIREITA, y(valor), '#000000',
+                       opacidade=0.2, espessura=0.7, tracejada=True)
+            cena.texto(self.ESQUERDA - 8, y(valor) + 5, f'{int(valor / 1000)}', 13, ancora='end')
+
+        largura_ano = (self.DIREITA - self.ESQUERDA) / self.ANOS
+        zero = y(0)
+        for i, valor in enumerate(valores_acumulados[:self.ANOS]):
+            ano = i + 1
+            centro = self.ESQUERDA + largura_ano * (i + 0.5)
+            cor = '#dc3545' if valor < 0 else '#28a745'
+            cena.retangulo(centro - largura_ano * 0.35, zero, largura_ano * 0.7, y(valor) - zero, cor, 0.85)
+            cena.texto(centro, self.BASE + 18, ano, 11, ancora='middle')
+            # Valores acumulados abaixo dos anos (anos alternados + marcos)
+            if i % 2 == 0 or ano in ANOS_ROTULADOS:
+                cena.texto(centro, self.BASE + 36, f'{int(valor / 1000)}', 10, '#555555', 'middle')
+
+        # Linha zero
+        cena.linha(self.ESQUERDA, zero, self.DIREITA, zero, '#000000', espessura=2, opacidade=0.5)
+        cena.linha(self.ESQUERDA, self.BASE, self.DIREITA, self.BASE, '#000000')
+
+        cena.texto(self.LARGURA / 2, 40, 'SEU RETORNO', 25, ancora='middle', negrito=True)
+
+        return cena.svg(), cena.png(DPI_FALLBACK)
+
+
+class GraficoComparativoNativo:
+    """Consumo x Geração como gráfico do Word (ver graficos_nativos)"""
+
+    def renderizar(self, consumo, geracao):
+        return graficos_nativos.comparativo(MESES, consumo, geracao)
+
+
+class GraficoRetornoNativo:
+    """Retorno acumulado como gráfico do Word (ver graficos_nativos)"""
+
+    def renderizar(self, valores_acumulados):
+        # Mesmos anos com valor acumulado do PNG/SVG, como rótulos de dados do Word
+        rotulados = [i for i in range(len(valores_acumulados))
+                     if i % 2 == 0 or i + 1 in ANOS_ROTULADOS]
+        return graficos_nativos.retorno(valores_acumulados, rotulados)
+
+
+class MotorGraficos:
+    """
+    Mantém os layouts dos gráficos e o cache de imagens (PNG ou SVG + fallback) do processo
+
+    Os layouts são criados na primeira utilização; o acesso a cada figura é serializado
+    porque objetos do matplotlib não são thread-safe.
+    """
+
+    def __init__(self, capacidade_cache=128):
+        """
+        Args:
+            capacidade_cache (int): Número máximo de imagens mantidas em memória
+        """
+        self.capacidade_cache = capacidade_cache
+        self._cache = OrderedDict()
+        self._graficos = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def comparativo(self, consumo_mensal, producao_mensal):
+        """
+        Gera o PNG do comparativo Consumo x Geração
+
+        Args:
+            consumo_mensal (float): Consumo mensal médio em kWh
+            producao_mensal (float): Produção mensal média em kWh
+
+        Returns:
+            bytes: Imagem PNG
+        """
+        consumo = [float(consumo_mensal)] * 12
+        geracao = [producao_mensal * fator for fator in FATORES_SAZONAIS]
+        return self._renderizar(GraficoComparativo, consumo, geracao)
+
+    def retorno(self, valores_acumulados):
+        """
+        Gera o PNG do retorno financeiro acumulado
+
+        Args:
+            valores_acumulados (list): Economia acumulada (R$) ano a ano
+
+        Returns:
+            bytes: Imagem PNG
+        """
+        return self._renderizar(GraficoRetorno, [float(v) for v in valores_acumulados])
+
+    def comparativo_svg(self, consumo_mensal, producao_mensal):
+        """
+        Comparativo Consumo x Geração em SVG (ver comparativo)
+
+        Returns:
+            tuple: (svg, png de fallback) em bytes
+        """
+        consumo = [float(consumo_mensal)] * 12
+        geracao = [producao_mensal * fator for fator in FATORES_SAZONAIS]
+        return self._renderizar(GraficoComparativoSvg, consumo, geracao)
+
+    def retorno_svg(self, valores_acumulados):
+        """
+        Retorno financeiro acumulado em SVG (ver retorno)
+
+        Returns:
+            tuple: (svg, png de fallback) em bytes
+        """
+        return self._renderizar(GraficoRetornoSvg, [float(v) for v in valores_acumulados])
+
+    def comparativo_docx(self, consumo_mensal, producao_mensal):
+        """
+        Comparativo no formato de PROPOSAL_CHART_FORMAT
+
+        Returns:
+            bytes (png) | tuple (svg, png) | graficos_nativos.GraficoNativo
+        """
+        formato = formato_graficos()
+        if formato == 'nativo':
+            consumo = [float(consumo_mensal)] * 12
+            geracao = [producao_mensal * fator for fator in FATORES_SAZONAIS]
+            return self._renderizar(GraficoComparativoNativo, consumo, geracao)
+        if formato == 'svg':
+            return self.comparativo_svg(consumo_mensal, producao_mensal)
+        return self.comparativo(consumo_mensal, producao_mensal)
+
+    def retorno_docx(self, valores_acumulados):
+        """
+        Retorno no formato de PROPOSAL_CHART_FORMAT (ver comparativo_docx)
+        """
+        formato = formato_graficos()
+        if formato == 'nativo':
+            return self._renderizar(GraficoRetornoNativo, [float(v) for v in valores_acumulados])
+        if formato == 'svg':
+            return self.retorno_svg(valores_acumulados)
+        return self.retorno(valores_acumulados)
+
+    def aquecer(self):
+        """Monta os layouts e força a carga de fontes antes do primeiro job"""
+        # svg e nativo não usam matplotlib: só aquecem o próprio formato
+        self.comparativo_docx(1200, 1500)
+        self.retorno_docx([(ano - 5) * 10000.0 for ano in range(1, 26)])
+
+    def _renderizar(self, tipo, *series):
+        chave = self._chave(tipo.__name__, series)
+
+        with self._lock:
+            png = self._cache.get(chave)
+            if png is not None:
+                self._cache.move_to_end(chave)
+                self.hits += 1
+                return png
+
+            grafico = self._graficos.get(tipo)
+            if grafico is None:
+                grafico = self._graficos[tipo] = tipo()
+
+            png = grafico.renderizar(*series)
+            self.misses += 1
+            self._cache[chave] = png
+            while len(self._cache) > self.capacidade_cache:
+                self._cache.popitem(last=False)
+            return png
+
+    @staticmethod
+    def _chave(nome, series):
+        # Centavos/décimos de kWh bastam para distinguir imagens diferentes
+        conteudo = repr((nome, [[round(v, 2) for v in serie] for serie in series]))
+        return hashlib.sha1(conteudo.encode('utf-8')).hexdigest()
+
+
+motor_graficos = MotorGraficos(
+    capacidade_cache=int(os.environ.get('PROPOSAL_CHART_CACHE_SIZE', '128'))
+)
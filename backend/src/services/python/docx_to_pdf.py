@@ -1,94 +1,651 @@
 """
-Conversor de DOCX para PDF usando docx2pdf
+Conversor de DOCX para PDF
 Modo produção: lê JSON do stdin e retorna JSON no stdout
+Modo worker: um JSON por linha no stdin/stdout, mantendo o conversor aquecido
+
+Backends:
+- libreoffice: pool de instâncias headless do soffice (padrão no Linux)
+- docx2pdf: Microsoft Word via docx2pdf (padrão no Windows/macOS)
+
+O backend pode ser forçado com PDF_CONVERTER=libreoffice|docx2pdf.
+
+PDFs convertidos ficam no cache de saídas (output_cache.py), indexados pelo hash do
+DOCX e pelo conversor: o mesmo documento não é convertido duas vezes.
+
+Com PROPOSAL_PDF_STATIC_PAGES=1 (ou static_pages no job) as páginas do template que
+não têm tags são convertidas uma vez e reaproveitadas do cache; a cada proposta só os
+trechos com dados do cliente passam pelo conversor (ver paginas_estaticas.py).
 """
 
+import atexit
+import os
+import platform
+import queue
+import shutil
+import socket
+import subprocess
 import sys
 import json
+import tempfile
+import threading
+import time
 from pathlib import Path
 
 try:
-    from docx2pdf import convert
+    from . import protocolo
+    from .output_cache import cache_saidas, chave_pdf, digest_arquivo, versao_gerador
 except ImportError:
-    print(json.dumps({
-        'success': False,
-        'error': 'docx2pdf não instalado. Execute: pip install docx2pdf'
-    }), flush=True)
-    sys.exit(1)
+    import protocolo
+    from output_cache import cache_saidas, chave_pdf, digest_arquivo, versao_gerador
+
+
+# Timeout padrão de uma conversão (segundos)
+TIMEOUT_CONVERSAO = float(os.environ.get('PDF_CONVERT_TIMEOUT', '120'))
+
+# Páginas estáticas do template convertidas uma vez e juntadas ao PDF (padrão: desligado)
+_PAGINAS_ESTATICAS = os.environ.get('PROPOSAL_PDF_STATIC_PAGES', '0')
+
+
+def paginas_estaticas_ativas(parametro=None):
+    """
+    Se o PDF deve ser montado com as páginas estáticas em cache
+
+    Args:
+        parametro (bool): Valor do job (None: PROPOSAL_PDF_STATIC_PAGES)
+
+    Raises:
+        RuntimeError: Se PROPOSAL_PDF_STATIC_PAGES não for 0 ou 1
+    """
+    if parametro is not None:
+        return bool(parametro)
+    if _PAGINAS_ESTATICAS not in ('0', '1'):
+        raise RuntimeError(
+            f'PROPOSAL_PDF_STATIC_PAGES inválido: {_PAGINAS_ESTATICAS!r} (use 0 ou 1)'
+        )
+    return _PAGINAS_ESTATICAS == '1'
+
+
+def _aguardar_arquivo(caminho, timeout=5.0, intervalo=0.05):
+    """
+    Espera o arquivo existir com tamanho estável (conversores podem terminar de gravar
+    depois de retornar). Retorna assim que o arquivo estiver pronto, sem espera fixa.
+    """
+    limite = time.monotonic() + timeout
+    tamanho_anterior = -1
+    while time.monotonic() < limite:
+        if caminho.exists():
+            tamanho = caminho.stat().st_size
+            if tamanho > 0 and tamanho == tamanho_anterior:
+                return True
+            tamanho_anterior = tamanho
+        time.sleep(intervalo)
+    return caminho.exists()
+
+
+class ConversorDocx2Pdf:
+    """Conversão via docx2pdf (requer Microsoft Word)"""
+
+    nome = 'docx2pdf'
+
+    def __init__(self):
+        try:
+            from docx2pdf import convert
+        except ImportError:
+            raise RuntimeError('docx2pdf não instalado. Execute: pip install docx2pdf')
+        self._convert = convert
+
+    def aquecer(self):
+        pass
+
+    def converter(self, origem, pdf_path, timeout=None):
+        if isinstance(origem, (bytes, bytearray)):
+            # Word só abre arquivos: gravar os bytes em um temporário
+            with tempfile.TemporaryDirectory() as pasta:
+                docx_path = Path(pasta) / 'documento.docx'
+                docx_path.write_bytes(origem)
+                self.converter(docx_path, pdf_path, timeout)
+            return
+
+        # Nota: pode dar erro ao fechar Word mas PDF é gerado
+        try:
+            self._convert(str(origem), str(pdf_path))
+        except AttributeError as e:
+            # Erro conhecido: Word.Application.Quit
+            # Ignorar, pois o PDF já foi gerado
+            if 'Quit' not in str(e):
+                raise
+        _aguardar_arquivo(pdf_path)
+
+    def encerrar(self):
+        pass
+
+
+def _localizar_soffice():
+    """Localiza o executável do LibreOffice (LIBREOFFICE_PATH tem prioridade)"""
+    candidatos = [
+        os.environ.get('LIBREOFFICE_PATH'),
+        shutil.which('soffice'),
+        shutil.which('libreoffice'),
+        '/usr/lib/libreoffice/program/soffice',
+        '/opt/libreoffice/program/soffice',
+    ]
+    for candidato in candidatos:
+        if candidato and os.path.exists(candidato):
+            return candidato
+    raise RuntimeError('LibreOffice não encontrado. Instale o pacote libreoffice-writer '
+                       'ou defina LIBREOFFICE_PATH')
+
+
+def _porta_livre():
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def uno_disponivel():
+    """Se o módulo uno (python3-uno) está instalado para este Python"""
+    try:
+        import uno  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+class InstanciaLibreOffice:
+    """
+    Um processo soffice headless aquecido, com perfil próprio
+
+    Com o módulo uno disponível, o processo fica escutando em um socket UNO e cada
+    conversão é só load + store no processo já carregado. Sem uno, cada conversão roda
+    "soffice --convert-to" reaproveitando o perfil já inicializado desta instância.
+    """
+
+    def __init__(self, soffice, diretorio_base):
+        self.soffice = soffice
+        self.perfil = Path(tempfile.mkdtemp(prefix='lo_perfil_', dir=diretorio_base))
+        self.processo = None
+        self.contexto = None
+        self.desktop = None
+        self.jobs = 0
+        self.usa_uno = uno_disponivel()
+
+    def _argumentos_base(self):
+        return [
+            self.soffice, '--headless', '--invisible', '--nologo', '--nodefault',
+            '--norestore', '--nolockcheck', '--nofirststartwizard',
+            f'-env:UserInstallation={self.perfil.as_uri()}',
+        ]
+
+    def iniciar(self, timeout):
+        """Sobe o soffice e conecta via UNO (polling até ficar pronto)"""
+        if not self.usa_uno:
+            return
+
+        import uno
+        from com.sun.star.connection import NoConnectException
+
+        porta = _porta_livre()
+        url = f'socket,host=127.0.0.1,port={porta};urp;StarOffice.ComponentContext'
+        self.processo = subprocess.Popen(
+            self._argumentos_base() + [f'--accept={url}'],
+            stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+
+        local = uno.getComponentContext()
+        resolver = local.ServiceManager.createInstanceWithContext(
+            'com.sun.star.bridge.UnoUrlResolver', local)
+
+        limite = time.monotonic() + timeout
+        while True:
+            try:
+                self.contexto = resolver.resolve(f'uno:{url}')
+                break
+            except NoConnectException:
+                if self.processo.poll() is not None:
+                    raise RuntimeError(f'soffice encerrou ao iniciar (código {self.processo.returncode})')
+                if time.monotonic() > limite:
+                    raise TimeoutError('soffice não respondeu ao iniciar')
+                time.sleep(0.1)
+
+        self.desktop = self.contexto.ServiceManager.createInstanceWithContext(
+            'com.sun.star.frame.Desktop', self.contexto)
+
+    @property
+    def viva(self):
+        if not self.usa_uno:
+            return True
+        return self.processo is not None and self.processo.poll() is None
+
+    def converter(self, origem, pdf_path, timeout):
+        """
+        Args:
+            origem (Path | bytes): Arquivo DOCX ou seu conteúdo em memória
+            pdf_path (Path): Arquivo PDF de saída
+            timeout (float): Tempo máximo (usado no modo sem UNO)
+        """
+        if self.usa_uno:
+            self._converter_uno(origem, pdf_path)
+        elif isinstance(origem, (bytes, bytearray)):
+            with tempfile.TemporaryDirectory(dir=self.perfil.parent) as pasta:
+                docx_path = Path(pasta) / 'documento.docx'
+                docx_path.write_bytes(origem)
+                self._converter_cli(docx_path, pdf_path, timeout)
+        else:
+            self._converter_cli(origem, pdf_path, timeout)
+        self.jobs += 1
+
+    def _converter_uno(self, origem, pdf_path):
+        import uno
+        from com.sun.star.beans import PropertyValue
+
+        def propriedade(nome, valor):
+            p = PropertyValue()
+            p.Name = nome
+            p.Value = valor
+            return p
+
+        propriedades = (propriedade('Hidden', True), propriedade('ReadOnly', True))
+        if isinstance(origem, (bytes, bytearray)):
+            # Carregar direto da memória, sem arquivo intermediário
+            stream = self.contexto.ServiceManager.createInstanceWithContext(
+                'com.sun.star.io.SequenceInputStream', self.contexto)
+            stream.initialize((uno.ByteSequence(bytes(origem)),))
+            url = 'private:stream'
+            propriedades += (propriedade('InputStream', stream),
+                             propriedade('FilterName', 'MS Word 2007 XML'))
+        else:
+            url = uno.systemPathToFileUrl(str(Path(origem).absolute()))
+
+        documento = self.desktop.loadComponentFromURL(url, '_blank', 0, propriedades)
+        if documento is None:
+            raise RuntimeError('LibreOffice não conseguiu abrir o DOCX')
+        try:
+            documento.storeToURL(
+                uno.systemPathToFileUrl(str(Path(pdf_path).absolute())),
+                (propriedade('FilterName', 'writer_pdf_Export'), propriedade('Overwrite', True)))
+        finally:
+            documento.close(True)
+
+    def _converter_cli(self, docx_path, pdf_path, timeout):
+        with tempfile.TemporaryDirectory(dir=self.perfil.parent) as saida:
+            subprocess.run(
+                self._argumentos_base() + ['--convert-to', 'pdf', '--outdir', saida, str(docx_path)],
+                stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+                timeout=timeout, check=True,
+            )
+            gerado = Path(saida) / (Path(docx_path).stem + '.pdf')
+            if not gerado.exists():
+                raise RuntimeError('soffice não gerou o PDF')
+            shutil.move(str(gerado), str(pdf_path))
+
+    def encerrar(self):
+        if self.desktop is not None:
+            try:
+                self.desktop.terminate()
+            except Exception:
+                pass
+            self.desktop = None
+        if self.processo is not None:
+            try:
+                self.processo.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                self.processo.kill()
+                self.processo.wait()
+            self.processo = None
+        shutil.rmtree(self.perfil, ignore_errors=True)
+
+
+class PoolLibreOffice:
+    """
+    Pool de instâncias headless do LibreOffice
+
+    - Instâncias sobem sob demanda até o tamanho do pool e ficam aquecidas
+    - Cada conversão tem timeout próprio; instância travada é morta e substituída
+    - Instâncias são recicladas após max_jobs conversões ou em caso de erro/crash
+
+    Sem o módulo uno o pool funciona, mas cada conversão sobe um "soffice
+    --convert-to" (só o perfil fica aquecido): avisa no stderr ao criar o pool e
+    relatorio_aquecimento / health do job_server mostram usa_uno.
+    """
+
+    nome = 'libreoffice'
+
+    def __init__(self, tamanho=None, max_jobs=None, timeout_inicio=60):
+        self.tamanho = tamanho or int(os.environ.get('LIBREOFFICE_POOL_SIZE', '1'))
+        self.max_jobs = max_jobs or int(os.environ.get('LIBREOFFICE_MAX_JOBS', '50'))
+        self.timeout_inicio = timeout_inicio
+        self.soffice = _localizar_soffice()
+        self.usa_uno = uno_disponivel()
+        if not self.usa_uno:
+            print('[docx_to_pdf] Módulo uno indisponível: cada conversão vai rodar '
+                  '"soffice --convert-to" (instale python3-uno para converter no soffice aquecido)',
+                  file=sys.stderr)
+        self.diretorio_base = tempfile.mkdtemp(prefix='lo_pool_')
+        self._livres = queue.LifoQueue()
+        self._criadas = 0
+        self._instancias = set()
+        self._lock = threading.Lock()
+
+    def _adquirir(self):
+        while True:
+            try:
+                return self._livres.get_nowait()
+            except queue.Empty:
+                pass
+
+            with self._lock:
+                criar = self._criadas < self.tamanho
+                if criar:
+                    self._criadas += 1
+            if criar:
+                break
+
+            # Pool cheio: esperar uma instância voltar (ou ser descartada e liberar vaga)
+            try:
+                return self._livres.get(timeout=0.5)
+            except queue.Empty:
+                continue
+
+        instancia = InstanciaLibreOffice(self.soffice, self.diretorio_base)
+        try:
+            instancia.iniciar(self.timeout_inicio)
+        except Exception:
+            instancia.encerrar()
+            with self._lock:
+                self._criadas -= 1
+            raise
+        with self._lock:
+            self._instancias.add(instancia)
+        return instancia
+
+    def aquecer(self):
+        """Sobe uma instância antes da primeira conversão"""
+        self._livres.put(self._adquirir())
+
+    def _descartar(self, instancia):
+        with self._lock:
+            self._instancias.discard(instancia)
+            self._criadas -= 1
+        threading.Thread(target=instancia.encerrar, daemon=True).start()
+
+    def converter(self, origem, pdf_path, timeout=None):
+        """
+        Converte para um temporário ao lado de pdf_path e o move no lugar só no sucesso:
+        timeout ou erro não deixam PDF parcial (nem confundem com um PDF antigo)
+        """
+        timeout = timeout or TIMEOUT_CONVERSAO
+        pdf_path = Path(pdf_path)
+        fd, temporario = tempfile.mkstemp(prefix=f'.{pdf_path.stem}.', suffix='.pdf.tmp',
+                                          dir=pdf_path.parent)
+        os.close(fd)
+        temporario = Path(temporario)
+        try:
+            self._converter_instancia(origem, temporario, timeout)
+            if temporario.stat().st_size == 0:
+                raise RuntimeError('LibreOffice gerou um PDF vazio')
+            os.replace(temporario, pdf_path)
+        finally:
+            temporario.unlink(missing_ok=True)
+
+    def _converter_instancia(self, origem, pdf_path, timeout):
+        instancia = self._adquirir()
+
+        erro = []
+
+        def executar():
+            try:
+                instancia.converter(origem, pdf_path, timeout)
+            except BaseException as e:
+                erro.append(e)
+
+        tarefa = threading.Thread(target=executar, daemon=True)
+        tarefa.start()
+        tarefa.join(timeout)
+
+        if tarefa.is_alive():
+            # Instância travada: matar o processo libera a thread bloqueada no UNO
+            if instancia.processo is not None:
+                instancia.processo.kill()
+            self._descartar(instancia)
+            raise TimeoutError(f'Conversão excedeu {timeout:.0f}s')
+
+        if erro or not instancia.viva:
+            self._descartar(instancia)
+            if erro:
+                raise erro[0]
+            raise RuntimeError('Instância do LibreOffice encerrou durante a conversão')
+
+        if instancia.jobs >= self.max_jobs:
+            self._descartar(instancia)
+        else:
+            self._livres.put(instancia)
+
+    def encerrar(self):
+        with self._lock:
+            instancias = list(self._instancias)
+            self._instancias.clear()
+        for instancia in instancias:
+            instancia.encerrar()
+        shutil.rmtree(self.diretorio_base, ignore_errors=True)
+
+
+_conversor = None
+_conversor_lock = threading.Lock()
+
+
+def obter_conversor():
+    """Retorna o conversor do processo (criado uma vez e reaproveitado)"""
+    global _conversor
+    with _conversor_lock:
+        if _conversor is None:
+            backend = os.environ.get('PDF_CONVERTER', '').lower()
+            if not backend:
+                backend = 'libreoffice' if platform.system() == 'Linux' else 'docx2pdf'
+            if backend == 'libreoffice':
+                _conversor = PoolLibreOffice()
+            elif backend == 'docx2pdf':
+                _conversor = ConversorDocx2Pdf()
+            else:
+                raise RuntimeError(f'PDF_CONVERTER inválido: {backend}')
+            atexit.register(_conversor.encerrar)
+        return _conversor
+
 
+def _pdf_do_cache(conteudo, conversor, pdf_path):
+    """
+    Consulta o cache de PDFs
 
-def convert_docx_to_pdf(docx_path: str, pdf_path: str = None) -> dict:
+    Returns:
+        tuple: (chave para gravar depois ou None, resultado pronto se for acerto)
+    """
+    if not cache_saidas.ativo:
+        return None, None
+    chave = chave_pdf(conteudo, conversor.nome)
+    if not cache_saidas.copiar(chave, '.pdf', pdf_path):
+        return chave, None
+    return chave, {
+        'success': True,
+        'pdf_path': str(Path(pdf_path).absolute()),
+        'file_size': Path(pdf_path).stat().st_size,
+        'converter': conversor.nome,
+        'cache': 'hit'
+    }
+
+
+def _converter_em_trechos(conteudo, conversor, pdf_path, timeout, template_path):
+    """
+    Converte o DOCX trecho a trecho, reaproveitando do cache os trechos estáticos
+
+    Returns:
+        dict | None: Resumo (trechos, estáticos, do cache), ou None se o documento não
+            puder ser dividido (o chamador converte o documento inteiro)
+    """
+    try:
+        from . import paginas_estaticas
+    except ImportError:
+        import paginas_estaticas
+
+    if not paginas_estaticas.pypdf_disponivel():
+        return None
+    try:
+        digest = digest_arquivo(template_path)
+    except OSError:
+        return None
+    modelo = paginas_estaticas.modelo_paginas(digest, Path(template_path).read_bytes)
+    documento = paginas_estaticas.DocumentoPaginas(conteudo)
+    trechos = documento.trechos(modelo)
+    if trechos is None:
+        return None
+
+    resumo = {'segments': len(trechos), 'static': 0, 'cached': 0}
+    with tempfile.TemporaryDirectory() as pasta:
+        pdfs = []
+        for indice, (estatico, blocos) in enumerate(trechos):
+            destino = Path(pasta) / f'trecho_{indice}.pdf'
+            chave = None
+            if estatico:
+                resumo['static'] += 1
+                chave = documento.chave_trecho(blocos, conversor.nome, versao_gerador())
+                if cache_saidas.copiar(chave, '.pdf', destino):
+                    resumo['cached'] += 1
+                    pdfs.append(destino)
+                    continue
+            conversor.converter(documento.docx_trecho(blocos), destino, timeout)
+            if not destino.exists():
+                raise RuntimeError('Conversão executada mas PDF do trecho não foi criado')
+            if chave:
+                cache_saidas.gravar(chave, '.pdf', origem=destino)
+            pdfs.append(destino)
+        paginas_estaticas.concatenar_pdfs(pdfs, pdf_path)
+    return resumo
+
+
+def convert_docx_to_pdf(docx_path: str, pdf_path: str = None, timeout: float = None,
+                        cache: bool = True) -> dict:
     """
     Converte arquivo DOCX para PDF
-    
+
     Args:
         docx_path: Caminho do arquivo DOCX de entrada
         pdf_path: Caminho do arquivo PDF de saída (opcional, usa mesmo nome)
-    
+        timeout: Tempo máximo da conversão em segundos (padrão: PDF_CONVERT_TIMEOUT)
+        cache: Consultar/gravar o cache de PDFs (output_cache)
+
     Returns:
-        dict com success, pdf_path e file_size
+        dict com success, pdf_path, file_size e cache ('hit'/'miss', com cache ativo)
     """
     try:
-        import time
         docx_path = Path(docx_path)
-        
+
         if not docx_path.exists():
             return {
                 'success': False,
                 'error': f'Arquivo DOCX não encontrado: {docx_path}'
             }
-        
-        # Aguardar um pouco para garantir que o arquivo está fechado
-        time.sleep(0.5)
-        
+
         # Se não especificou caminho de saída, usa o mesmo diretório
         if pdf_path is None:
             pdf_path = docx_path.with_suffix('.pdf')
         else:
             pdf_path = Path(pdf_path)
-        
+
         # Criar diretório de saída se não existir
         pdf_path.parent.mkdir(parents=True, exist_ok=True)
-        
-        # Converter DOCX para PDF
-        # Nota: pode dar erro ao fechar Word mas PDF é gerado
-        try:
-            convert(str(docx_path), str(pdf_path))
-        except AttributeError as e:
-            # Erro conhecido: Word.Application.Quit
-            # Ignorar, pois o PDF já foi gerado
-            if 'Quit' not in str(e):
-                raise
-        
-        # Aguardar conversão finalizar
-        time.sleep(0.5)
-        
+
+        conversor = obter_conversor()
+        chave = None
+        if cache:
+            chave, acerto = _pdf_do_cache(docx_path.read_bytes(), conversor, pdf_path)
+            if acerto:
+                return acerto
+
+        conversor.converter(docx_path, pdf_path, timeout)
+
         # Verificar se o PDF foi criado
         if not pdf_path.exists():
             return {
                 'success': False,
                 'error': 'Conversão executada mas arquivo PDF não foi criado'
             }
-        
+
         # Obter tamanho do arquivo
         file_size = pdf_path.stat().st_size
-        
-        return {
+
+        resultado = {
             'success': True,
             'pdf_path': str(pdf_path.absolute()),
-            'file_size': file_size
+            'file_size': file_size,
+            'converter': conversor.nome
         }
-        
+        if chave:
+            cache_saidas.gravar(chave, '.pdf', origem=pdf_path)
+            resultado['cache'] = 'miss'
+        return resultado
+
     except Exception as e:
-        # Mesmo com erro, verificar se PDF foi gerado
-        if pdf_path and Path(pdf_path).exists():
+        # Sem PDF "aproveitado": o pool só grava pdf_path no sucesso e o erro conhecido
+        # do docx2pdf (Word.Application.Quit) já é tratado em ConversorDocx2Pdf
+        return {
+            'success': False,
+            'error': str(e),
+            'traceback': __import__('traceback').format_exc()
+        }
+
+
+def convert_bytes_to_pdf(conteudo: bytes, pdf_path: str, timeout: float = None,
+                         cache: bool = True, template_path: str = None,
+                         static_pages: bool = None) -> dict:
+    """
+    Converte um DOCX em memória para PDF (usado pelo pipeline DOCX+PDF do gerador)
+
+    Args:
+        conteudo: Bytes do DOCX
+        pdf_path: Caminho do arquivo PDF de saída
+        timeout: Tempo máximo da conversão em segundos
+        cache: Consultar/gravar o cache de PDFs (output_cache)
+        template_path: Template que gerou o DOCX (necessário para as páginas estáticas)
+        static_pages: Montar o PDF com as páginas estáticas em cache (None:
+            PROPOSAL_PDF_STATIC_PAGES)
+
+    Returns:
+        dict com success, pdf_path, file_size, cache ('hit'/'miss', com cache ativo) e
+        static_pages (trechos, estáticos e do cache) quando o PDF foi montado por trechos
+    """
+    pdf_path = Path(pdf_path)
+    try:
+        pdf_path.parent.mkdir(parents=True, exist_ok=True)
+        conversor = obter_conversor()
+        chave = None
+        if cache:
+            chave, acerto = _pdf_do_cache(conteudo, conversor, pdf_path)
+            if acerto:
+                return acerto
+
+        trechos = None
+        if chave and template_path and paginas_estaticas_ativas(static_pages):
+            trechos = _converter_em_trechos(conteudo, conversor, pdf_path, timeout, template_path)
+        if trechos is None:
+            conversor.converter(conteudo, pdf_path, timeout)
+
+        if not pdf_path.exists():
             return {
-                'success': True,
-                'pdf_path': str(Path(pdf_path).absolute()),
-                'file_size': Path(pdf_path).stat().st_size,
-                'warning': f'PDF gerado mas houve erro: {str(e)}'
+                'success': False,
+                'error': 'Conversão executada mas arquivo PDF não foi criado'
             }
-        
+
+        resultado = {
+            'success': True,
+            'pdf_path': str(pdf_path.absolute()),
+            'file_size': pdf_path.stat().st_size,
+            'converter': conversor.nome
+        }
+        if trechos is not None:
+            resultado['static_pages'] = trechos
+        if chave:
+            cache_saidas.gravar(chave, '.pdf', origem=pdf_path)
+            resultado['cache'] = 'miss'
+        return resultado
+    except Exception as e:
         return {
             'success': False,
             'error': str(e),
@@ -96,60 +653,131 @@ def convert_docx_to_pdf(docx_path: str, pdf_path: str = None) -> dict:
         }
 
 
+def processar_job(params, progresso=None):
+    """
+    Executa um job de conversão recebido do backend
+
+    Args:
+        params (dict): docx_path, pdf_path (opcional), timeout (opcional, segundos),
+            cache (padrão: True), template_path e static_pages (opcionais: páginas
+            estáticas, ver convert_bytes_to_pdf)
+        progresso: Callback progresso(etapa, **dados); recebe saved ao gravar o PDF
+
+    Returns:
+        dict: Resultado no formato esperado pelo backend TypeScript
+    """
+    docx_path = params.get('docx_path')
+    if not docx_path:
+        return {
+            'success': False,
+            'error': 'Campo "docx_path" é obrigatório'
+        }
+    if params.get('template_path') and Path(docx_path).exists():
+        pdf_path = params.get('pdf_path') or Path(docx_path).with_suffix('.pdf')
+        resultado = convert_bytes_to_pdf(
+            Path(docx_path).read_bytes(), pdf_path, params.get('timeout'),
+            params.get('cache', True), params['template_path'], params.get('static_pages')
+        )
+    else:
+        resultado = convert_docx_to_pdf(
+            docx_path, params.get('pdf_path'), params.get('timeout'), params.get('cache', True)
+        )
+    if progresso and resultado['success']:
+        progresso('saved', pdf_path=resultado['pdf_path'])
+    return resultado
+
+
+def relatorio_aquecimento():
+    """
+    Custo de inicialização do conversor: imports opcionais (uno, docx2pdf) e subida
+    do backend (instância do LibreOffice ou carga do docx2pdf)
+
+    Returns:
+        dict: Ver instrumentacao.relatorio_inicializacao, mais conversor (backend) e
+            usa_uno (False: uma execução do soffice por conversão; None fora do LibreOffice)
+    """
+    try:
+        from .instrumentacao import relatorio_inicializacao
+    except ImportError:
+        from instrumentacao import relatorio_inicializacao
+
+    relatorio = relatorio_inicializacao(['uno', 'docx2pdf'], lambda: obter_conversor().aquecer())
+    conversor = obter_conversor()
+    relatorio['conversor'] = conversor.nome
+    relatorio['usa_uno'] = getattr(conversor, 'usa_uno', None)
+    return relatorio
+
+
+def executar_worker(entrada=None, saida=None):
+    """
+    MODO WORKER: processo de longa duração mantido em pool pelo backend
+
+    Mesmo protocolo do proposal_generator.py --worker (ver protocolo.py).
+    """
+    protocolo.executar_worker(processar_job, entrada=entrada, saida=saida)
+
+
 if __name__ == "__main__":
-    # Modo produção: JSON via stdin/stdout
-    if len(sys.argv) > 1 and sys.argv[1] == "--production":
+    # Modo worker: job JSON por linha no stdin, eventos no stdout
+    if len(sys.argv) > 1 and sys.argv[1] == "--worker":
+        executar_worker()
+        sys.exit(0)
+
+    # Modo aquecimento: custo de import e de subida do conversor
+    elif len(sys.argv) > 1 and sys.argv[1] == "--warmup":
+        try:
+            from .instrumentacao import imprimir_relatorio_inicializacao
+        except ImportError:
+            from instrumentacao import imprimir_relatorio_inicializacao
+
+        print("\n*** Inicialização do conversor DOCX -> PDF\n")
+        relatorio = relatorio_aquecimento()
+        if relatorio['usa_uno'] is not None:
+            modo = 'UNO (soffice aquecido)' if relatorio['usa_uno'] else 'soffice --convert-to por conversão'
+            print(f"  {'conversão':<47} {modo}")
+        imprimir_relatorio_inicializacao(relatorio)
+        sys.exit(0)
+
+    # Modo produção: JSON via stdin, eventos no stdout (última linha = result/error)
+    elif len(sys.argv) > 1 and sys.argv[1] == "--production":
+        canal = protocolo.abrir_canal()
         try:
             # Ler JSON do stdin
             input_data = sys.stdin.read()
             data = json.loads(input_data)
-            
-            docx_path = data.get('docx_path')
-            pdf_path = data.get('pdf_path')  # opcional
-            
-            if not docx_path:
-                result = {
-                    'success': False,
-                    'error': 'Campo "docx_path" é obrigatório'
-                }
-            else:
-                result = convert_docx_to_pdf(docx_path, pdf_path)
-            
-            # Retornar JSON no stdout
-            print(json.dumps(result), flush=True)
+
+            result = protocolo.executar_job(canal, processar_job, data, data.get('id'))
             sys.exit(0 if result['success'] else 1)
-            
+
         except json.JSONDecodeError as e:
-            print(json.dumps({
+            canal.finalizar({
                 'success': False,
                 'error': f'JSON inválido: {str(e)}'
-            }), flush=True)
+            })
             sys.exit(1)
         except Exception as e:
-            print(json.dumps({
-                'success': False,
-                'error': str(e),
-                'traceback': __import__('traceback').format_exc()
-            }), flush=True)
+            canal.finalizar(protocolo.erro(e))
             sys.exit(1)
-    
+
     # Modo teste: argumentos de linha de comando
     else:
         if len(sys.argv) < 2:
             print("Uso:")
             print("  Modo produção: python docx_to_pdf.py --production < input.json")
+            print("  Modo worker: python docx_to_pdf.py --worker  (um JSON por linha)")
+            print("  Aquecimento: python docx_to_pdf.py --warmup  (custo de inicialização)")
             print("  Modo teste: python docx_to_pdf.py arquivo.docx [saida.pdf]")
             sys.exit(1)
-        
+
         docx_path = sys.argv[1]
         pdf_path = sys.argv[2] if len(sys.argv) > 2 else None
-        
+
         print(f"Convertendo: {docx_path}")
         if pdf_path:
             print(f"Saída: {pdf_path}")
-        
+
         result = convert_docx_to_pdf(docx_path, pdf_path)
-        
+
         if result['success']:
             print(f"OK! PDF gerado: {result['pdf_path']}")
             print(f"   Tamanho: {result['file_size']:,} bytes ({result['file_size']/1024:.2f} KB)")
@@ -0,0 +1,243 @@
+"""
+Gravação do DOCX de saída copiando do zip do template os membros que não mudaram
+
+O save do python-docx descomprime e recomprime todos os membros a cada proposta,
+inclusive mídia estática grande (logos, fotos de produto). EscritorZip substitui o
+PhysPkgWriter do python-docx na mesma sequência de PackageWriter (content types, rels
+do pacote, partes e rels de cada parte) e, para cada membro:
+
+- se o conteúdo é o do template (mesmo objeto bytes ou mesmo tamanho e CRC-32), copia
+  os bytes comprimidos do zip do template, sem inflate nem deflate
+- senão (document.xml, rels, imagens dos gráficos...), comprime com
+  PROPOSAL_DOCX_COMPRESSION (0 = sem compressão, 1 = mais rápido, 9 = menor)
+
+Todos os membros saem com a mesma data (DATA_ZIP), então o mesmo documento gera os
+mesmos bytes (o cache de PDF é endereçado pelos bytes do DOCX).
+"""
+
+import io
+import os
+import struct
+import zipfile
+import zlib
+
+from docx.opc.pkgwriter import PackageWriter
+
+
+DATA_ZIP = (1980, 1, 1, 0, 0, 0)
+
+_NIVEL_COMPRESSAO = os.environ.get('PROPOSAL_DOCX_COMPRESSION', '6')
+
+_LOCAL = struct.Struct('<4s5H3L2H')
+_CENTRAL = struct.Struct('<4s6H3L5H2L')
+_FIM = struct.Struct('<4s4H2LH')
+_ASSINATURA_LOCAL = b'PK\x03\x04'
+_ASSINATURA_CENTRAL = b'PK\x01\x02'
+_ASSINATURA_FIM = b'PK\x05\x06'
+_VERSAO = 20
+_FLAG_UTF8 = 0x800
+
+
+def nivel_compressao():
+    """
+    Nível de compressão dos membros alterados (PROPOSAL_DOCX_COMPRESSION)
+
+    Raises:
+        RuntimeError: Se o valor não for um inteiro de 0 a 9
+    """
+    try:
+        nivel = int(_NIVEL_COMPRESSAO)
+    except ValueError:
+        nivel = -1
+    if not 0 <= nivel <= 9:
+        raise RuntimeError(
+            f'PROPOSAL_DOCX_COMPRESSION inválido: {_NIVEL_COMPRESSAO!r} (use um inteiro de 0 a 9)'
+        )
+    return nivel
+
+
+def _data_dos(data):
+    ano, mes, dia, hora, minuto, segundo = data
+    return (hora << 11) | (minuto << 5) | (segundo // 2), ((ano - 1980) << 9) | (mes << 5) | dia
+
+
+class MembrosZip:
+    """Índice dos membros do zip do template: nome -> posição dos bytes comprimidos"""
+
+    def __init__(self, conteudo, blobs=None):
+        """
+        Args:
+            conteudo (bytes): Bytes do arquivo .docx do template
+            blobs (dict): nome -> bytes já descomprimidos das partes do template
+                (opcional; uma parte com o mesmo objeto bytes é copiada sem CRC)
+        """
+        self.conteudo = conteudo
+        self._blobs = blobs or {}
+        self._membros = {}  # nome -> (método, crc, tamanho comprimido, tamanho, início)
+        with zipfile.ZipFile(io.BytesIO(conteudo)) as zip_template:
+            for info in zip_template.infolist():
+                # Criptografados ou com outros métodos não são copiados
+                if info.flag_bits & 0x1 or info.compress_type not in (zipfile.ZIP_STORED,
+                                                                      zipfile.ZIP_DEFLATED):
+                    continue
+                cabecalho = _LOCAL.unpack_from(conteudo, info.header_offset)
+                inicio = info.header_offset + _LOCAL.size + cabecalho[9] + cabecalho[10]
+                self._membros[info.filename] = (
+                    info.compress_type, info.CRC, info.compress_size, info.file_size, inicio,
+                )
+
+    def __contains__(self, nome):
+        """Se o membro pode ser copiado sem descomprimir"""
+        return nome in self._membros
+
+    def bruto(self, nome):
+        """Dados do membro do template sem comparar conteúdo (mesma tupla de copiavel)"""
+        metodo, crc, comprimido, tamanho, inicio = self._membros[nome]
+        return metodo, crc, comprimido, tamanho, memoryview(self.conteudo)[inicio:inicio + comprimido]
+
+    def copiavel(self, nome, blob):
+        """
+        Dados do membro do template se blob for o seu conteúdo, ou None
+
+        Returns:
+            tuple | None: (método, crc, tamanho comprimido, tamanho, bytes comprimidos)
+        """
+        membro = self._membros.get(nome)
+        if membro is None or membro[3] != len(blob):
+            return None
+        metodo, crc, comprimido, tamanho, inicio = membro
+        if blob is not self._blobs.get(nome) and zlib.crc32(blob) != crc:
+            return None
+        return metodo, crc, comprimido, tamanho, memoryview(self.conteudo)[inicio:inicio + comprimido]
+
+
+class EscritorZip:
+    """Substituto do PhysPkgWriter do python-docx (ver docstring do módulo)"""
+
+    def __init__(self, destino, membros, nivel):
+        """
+        Args:
+            destino: Caminho ou arquivo binário aberto para escrita
+            membros (MembrosZip): Membros do template (None: comprime tudo)
+            nivel (int): Nível de compressão dos membros alterados (0 a 9)
+        """
+        self._proprio = not hasattr(destino, 'write')
+        self._arquivo = open(destino, 'wb') if self._proprio else destino
+        self._membros = membros
+        self._nivel = nivel
+        self._posicao = 0
+        self._central = []
+        self.copiados = 0
+        self.comprimidos = 0
+
+    def write(self, pack_uri, blob):
+        self.gravar(pack_uri.membername, blob)
+
+    def gravar(self, nome, blob):
+        """Grava um membro pelo nome no zip (copiado do template se não mudou)"""
+        dados = self._membros.copiavel(nome, blob) if self._membros is not None else None
+        if dados is not None:
+            self.copiados += 1
+        else:
+            self.comprimidos += 1
+            if self._nivel:
+                compressor = zlib.compressobj(self._nivel, zlib.DEFLATED, -15)
+                comprimido = compressor.compress(blob) + compressor.flush()
+                dados = (zipfile.ZIP_DEFLATED, zlib.crc32(blob), len(comprimido), len(blob), comprimido)
+            else:
+                dados = (zipfile.ZIP_STORED, zlib.crc32(blob), len(blob), len(blob), blob)
+        self._escrever_membro(nome, *dados)
+
+    def copiar(self, nome):
+        """Copia um membro do zip de origem sem descomprimir"""
+        self.copiados += 1
+        self._escrever_membro(nome, *self._membros.bruto(nome))
+
+    def _escrever_membro(self, nome, metodo, crc, comprimido, tamanho, conteudo):
+        nome_bytes = nome.encode('utf-8')
+        flags = 0 if nome.isascii() else _FLAG_UTF8
+        hora, data = _data_dos(DATA_ZIP)
+        self._arquivo.write(_LOCAL.pack(
+            _ASSINATURA_LOCAL, _VERSAO, flags, metodo, hora, data, crc, comprimido, tamanho,
+            len(nome_bytes), 0,
+        ))
+        self._arquivo.write(nome_bytes)
+        self._arquivo.write(conteudo)
+        self._central.append(_CENTRAL.pack(
+            _ASSINATURA_CENTRAL, _VERSAO, _VERSAO, flags, metodo, hora, data, crc, comprimido,
+            tamanho, len(nome_bytes), 0, 0, 0, 0, 0, self._posicao,
+        ) + nome_bytes)
+        self._posicao += _LOCAL.size + len(nome_bytes) + comprimido
+
+    def close(self):
+        diretorio = b''.join(self._central)
+        self._arquivo.write(diretorio)
+        self._arquivo.write(_FIM.pack(
+            _ASSINATURA_FIM, 0, 0, len(self._central), len(self._central), len(diretorio),
+            self._posicao, 0,
+        ))
+        if self._proprio:
+            self._arquivo.close()
+
+    def abortar(self):
+        """Fecha o arquivo aberto pelo escritor sem gravar o diretório central"""
+        if self._proprio:
+            self._arquivo.close()
+
+
+def salvar_pacote(pacote, destino, membros=None, nivel=None):
+    """
+    Grava o pacote do python-docx como OpcPackage.save, copiando do template os
+    membros inalterados
+
+    Args:
+        pacote: Package do documento renderizado (documento.part.package)
+        destino: Caminho ou arquivo binário aberto para escrita
+        membros (MembrosZip): Membros do zip do template
+        nivel (int): Nível de compressão (padrão: PROPOSAL_DOCX_COMPRESSION)
+
+    Returns:
+        EscritorZip: Escritor usado (contadores copiados/comprimidos)
+    """
+    nivel = nivel_compressao() if nivel is None else nivel
+    partes = list(pacote.parts)
+    for parte in partes:
+        parte.before_marshal()
+    escritor = EscritorZip(destino, membros, nivel)
+    try:
+        PackageWriter._write_content_types_stream(escritor, partes)
+        PackageWriter._write_pkg_rels(escritor, pacote.rels)
+        PackageWriter._write_parts(escritor, partes)
+    except BaseException:
+        escritor.abortar()
+        raise
+    escritor.close()
+    return escritor
+
+
+def substituir_membros(conteudo, substituicoes, nivel=None):
+    """
+    Novo zip com alguns membros trocados e os demais copiados sem recomprimir
+
+    Args:
+        conteudo (bytes): Bytes do .docx de origem
+        substituicoes (dict): nome -> novos bytes do membro
+        nivel (int): Nível de compressão (padrão: PROPOSAL_DOCX_COMPRESSION)
+
+    Returns:
+        bytes: O novo .docx
+    """
+    nivel = nivel_compressao() if nivel is None else nivel
+    membros = MembrosZip(conteudo)
+    destino = io.BytesIO()
+    escritor = EscritorZip(destino, membros, nivel)
+    with zipfile.ZipFile(io.BytesIO(conteudo)) as zip_origem:
+        for nome in zip_origem.namelist():
+            if nome in substituicoes:
+                escritor.gravar(nome, substituicoes[nome])
+            elif nome in membros:
+                escritor.copiar(nome)
+            else:
+                escritor.gravar(nome, zip_origem.read(nome))
+    escritor.close()
+    return destino.getvalue()
@@ -0,0 +1,168 @@
+"""
+Formatação e leitura de valores no padrão brasileiro (R$ 1.234,56)
+
+Substitui as cadeias f"R$ {v:,.2f}".replace(',', 'X').replace('.', ',').replace('X', '.')
+espalhadas pelo gerador. Os números são formatados com o separador de milhar '_'
+do Python e localizados com duas trocas (',' decimal, '.' milhar), sem o passo
+intermediário pelo 'X'.
+
+Para colunas inteiras (fluxo de caixa, tabelas do template) formatar_lote monta um
+único padrão para a coluna toda, formata com uma chamada de str.format e localiza o
+texto de uma vez, em vez de uma formatação e três trocas por célula. interpretar_lote
+faz o inverso: confere a coluna inteira com um regex e converte o texto de uma vez.
+
+Uso:
+    moeda(1234.5)                          # 'R$ 1.234,50'
+    formatar_lote(fluxo['eco'], 'moeda')   # ['R$ 1.142,00', ...]
+    interpretar_numero('R$ 1.234,56')      # 1234.56
+    interpretar_lote(tabela_eco_ac)        # [1142.0, 2341.1, ...]
+"""
+
+import math
+import re
+
+
+# Padrão de cada tipo: (formato com '_' de milhar e '.' decimal, conversão prévia)
+PADROES = {
+    'moeda': ('R$ {:_.2f}', None),       # R$ 1.234,56
+    'inteiro': ('{:_.0f}', None),        # 1.234 (arredondado)
+    'tarifa': ('{:.2f}', None),          # 0,92
+    'kwh': ('{} kWh', int),              # 1500 kWh (truncado, sem milhar)
+    'percentual': ('{:_.0f}%', None),    # 28%
+}
+
+# Formato brasileiro: sinal antes ou depois de "R$", milhar com '.', decimal com ','
+_BRASILEIRO = re.compile(r'(-?)(?:R\$\s*)?(-?)(\d{1,3}(?:\.\d{3})+|\d+)(?:,(\d+))?')
+# Formato numérico simples (já convertido): 1234.56, -0.5, 1e3
+_DECIMAL = re.compile(r'[+-]?(?:\d+(?:\.\d*)?|\.\d+)(?:[eE][+-]?\d+)?')
+# Exatamente como moeda() escreve ('R$ 1.234,56', 'R$ -0,50'): conferido sem grupos e
+# convertido com trocas de texto
+_MOEDA = re.compile(r'R\$ -?[0-9]{1,3}(?:\.[0-9]{3})*,[0-9]{2}')
+_MOEDA_LOTE = re.compile(r'(?:R\$ -?[0-9]{1,3}(?:\.[0-9][0-9][0-9])*,[0-9][0-9]\n)*')
+
+
+def _localizar(texto):
+    return texto.replace('.', ',').replace('_', '.')
+
+
+def moeda(valor):
+    """Valor em reais: 1234.5 -> 'R$ 1.234,50' (negativos: 'R$ -1.234,50')"""
+    return f"R$ {valor:_.2f}".replace('.', ',').replace('_', '.')
+
+
+def inteiro(valor):
+    """Inteiro com milhar: 1234.6 -> '1.235'"""
+    return f"{valor:_.0f}".replace('_', '.')
+
+
+def tarifa(valor):
+    """Tarifa com duas casas: 0.9234 -> '0,92'"""
+    return f"{valor:.2f}".replace('.', ',')
+
+
+def kwh(valor):
+    """Energia mensal: 1500.7 -> '1500 kWh'"""
+    return f"{int(valor)} kWh"
+
+
+def percentual(valor, casas=0):
+    """Percentual: 28 -> '28%', percentual(28.25, 1) -> '28,2%'"""
+    return _localizar(f"{valor:_.{casas}f}%")
+
+
+def anos(valor, casas=1):
+    """Prazo em anos: 3.46 -> '3,5'"""
+    return _localizar(f"{valor:_.{casas}f}")
+
+
+def formatar_lote(valores, tipo):
+    """
+    Formata uma coluna inteira de valores de uma vez
+
+    Args:
+        valores: Array NumPy ou sequência de números
+        tipo (str): Chave de PADROES ('moeda', 'inteiro', 'tarifa', 'kwh', 'percentual')
+
+    Returns:
+        list: Strings na mesma ordem, iguais às das funções escalares
+    """
+    padrao, conversao = PADROES[tipo]
+    if hasattr(valores, 'tolist'):
+        # Floats Python: formatar escalares NumPy um a um é bem mais lento
+        valores = valores.tolist()
+    if conversao is not None:
+        valores = [conversao(valor) for valor in valores]
+    if not valores:
+        return []
+    texto = ((padrao + '\n') * len(valores)).format(*valores)
+    return _localizar(texto).split('\n')[:-1]
+
+
+def interpretar_numero(texto):
+    """
+    Lê um número em formato brasileiro ou numérico simples (inverso de moeda/inteiro/tarifa)
+
+    Aceita 'R$ 1.234,56', 'R$ -1.234,56', '-R$ 10,00', '1142,00', '1.234' com "R$",
+    além de números já convertidos ('1234.56', 1234.56). Sem "R$" e sem vírgula o
+    texto é lido como número simples, então '1.234' vale 1.234.
+
+    Raises:
+        ValueError: Texto fora desses formatos ('R$ 1.2.3', '12,5,0', '1234.56 reais')
+    """
+    if type(texto) is str:
+        # Caminhos rápidos: texto de moeda() ou número simples que o float() já lê
+        if _MOEDA.fullmatch(texto) is not None:
+            return float(texto[3:].replace('.', '').replace(',', '.'))
+        if 'R$' not in texto and ',' not in texto:
+            try:
+                valor = float(texto)
+            except ValueError:
+                valor = None
+            # float() também aceita '1_000', 'inf' e 'nan': esses vão pelo regex
+            if valor is not None and '_' not in texto and math.isfinite(valor):
+                return valor
+    elif isinstance(texto, (int, float)):
+        return float(texto)
+    texto = texto.strip() if type(texto) is str else str(texto).strip()
+
+    if 'R$' in texto or ',' in texto:
+        match = _BRASILEIRO.fullmatch(texto)
+        if match is not None:
+            sinal_antes, sinal_depois, parte_inteira, decimais = match.groups()
+            if not (sinal_antes and sinal_depois):
+                parte_inteira = parte_inteira.replace('.', '')
+                valor = float(f'{parte_inteira}.{decimais}' if decimais else parte_inteira)
+                return -valor if sinal_antes or sinal_depois else valor
+    elif _DECIMAL.fullmatch(texto):
+        return float(texto)
+
+    raise ValueError(f'Número inválido: {texto!r}')
+
+
+def interpretar_lote(textos):
+    """
+    Lê uma coluna inteira de valores (inverso de formatar_lote)
+
+    Se todas as células estão no formato de moeda(), a coluna é conferida com um único
+    regex e convertida com duas trocas no texto juntado; senão, célula a célula com
+    interpretar_numero.
+
+    Returns:
+        list: Floats na mesma ordem
+
+    Raises:
+        ValueError: Célula fora dos formatos de interpretar_numero
+    """
+    textos = list(textos)
+    try:
+        coluna = '\n'.join(textos)
+    except TypeError:
+        # Números já convertidos no meio da coluna
+        coluna = None
+    if coluna and _MOEDA_LOTE.fullmatch(coluna + '\n') is not None:
+        # Sem o "R$ " inicial, as células ficam separadas por "\nR$ "
+        valores = list(map(float, coluna[3:].replace('.', '').replace(',', '.').split('\nR$ ')))
+        # Uma célula com quebra de linha dentro não pode virar duas
+        if len(valores) == len(textos):
+            return valores
+    return [interpretar_numero(texto) for texto in textos]
@@ -0,0 +1,294 @@
+"""
+Gráficos nativos do Word (DrawingML chart) a partir das séries da proposta
+
+Em vez de uma imagem, o gráfico vai para o DOCX como uma parte word/charts/chartN.xml
+com os valores em cache e uma planilha embutida (word/embeddings/*.xlsx) com os mesmos
+dados: o Word desenha o gráfico, que fica editável ("Editar dados") e nítido em
+qualquer resolução. Gerar a parte é só preencher um esqueleto XML fixo por tipo de
+gráfico com as séries (templates de string), sem matplotlib nem rasterização.
+
+No retorno, os valores acumulados dos anos rotulados (os mesmos do PNG/SVG) são
+rótulos de dados do Word (<c:dLbls>, em milhares com "#,##0,"). O Word posiciona
+rótulos de dados junto da barra (acima das positivas, abaixo das negativas), não
+numa linha abaixo dos anos como no PNG/SVG.
+
+A planilha é um XLSX mínimo (pasta, uma aba com strings inline) montado com zipfile e
+datas fixas nas entradas, então os mesmos dados geram os mesmos bytes.
+"""
+
+import io
+import zipfile
+from html import escape
+
+
+ABA = 'Planilha1'
+
+# Data fixa nas entradas do XLSX (bytes determinísticos)
+DATA_ZIP = (1980, 1, 1, 0, 0, 0)
+
+_NS = (
+    'xmlns:c="http://schemas.openxmlformats.org/drawingml/2006/chart" '
+    'xmlns:a="http://schemas.openxmlformats.org/drawingml/2006/main" '
+    'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships"'
+)
+
+# Esqueleto do chartSpace: a planilha embutida é sempre a relação rId1 da parte
+_GRAFICO = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<c:chartSpace ' + _NS + '>'
+    '<c:date1904 val="0"/><c:lang val="pt-BR"/><c:roundedCorners val="0"/>'
+    '<c:chart>{titulo}<c:autoTitleDeleted val="0"/>'
+    '<c:plotArea><c:layout/>'
+    '<c:barChart><c:barDir val="col"/><c:grouping val="clustered"/><c:varyColors val="0"/>'
+    '{series}<c:gapWidth val="{espaco}"/><c:axId val="500000001"/><c:axId val="500000002"/>'
+    '</c:barChart>'
+    '<c:catAx><c:axId val="500000001"/><c:scaling><c:orientation val="minMax"/></c:scaling>'
+    '<c:delete val="0"/><c:axPos val="b"/>{titulo_x}'
+    '<c:numFmt formatCode="General" sourceLinked="0"/>'
+    '<c:majorTickMark val="out"/><c:minorTickMark val="none"/><c:tickLblPos val="low"/>'
+    '<c:spPr><a:ln w="9525"><a:solidFill><a:srgbClr val="000000"/></a:solidFill></a:ln></c:spPr>'
+    '{texto_x}<c:crossAx val="500000002"/><c:crosses val="autoZero"/>'
+    '<c:auto val="1"/><c:lblAlgn val="ctr"/><c:lblOffset val="100"/><c:noMultiLvlLbl val="0"/>'
+    '</c:catAx>'
+    '<c:valAx><c:axId val="500000002"/><c:scaling><c:orientation val="minMax"/></c:scaling>'
+    '<c:delete val="0"/><c:axPos val="l"/>'
+    '<c:majorGridlines><c:spPr><a:ln w="6350"><a:solidFill><a:srgbClr val="D9D9D9"/></a:solidFill>'
+    '<a:prstDash val="dash"/></a:ln></c:spPr></c:majorGridlines>{titulo_y}'
+    '<c:numFmt formatCode="{formato_y}" sourceLinked="0"/>'
+    '<c:majorTickMark val="out"/><c:minorTickMark val="none"/><c:tickLblPos val="nextTo"/>'
+    '<c:spPr><a:ln><a:noFill/></a:ln></c:spPr>'
+    '<c:crossAx val="500000001"/><c:crosses val="autoZero"/><c:crossBetween val="between"/>'
+    '</c:valAx>'
+    '</c:plotArea>{legenda}<c:plotVisOnly val="1"/><c:dispBlanksAs val="gap"/></c:chart>'
+    '<c:spPr><a:solidFill><a:srgbClr val="FFFFFF"/></a:solidFill><a:ln><a:noFill/></a:ln></c:spPr>'
+    '<c:txPr><a:bodyPr/><a:lstStyle/><a:p><a:pPr><a:defRPr sz="900"/></a:pPr>'
+    '<a:endParaRPr lang="pt-BR"/></a:p></c:txPr>'
+    '<c:externalData r:id="rId1"><c:autoUpdate val="0"/></c:externalData>'
+    '</c:chartSpace>'
+)
+
+_TITULO = (
+    '<c:title><c:tx><c:rich><a:bodyPr{rotacao}/><a:lstStyle/><a:p><a:pPr>'
+    '<a:defRPr sz="{tamanho}" b="{negrito}"/></a:pPr><a:r><a:rPr lang="pt-BR" sz="{tamanho}" '
+    'b="{negrito}"/><a:t>{texto}</a:t></a:r></a:p></c:rich></c:tx><c:overlay val="0"/></c:title>'
+)
+
+_SERIE = (
+    '<c:ser><c:idx val="{indice}"/><c:order val="{indice}"/>'
+    '<c:tx><c:strRef><c:f>{aba}!${coluna}$1</c:f><c:strCache><c:ptCount val="1"/>'
+    '<c:pt idx="0"><c:v>{nome}</c:v></c:pt></c:strCache></c:strRef></c:tx>'
+    '<c:spPr>{preenchimento}</c:spPr><c:invertIfNegative val="0"/>{pontos}{rotulos}'
+    '<c:cat><c:strRef><c:f>{aba}!$A$2:$A${ultima}</c:f><c:strCache><c:ptCount val="{total}"/>'
+    '{categorias}</c:strCache></c:strRef></c:cat>'
+    '<c:val><c:numRef><c:f>{aba}!${coluna}$2:${coluna}${ultima}</c:f><c:numCache>'
+    '<c:formatCode>General</c:formatCode><c:ptCount val="{total}"/>{valores}</c:numCache>'
+    '</c:numRef></c:val></c:ser>'
+)
+
+# Cor de um ponto da série (barras negativas do retorno)
+_PONTO = (
+    '<c:dPt><c:idx val="{indice}"/><c:invertIfNegative val="0"/><c:bubble3D val="0"/>'
+    '<c:spPr>{preenchimento}</c:spPr></c:dPt>'
+)
+
+# Rótulos de dados: só os pontos listados (<c:dLbl>) mostram o valor
+_ROTULOS = (
+    '<c:dLbls>{pontos}<c:showLegendKey val="0"/><c:showVal val="0"/><c:showCatName val="0"/>'
+    '<c:showSerName val="0"/><c:showPercent val="0"/><c:showBubbleSize val="0"/></c:dLbls>'
+)
+
+_ROTULO = (
+    '<c:dLbl><c:idx val="{indice}"/><c:numFmt formatCode="{formato}" sourceLinked="0"/>'
+    '<c:spPr><a:noFill/><a:ln><a:noFill/></a:ln></c:spPr>'
+    '<c:txPr><a:bodyPr/><a:lstStyle/><a:p><a:pPr><a:defRPr sz="700">'
+    '<a:solidFill><a:srgbClr val="555555"/></a:solidFill></a:defRPr></a:pPr>'
+    '<a:endParaRPr lang="pt-BR"/></a:p></c:txPr><c:dLblPos val="outEnd"/>'
+    '<c:showLegendKey val="0"/><c:showVal val="1"/><c:showCatName val="0"/>'
+    '<c:showSerName val="0"/><c:showPercent val="0"/><c:showBubbleSize val="0"/></c:dLbl>'
+)
+
+_LEGENDA = '<c:legend><c:legendPos val="t"/><c:overlay val="0"/></c:legend>'
+
+_XLSX = {
+    '[Content_Types].xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '</Types>'
+    ),
+    '_rels/.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Target="xl/workbook.xml" Type="http://schemas.openxmlformats.org/'
+        'officeDocument/2006/relationships/officeDocument"/></Relationships>'
+    ),
+    'xl/workbook.xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+        'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+        '<sheets><sheet name="' + ABA + '" sheetId="1" r:id="rId1"/></sheets></workbook>'
+    ),
+    'xl/_rels/workbook.xml.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Target="worksheets/sheet1.xml" Type="http://schemas.openxmlformats.org/'
+        'officeDocument/2006/relationships/worksheet"/></Relationships>'
+    ),
+}
+
+_ABA_XML = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+    '<sheetData>{linhas}</sheetData></worksheet>'
+)
+
+
+class GraficoNativo:
+    """Parte de gráfico pronta para o DOCX (ver midia_docx.GraficoInline)"""
+
+    def __init__(self, xml, planilha, proporcao):
+        """
+        Args:
+            xml (bytes): word/charts/chartN.xml
+            planilha (bytes): XLSX embutido com os dados do gráfico
+            proporcao (float): Altura / largura do gráfico no documento
+        """
+        self.xml = xml
+        self.planilha = planilha
+        self.proporcao = proporcao
+
+
+def _preenchimento(cor, opacidade=1.0):
+    alfa = f'<a:alpha val="{round(opacidade * 100000)}"/>' if opacidade < 1 else ''
+    return f'<a:solidFill><a:srgbClr val="{cor.lstrip("#").upper()}">{alfa}</a:srgbClr></a:solidFill>'
+
+
+def _titulo(texto, tamanho, negrito=False, vertical=False):
+    return _TITULO.format(
+        texto=escape(texto), tamanho=tamanho * 100, negrito=int(negrito),
+        rotacao=' rot="-5400000" vert="horz"' if vertical else '',
+    )
+
+
+def _numero(valor):
+    return repr(round(float(valor), 2))
+
+
+def _coluna(indice):
+    """Coluna da série na planilha: B, C, ... (A são as categorias)"""
+    return chr(ord('B') + indice)
+
+
+def _planilha(categorias, series):
+    """XLSX mínimo: categorias na coluna A, uma coluna por série, nomes na linha 1"""
+    def texto(celula, valor):
+        return f'<c r="{celula}" t="inlineStr"><is><t>{escape(str(valor))}</t></is></c>'
+
+    cabecalho = ''.join(texto(f'{_coluna(i)}1', nome) for i, (nome, _, _) in enumerate(series))
+    linhas = [f'<row r="1">{texto("A1", "")}{cabecalho}</row>']
+    for linha, categoria in enumerate(categorias, start=2):
+        celulas = ''.join(
+            f'<c r="{_coluna(i)}{linha}"><v>{_numero(valores[linha - 2])}</v></c>'
+            for i, (_, valores, _) in enumerate(series)
+        )
+        linhas.append(f'<row r="{linha}">{texto(f"A{linha}", categoria)}{celulas}</row>')
+
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as xlsx:
+        for nome, conteudo in (*_XLSX.items(), ('xl/worksheets/sheet1.xml', _ABA_XML.format(linhas=''.join(linhas)))):
+            xlsx.writestr(zipfile.ZipInfo(nome, DATA_ZIP), conteudo, zipfile.ZIP_DEFLATED)
+    return buffer.getvalue()
+
+
+def _rotulos(indices, formato):
+    if not indices:
+        return ''
+    return _ROTULOS.format(pontos=''.join(_ROTULO.format(indice=i, formato=formato) for i in indices))
+
+
+def _grafico(categorias, series, titulo, titulo_x, titulo_y, formato_y, proporcao,
+             espaco, legenda=True, tamanho_x=9, rotulados=()):
+    """
+    Monta o chartSpace e a planilha
+
+    Args:
+        categorias (list): Rótulos do eixo X
+        series (list): (nome, valores, preenchimento por ponto) por série; o
+            preenchimento é uma função valor -> (cor, opacidade)
+        espaco (int): Espaço entre grupos de barras, em % da largura de uma barra
+        rotulados (iterable): Índices dos pontos com rótulo de dados (formato_y)
+    """
+    total = len(categorias)
+    pontos_categoria = ''.join(
+        f'<c:pt idx="{i}"><c:v>{escape(str(categoria))}</c:v></c:pt>' for i, categoria in enumerate(categorias)
+    )
+    xml_series = []
+    for indice, (nome, valores, cor_ponto) in enumerate(series):
+        cores = [cor_ponto(valor) for valor in valores]
+        # Cor da série = a mais comum; pontos com outra cor recebem <c:dPt>
+        base = max(set(cores), key=cores.count)
+        xml_series.append(_SERIE.format(
+            indice=indice, aba=ABA, coluna=_coluna(indice), nome=escape(nome),
+            preenchimento=_preenchimento(*base),
+            pontos=''.join(
+                _PONTO.format(indice=i, preenchimento=_preenchimento(*cor))
+                for i, cor in enumerate(cores) if cor != base
+            ),
+            rotulos=_rotulos(sorted(rotulados), formato_y),
+            ultima=total + 1, total=total, categorias=pontos_categoria,
+            valores=''.join(
+                f'<c:pt idx="{i}"><c:v>{_numero(valor)}</c:v></c:pt>' for i, valor in enumerate(valores)
+            ),
+        ))
+
+    xml = _GRAFICO.format(
+        titulo=_titulo(titulo, 14, negrito=True), series=''.join(xml_series), espaco=espaco,
+        titulo_x=_titulo(titulo_x, 10) if titulo_x else '',
+        texto_x=(f'<c:txPr><a:bodyPr/><a:lstStyle/><a:p><a:pPr><a:defRPr sz="{tamanho_x * 100}"/>'
+                 '</a:pPr><a:endParaRPr lang="pt-BR"/></a:p></c:txPr>'),
+        titulo_y=_titulo(titulo_y, 10, vertical=True), formato_y=formato_y,
+        legenda=_LEGENDA if legenda else '',
+    )
+    return GraficoNativo(xml.encode('utf-8'), _planilha(categorias, series), proporcao)
+
+
+def comparativo(meses, consumo, geracao):
+    """
+    Consumo x Geração (12 meses), barras agrupadas, proporção 8x4
+
+    Returns:
+        GraficoNativo
+    """
+    return _grafico(
+        meses,
+        [('Consumo', consumo, lambda _: ('#76b900', 0.8)),
+         ('Geração', geracao, lambda _: ('#008EC4', 0.8))],
+        'COMPARATIVO CONSUMO x GERAÇÃO', 'Mês', 'Energia (kWh)', '#,##0', 4 / 8, espaco=86,
+    )
+
+
+def retorno(valores_acumulados, rotulados=()):
+    """
+    Retorno acumulado (25 anos): barras verdes, vermelhas enquanto negativo, eixo Y em
+    milhares de R$ (formato "#,##0," divide por mil), proporção 14x5
+
+    Args:
+        valores_acumulados (list): Retorno acumulado por ano
+        rotulados (iterable): Índices dos anos com o valor como rótulo de dados
+
+    Returns:
+        GraficoNativo
+    """
+    anos = list(range(1, len(valores_acumulados) + 1))
+    return _grafico(
+        anos,
+        [('Retorno acumulado', valores_acumulados,
+          lambda valor: ('#dc3545' if valor < 0 else '#28a745', 0.85))],
+        'SEU RETORNO', None, 'R$ mil', '#,##0,', 5 / 14, espaco=43, legenda=False, tamanho_x=8,
+        rotulados=rotulados,
+    )
@@ -0,0 +1,189 @@
+"""
+Escritor leve de gráficos vetoriais: SVG por templates de string + PNG de fallback
+
+Os gráficos das propostas são barras, linhas e textos. Cena guarda essas primitivas em
+um sistema de coordenadas em centésimos de polegada (800x400 = 8x4 pol) e as emite:
+
+- svg(): documento SVG montado com templates de string, sem biblioteca de gráficos;
+  nítido em qualquer zoom/impressão e com poucos KB
+- png(dpi): a mesma cena rasterizada com Pillow em baixa resolução, usada como
+  fallback no DOCX por versões do Word sem suporte a SVG
+
+Os gráficos em si (escalas, cores, rótulos) ficam em charts.py.
+"""
+
+import html
+import importlib.util
+import math
+import os
+from functools import lru_cache
+
+
+UNIDADES_POR_POLEGADA = 100
+
+FONTE = 'DejaVu Sans, Arial, Helvetica, sans-serif'
+
+# text-anchor do SVG -> âncora do Pillow (horizontal + linha de base)
+ANCORAS_PNG = {'start': 'ls', 'middle': 'ms', 'end': 'rs'}
+
+_SVG = (
+    '<svg xmlns="http://www.w3.org/2000/svg" width="{largura_pol}in" height="{altura_pol}in" '
+    'viewBox="0 0 {largura} {altura}" font-family="{fonte}">'
+    '<rect width="{largura}" height="{altura}" fill="#ffffff"/>{corpo}</svg>'
+)
+_RETANGULO = '<rect x="{:.1f}" y="{:.1f}" width="{:.1f}" height="{:.1f}" fill="{}"{}/>'
+_LINHA = '<line x1="{:.1f}" y1="{:.1f}" x2="{:.1f}" y2="{:.1f}" stroke="{}" stroke-width="{:g}"{}/>'
+_TEXTO = '<text x="{:.1f}" y="{:.1f}" font-size="{:g}" fill="{}" text-anchor="{}"{}>{}</text>'
+
+
+def escala_eixo(minimo, maximo, divisoes=5):
+    """
+    Limites e passo "redondos" (1, 2, 2,5 ou 5 x 10^n) cobrindo [minimo, maximo]
+
+    Returns:
+        tuple: (inicio, fim, passo), com inicio <= minimo, fim >= maximo e 0 incluído
+            quando estiver no intervalo
+    """
+    amplitude = (maximo - minimo) or abs(maximo) or 1
+    bruto = amplitude / divisoes
+    potencia = 10 ** math.floor(math.log10(bruto))
+    passo = next(m * potencia for m in (1, 2, 2.5, 5, 10) if m * potencia >= bruto)
+    return math.floor(minimo / passo) * passo, math.ceil(maximo / passo) * passo, passo
+
+
+@lru_cache(maxsize=None)
+def _fonte_png(pixels, negrito):
+    """
+    DejaVu Sans do matplotlib (com acentos) sem importar o matplotlib; sem ela, a fonte
+    do sistema com o mesmo nome ou a fonte padrão do Pillow
+    """
+    from PIL import ImageFont
+
+    nome = 'DejaVuSans-Bold.ttf' if negrito else 'DejaVuSans.ttf'
+    spec = importlib.util.find_spec('matplotlib')
+    if spec is not None and spec.submodule_search_locations:
+        caminho = os.path.join(spec.submodule_search_locations[0], 'mpl-data', 'fonts', 'ttf', nome)
+        if os.path.exists(caminho):
+            nome = caminho
+    try:
+        return ImageFont.truetype(nome, pixels)
+    except OSError:
+        return ImageFont.load_default(size=pixels)
+
+
+def _cor_rgba(cor, opacidade=1.0):
+    """'#76b900' -> (118, 185, 0, 255)"""
+    return (int(cor[1:3], 16), int(cor[3:5], 16), int(cor[5:7], 16), round(255 * opacidade))
+
+
+class Cena:
+    """Primitivas de um gráfico (retângulos, linhas e textos) e seus emissores"""
+
+    def __init__(self, largura, altura):
+        """
+        Args:
+            largura (int): Largura em centésimos de polegada
+            altura (int): Altura em centésimos de polegada
+        """
+        self.largura = largura
+        self.altura = altura
+        self.primitivas = []
+
+    def retangulo(self, x, y, largura, altura, cor, opacidade=1.0, borda=None):
+        # Barras negativas chegam com altura negativa: normalizar para o SVG
+        if altura < 0:
+            y, altura = y + altura, -altura
+        self.primitivas.append(('retangulo', x, y, largura, altura, cor, opacidade, borda))
+
+    def linha(self, x1, y1, x2, y2, cor, espessura=1, opacidade=1.0, tracejada=False):
+        self.primitivas.append(('linha', x1, y1, x2, y2, cor, espessura, opacidade, tracejada))
+
+    def texto(self, x, y, texto, tamanho, cor='#000000', ancora='start', negrito=False,
+              vertical=False):
+        """Texto com a linha de base em y (vertical: girado 90° no sentido anti-horário)"""
+        self.primitivas.append(('texto', x, y, str(texto), tamanho, cor, ancora, negrito, vertical))
+
+    def svg(self):
+        """
+        Returns:
+            bytes: Documento SVG (UTF-8)
+        """
+        partes = []
+        for primitiva in self.primitivas:
+            tipo = primitiva[0]
+            if tipo == 'retangulo':
+                _, x, y, largura, altura, cor, opacidade, borda = primitiva
+                extras = f' fill-opacity="{opacidade:g}"' if opacidade < 1 else ''
+                if borda:
+                    extras += f' stroke="{borda}"'
+                partes.append(_RETANGULO.format(x, y, largura, altura, cor, extras))
+            elif tipo == 'linha':
+                _, x1, y1, x2, y2, cor, espessura, opacidade, tracejada = primitiva
+                extras = f' stroke-opacity="{opacidade:g}"' if opacidade < 1 else ''
+                if tracejada:
+                    extras += ' stroke-dasharray="4 3"'
+                partes.append(_LINHA.format(x1, y1, x2, y2, cor, espessura, extras))
+            else:
+                _, x, y, texto, tamanho, cor, ancora, negrito, vertical = primitiva
+                extras = ' font-weight="bold"' if negrito else ''
+                if vertical:
+                    extras += f' transform="rotate(-90 {x:.1f} {y:.1f})"'
+                partes.append(_TEXTO.format(x, y, tamanho, cor, ancora, extras, html.escape(texto)))
+
+        return _SVG.format(
+            largura_pol=f'{self.largura / UNIDADES_POR_POLEGADA:g}',
+            altura_pol=f'{self.altura / UNIDADES_POR_POLEGADA:g}',
+            largura=self.largura, altura=self.altura, fonte=FONTE, corpo=''.join(partes),
+        ).encode('utf-8')
+
+    def png(self, dpi):
+        """
+        Rasteriza a cena com Pillow (linhas tracejadas saem contínuas: é só o fallback)
+
+        Args:
+            dpi (int): Resolução da imagem
+
+        Returns:
+            bytes: Imagem PNG
+        """
+        import io
+        from PIL import Image, ImageDraw
+
+        escala = dpi / UNIDADES_POR_POLEGADA
+        imagem = Image.new('RGB', (round(self.largura * escala), round(self.altura * escala)), 'white')
+        desenho = ImageDraw.Draw(imagem, 'RGBA')
+
+        for primitiva in self.primitivas:
+            tipo = primitiva[0]
+            if tipo == 'retangulo':
+                _, x, y, largura, altura, cor, opacidade, borda = primitiva
+                desenho.rectangle(
+                    [x * escala, y * escala, (x + largura) * escala, (y + altura) * escala],
+                    fill=_cor_rgba(cor, opacidade), outline=_cor_rgba(borda) if borda else None,
+                )
+            elif tipo == 'linha':
+                _, x1, y1, x2, y2, cor, espessura, opacidade, _ = primitiva
+                desenho.line(
+                    [x1 * escala, y1 * escala, x2 * escala, y2 * escala],
+                    fill=_cor_rgba(cor, opacidade), width=max(1, round(espessura * escala)),
+                )
+            else:
+                _, x, y, texto, tamanho, cor, ancora, negrito, vertical = primitiva
+                fonte = _fonte_png(max(6, round(tamanho * escala)), negrito)
+                if not vertical:
+                    desenho.text((x * escala, y * escala), texto, fill=_cor_rgba(cor),
+                                 font=fonte, anchor=ANCORAS_PNG[ancora])
+                    continue
+                # Texto vertical: desenhar na horizontal em uma camada e girar
+                esquerda, topo, direita, base = fonte.getbbox(texto, anchor='ls')
+                camada = Image.new('RGBA', (direita - esquerda, base - topo), (0, 0, 0, 0))
+                ImageDraw.Draw(camada).text((-esquerda, -topo), texto, fill=_cor_rgba(cor),
+                                            font=fonte, anchor='ls')
+                camada = camada.rotate(90, expand=True)
+                deslocamento = {'start': camada.height, 'middle': camada.height // 2, 'end': 0}
+                imagem.paste(camada, (round(x * escala + topo),
+                                      round(y * escala - deslocamento[ancora])), camada)
+
+        buffer = io.BytesIO()
+        imagem.save(buffer, format='PNG', dpi=(dpi, dpi))
+        return buffer.getvalue()
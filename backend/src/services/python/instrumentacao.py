@@ -0,0 +1,228 @@
+"""
+Instrumentação das etapas da geração de propostas
+
+Cronometro mede cada etapa do caminho quente (template, gráficos, fluxo de caixa,
+contexto, render, save, PDF) com time.perf_counter e devolve os tempos em ms junto
+com o pico de memória (RSS) do processo, para irem no JSON de resultado do job.
+
+Perfilador é opcional, por job ("profile": "cprofile" | "tracemalloc", ou
+PROPOSAL_PROFILE para todos os jobs), e grava um arquivo que pode ser anexado ao
+chamado de uma proposta lenta:
+- cprofile: estatísticas .prof (abrir com snakeviz ou pstats)
+- tracemalloc: pico de memória alocada no job e as 50 linhas com mais memória
+  ainda viva ao final (caches, vazamentos)
+
+Perfis expõem caminhos e dados do job: o diretório padrão é por usuário
+(<tmp>/proposal_profiles-<uid>, 0700) e passa pela mesma verificação do cache de
+saídas (output_cache.diretorio_privado); se for recusado, o perfil não é gravado.
+
+relatorio_inicializacao mede o custo de importar cada dependência pesada e de
+aquecer o processo (modo --warmup dos scripts).
+"""
+
+import cProfile
+import importlib
+import json
+import os
+import re
+import sys
+import tempfile
+import time
+import tracemalloc
+import uuid
+from contextlib import contextmanager
+
+try:
+    from .output_cache import diretorio_privado
+except ImportError:
+    from output_cache import diretorio_privado
+
+
+MODOS_PERFIL = ('cprofile', 'tracemalloc')
+
+_UID = os.geteuid() if hasattr(os, 'geteuid') else None
+
+# Diretório padrão dos arquivos de perfil
+DIRETORIO_PERFIS = os.environ.get('PROPOSAL_PROFILE_DIR') or os.path.join(
+    tempfile.gettempdir(), 'proposal_profiles' if _UID is None else f'proposal_profiles-{_UID}'
+)
+
+
+def pico_rss_mb():
+    """
+    Pico de memória residente do processo em MB (None se indisponível)
+
+    Em workers de longa duração é o pico desde o início do processo, não só do job.
+    """
+    try:
+        import resource
+    except ImportError:
+        # Windows: psutil é opcional
+        try:
+            import psutil
+            info = psutil.Process().memory_info()
+            return round(getattr(info, 'peak_wset', info.rss) / (1024 * 1024), 1)
+        except ImportError:
+            return None
+
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux informa em KB, macOS em bytes
+    divisor = 1024 * 1024 if sys.platform == 'darwin' else 1024
+    return round(pico / divisor, 1)
+
+
+def relatorio_inicializacao(modulos, aquecer=None):
+    """
+    Importa os módulos em ordem, medindo cada um, e depois executa o aquecimento
+
+    O tempo de um módulo inclui as dependências que ele carregou pela primeira vez;
+    módulos já importados custam ~0. Para o detalhe por submódulo use
+    python -X importtime.
+
+    Args:
+        modulos (list): Nomes absolutos dos módulos (importlib.import_module)
+        aquecer: Função chamada depois dos imports (opcional)
+
+    Returns:
+        dict: imports_ms (ms por módulo, None se indisponível), warmup_ms,
+            total_ms e peak_rss_mb
+    """
+    inicio = time.perf_counter()
+    imports = {}
+    for nome in modulos:
+        t0 = time.perf_counter()
+        try:
+            importlib.import_module(nome)
+        except ImportError:
+            imports[nome] = None
+            continue
+        imports[nome] = round((time.perf_counter() - t0) * 1000, 2)
+
+    warmup_ms = None
+    if aquecer:
+        t0 = time.perf_counter()
+        aquecer()
+        warmup_ms = round((time.perf_counter() - t0) * 1000, 2)
+
+    return {
+        'imports_ms': imports,
+        'warmup_ms': warmup_ms,
+        'total_ms': round((time.perf_counter() - inicio) * 1000, 2),
+        'peak_rss_mb': pico_rss_mb(),
+    }
+
+
+def imprimir_relatorio_inicializacao(relatorio, saida=None):
+    """Tabela legível do relatorio_inicializacao, seguida do JSON em uma linha"""
+    saida = saida or sys.stdout
+    for nome, ms in relatorio['imports_ms'].items():
+        valor = 'indisponível' if ms is None else f'{ms:9.1f} ms'
+        saida.write(f'  import {nome:<40} {valor}\n')
+    if relatorio['warmup_ms'] is not None:
+        saida.write(f'  {"aquecimento":<47} {relatorio["warmup_ms"]:9.1f} ms\n')
+    saida.write(f'  {"total":<47} {relatorio["total_ms"]:9.1f} ms\n')
+    saida.write(json.dumps(relatorio) + '\n')
+
+
+class Cronometro:
+    """
+    Acumula o tempo de cada etapa de um job
+
+    Duas formas de uso:
+        with cronometro.etapa('render'):
+            ...
+        cronometro.marcar('cash_flow')  # tempo desde a marca anterior
+    """
+
+    def __init__(self):
+        self.inicio = time.perf_counter()
+        self._ultima_marca = self.inicio
+        self.tempos = {}
+
+    def _registrar(self, nome, segundos):
+        self.tempos[nome] = self.tempos.get(nome, 0.0) + segundos * 1000
+
+    @contextmanager
+    def etapa(self, nome):
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            fim = time.perf_counter()
+            self._registrar(nome, fim - inicio)
+            self._ultima_marca = fim
+
+    def reiniciar_marca(self):
+        """Faz a próxima chamada de marcar medir a partir de agora"""
+        self._ultima_marca = time.perf_counter()
+
+    def marcar(self, nome):
+        agora = time.perf_counter()
+        self._registrar(nome, agora - self._ultima_marca)
+        self._ultima_marca = agora
+
+    def resumo(self):
+        """
+        Returns:
+            dict: stages_ms (ms por etapa), total_ms e peak_rss_mb
+        """
+        return {
+            'stages_ms': {nome: round(ms, 2) for nome, ms in self.tempos.items()},
+            'total_ms': round((time.perf_counter() - self.inicio) * 1000, 2),
+            'peak_rss_mb': pico_rss_mb(),
+        }
+
+
+class Perfilador:
+    """Perfil opcional de um job (cProfile ou tracemalloc) gravado em arquivo"""
+
+    def __init__(self, modo, diretorio=None, nome=None):
+        """
+        Args:
+            modo (str): 'cprofile' ou 'tracemalloc'
+            diretorio (str): Onde gravar o arquivo (padrão: PROPOSAL_PROFILE_DIR)
+            nome (str): Base do nome do arquivo (padrão: aleatório)
+
+        Raises:
+            ValueError: Se o modo não for suportado
+        """
+        if modo not in MODOS_PERFIL:
+            raise ValueError(f'Modo de perfil inválido: {modo} (use {", ".join(MODOS_PERFIL)})')
+        self.modo = modo
+        self.diretorio = diretorio or DIRETORIO_PERFIS
+        self.nome = re.sub(r'[^\w-]', '_', str(nome)) if nome else uuid.uuid4().hex[:12]
+        self.caminho = None
+        self._perfil = None
+
+    def __enter__(self):
+        if self.modo == 'cprofile':
+            self._perfil = cProfile.Profile()
+            self._perfil.enable()
+        else:
+            tracemalloc.start(25)
+        return self
+
+    def __exit__(self, *exc):
+        if self.modo == 'cprofile':
+            self._perfil.disable()
+        else:
+            snapshot = tracemalloc.take_snapshot()
+            atual, pico = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+
+        motivo = diretorio_privado(self.diretorio)
+        if motivo:
+            print(f'[instrumentacao] Perfil não gravado: {self.diretorio}: {motivo}', file=sys.stderr)
+            return False
+        base = os.path.join(self.diretorio, f'proposta_{self.nome}')
+
+        if self.modo == 'cprofile':
+            self.caminho = base + '.prof'
+            self._perfil.dump_stats(self.caminho)
+        else:
+            self.caminho = base + '.tracemalloc.txt'
+            with open(self.caminho, 'w', encoding='utf-8') as f:
+                f.write(f'Memória atual: {atual / 1024:.1f} KB | pico: {pico / 1024:.1f} KB\n\n')
+                for stat in snapshot.statistics('lineno')[:50]:
+                    f.write(f'{stat}\n')
+        return False
@@ -0,0 +1,406 @@
+"""
+Servidor de jobs em socket Unix (geração de propostas e conversão para PDF)
+
+Um processo por host, compartilhado por várias instâncias do backend Node: cada
+conexão envia jobs JSON, um por linha, e recebe os eventos do protocolo
+(protocolo.py) com o job_id do job. Vários jobs podem ser enviados na mesma conexão
+sem esperar os anteriores; os resultados chegam na ordem de conclusão.
+
+    {"id": "a1b2", "type": "generate", "template_path": "...", "output_path": "...", ...}
+    {"id": "c3d4", "type": "convert", "docx_path": "...", "pdf_path": "..."}
+    {"id": "e5f6", "type": "health"}
+
+- generate: job de proposal_generator.processar_job (padrão se "type" faltar)
+- convert: job de docx_to_pdf.processar_job
+- health: responde na hora com o evento health (estado, fila e métricas)
+
+O loop asyncio só lê e escreve nos sockets; render e conversão rodam em um pool de
+processos aquecidos (JOB_SERVER_WORKERS). Cada job recebe started ao entrar no pool
+e result/error ao terminar; como rodam em outros processos, os eventos
+intermediários (charts_done, rendered) não são repassados.
+
+Contrapressão: no máximo workers + JOB_SERVER_MAX_QUEUE jobs aceitos ao mesmo
+tempo (executando ou aguardando). Além disso o job é recusado na hora com um evento
+error com "status": 429 e "retry_after" (s), e o cliente decide se espera ou usa
+outro caminho.
+
+Uso:
+    python job_server.py [--socket /tmp/proposal-jobs.sock] [--workers 4] [--max-queue 32]
+    python job_server.py --health   # consulta um servidor em execução (healthcheck)
+
+Socket Unix: não disponível no Windows (lá o backend usa o pool de workers local).
+"""
+
+import argparse
+import asyncio
+import importlib
+import json
+import os
+import signal
+import socket
+import sys
+import tempfile
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+try:
+    from . import protocolo
+    from .instrumentacao import pico_rss_mb
+except ImportError:
+    import protocolo
+    from instrumentacao import pico_rss_mb
+
+
+CAMINHO_SOCKET = os.environ.get('PYTHON_JOB_SERVER_SOCKET') or os.path.join(
+    tempfile.gettempdir(), 'proposal-jobs.sock'
+)
+
+# Processos do pool (padrão: núcleos disponíveis) e jobs aguardando além deles
+WORKERS = int(os.environ.get('JOB_SERVER_WORKERS', '0'))
+MAX_FILA = int(os.environ.get('JOB_SERVER_MAX_QUEUE', '32'))
+
+# Tamanho máximo de uma linha (job com dados do cliente e schema do template)
+LIMITE_LINHA = 16 * 1024 * 1024
+
+# Latências guardadas por tipo de job para os percentis do health
+AMOSTRAS_LATENCIA = 1000
+
+# Tempo para os jobs em andamento terminarem ao receber SIGTERM/SIGINT
+TIMEOUT_ENCERRAMENTO = 60
+
+# Execuções de um job quando o pool quebra (um processo morre derruba todos os jobs
+# em andamento; os outros são repetidos uma vez em um pool novo)
+TENTATIVAS_POOL = 2
+
+# Tipo do job -> módulo com processar_job(params, progresso)
+TIPOS = {
+    'generate': 'proposal_generator',
+    'convert': 'docx_to_pdf',
+}
+
+
+def _modulo(nome):
+    """Import de um módulo irmão (funciona como pacote e como script)"""
+    return importlib.import_module(f'{__package__}.{nome}' if __package__ else nome)
+
+
+def _inicializar_processo():
+    """Initializer dos processos do pool: protege o stdout e aquece o gerador"""
+    sys.stdout = sys.stderr
+    # Sinais herdados do loop asyncio do pai (fork): o SIGTERM que o pool manda aos
+    # processos restantes quando quebra não pode chegar ao servidor pelo wakeup fd
+    signal.set_wakeup_fd(-1)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    # Ctrl+C no terminal: quem encerra os jobs é o servidor
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    _modulo('proposal_generator').aquecer_dependencias()
+
+
+def _executar_job(tipo, params):
+    """Roda um job em um processo do pool"""
+    try:
+        return _modulo(TIPOS[tipo]).processar_job(params)
+    except Exception as e:
+        return protocolo.erro(e)
+
+
+def _percentis(valores):
+    if not valores:
+        return None
+    ordenados = sorted(valores)
+    ultimo = len(ordenados) - 1
+    return {
+        f'p{p}': round(ordenados[min(ultimo, len(ordenados) * p // 100)], 1)
+        for p in (50, 90, 99)
+    }
+
+
+class ServidorJobs:
+    """Atende conexões no socket Unix e distribui os jobs no pool de processos"""
+
+    def __init__(self, caminho_socket=None, workers=None, max_fila=None):
+        """
+        Args:
+            caminho_socket (str): Socket Unix (padrão: PYTHON_JOB_SERVER_SOCKET)
+            workers (int): Processos do pool (padrão: JOB_SERVER_WORKERS ou núcleos)
+            max_fila (int): Jobs aguardando além dos em execução (padrão: JOB_SERVER_MAX_QUEUE)
+        """
+        self.caminho_socket = caminho_socket or CAMINHO_SOCKET
+        if not workers:
+            workers = WORKERS
+        if not workers:
+            try:
+                workers = len(os.sched_getaffinity(0))
+            except AttributeError:
+                workers = os.cpu_count() or 1
+        self.workers = max(1, workers)
+        self.max_fila = MAX_FILA if max_fila is None else max(0, max_fila)
+
+        self.pendentes = 0  # aceitos e ainda sem resultado (executando ou aguardando)
+        self.executando = 0
+        self.contadores = {'accepted': 0, 'rejected': 0, 'completed': 0, 'failed': 0}
+        self.latencias = {tipo: deque(maxlen=AMOSTRAS_LATENCIA) for tipo in TIPOS}
+        self.inicio = time.time()
+        self.usa_uno = _modulo('docx_to_pdf').uno_disponivel()
+
+        self._executor = None
+        self._conexoes = set()
+        self._vagas = None
+        self._servidor = None
+        self._ocioso = None
+
+    @property
+    def capacidade(self):
+        return self.workers + self.max_fila
+
+    def _novo_executor(self):
+        return ProcessPoolExecutor(max_workers=self.workers, initializer=_inicializar_processo)
+
+    def metricas(self):
+        """Estado do servidor para o evento health"""
+        return {
+            'status': 'saturated' if self.pendentes >= self.capacidade else 'ok',
+            'pid': os.getpid(),
+            'uptime_s': round(time.time() - self.inicio, 1),
+            'workers': self.workers,
+            'running': self.executando,
+            'queued': self.pendentes - self.executando,
+            'max_queue': self.max_fila,
+            **self.contadores,
+            'latency_ms': {tipo: _percentis(valores) for tipo, valores in self.latencias.items()},
+            'peak_rss_mb': pico_rss_mb(),
+            # Sem uno cada conversão para PDF sobe um soffice (ver docx_to_pdf)
+            'usa_uno': self.usa_uno,
+        }
+
+    # --- Conexões ---
+
+    @staticmethod
+    def _enviar(writer, evento, job_id=None, **dados):
+        if not writer.is_closing():
+            writer.write(protocolo.linha_evento(evento, job_id, **dados).encode('utf-8'))
+
+    async def _atender(self, reader, writer):
+        tarefas = set()
+        self._conexoes.add(writer)
+        try:
+            while True:
+                try:
+                    linha = await reader.readline()
+                except (asyncio.LimitOverrunError, ValueError):
+                    self._enviar(writer, 'error', success=False, status=413,
+                                 error=f'Job maior que {LIMITE_LINHA} bytes')
+                    break
+                except ConnectionError:
+                    break
+                if not linha:
+                    break
+                linha = linha.strip()
+                if not linha:
+                    continue
+
+                try:
+                    params = json.loads(linha)
+                except json.JSONDecodeError as e:
+                    self._enviar(writer, 'error', success=False, status=400,
+                                 error=f'JSON inválido: {str(e)}')
+                    continue
+
+                tarefa = self._receber(writer, params)
+                if tarefa is not None:
+                    tarefas.add(tarefa)
+                    tarefa.add_done_callback(tarefas.discard)
+                await self._drenar(writer)
+
+            # Cliente fechou a escrita: entregar os resultados que ainda faltam
+            if tarefas:
+                await asyncio.gather(*tarefas, return_exceptions=True)
+        finally:
+            self._conexoes.discard(writer)
+            writer.close()
+
+    def _receber(self, writer, params):
+        job_id = params.get('id')
+        tipo = params.get('type', 'generate')
+
+        if tipo == 'health':
+            self._enviar(writer, 'health', job_id, **self.metricas())
+            return None
+        if tipo not in TIPOS:
+            self._enviar(writer, 'error', job_id, success=False, status=400,
+                         error=f'Tipo de job desconhecido: {tipo}')
+            return None
+
+        if self.pendentes >= self.capacidade:
+            self.contadores['rejected'] += 1
+            self._enviar(writer, 'error', job_id, success=False, status=429,
+                         error='Servidor de jobs ocupado, tente novamente',
+                         retry_after=self._estimar_espera(tipo))
+            return None
+
+        self.contadores['accepted'] += 1
+        self.pendentes += 1
+        self._ocioso.clear()
+        return asyncio.create_task(self._executar(writer, tipo, params, job_id))
+
+    def _estimar_espera(self, tipo):
+        """Segundos até liberar uma vaga, pela latência mediana do tipo de job"""
+        mediana = (_percentis(self.latencias[tipo]) or {}).get('p50') or 1000
+        return max(1, round(mediana * (self.max_fila + 1) / self.workers / 1000))
+
+    async def _executar(self, writer, tipo, params, job_id):
+        recebido = time.perf_counter()
+        try:
+            async with self._vagas:
+                self.executando += 1
+                self._enviar(writer, 'started', job_id,
+                             queue_ms=round((time.perf_counter() - recebido) * 1000, 1))
+                try:
+                    for _ in range(TENTATIVAS_POOL):
+                        executor = self._executor
+                        try:
+                            resultado = await asyncio.get_running_loop().run_in_executor(
+                                executor, _executar_job, tipo, params
+                            )
+                            break
+                        except BrokenProcessPool:
+                            self._recriar_pool(executor)
+                            resultado = {
+                                'success': False,
+                                'error': 'Processo do servidor de jobs encerrado '
+                                         'inesperadamente durante o job'
+                            }
+                finally:
+                    self.executando -= 1
+        except Exception as e:
+            resultado = protocolo.erro(e)
+        finally:
+            self.pendentes -= 1
+            if not self.pendentes:
+                self._ocioso.set()
+
+        self.latencias[tipo].append((time.perf_counter() - recebido) * 1000)
+        self.contadores['completed' if resultado.get('success') else 'failed'] += 1
+        evento = 'result' if resultado.get('success') else 'error'
+        self._enviar(writer, evento, job_id, **resultado)
+        await self._drenar(writer)
+
+    @staticmethod
+    async def _drenar(writer):
+        try:
+            await writer.drain()
+        except ConnectionError:
+            # Cliente desconectou: o resultado é descartado
+            pass
+
+    def _recriar_pool(self, executor):
+        """Troca o pool quebrado (um processo morreu) uma única vez"""
+        if self._executor is executor:
+            print('[job_server] Pool de processos quebrado, recriando', file=sys.stderr)
+            executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = self._novo_executor()
+
+    # --- Ciclo de vida ---
+
+    def _liberar_socket(self):
+        """Remove um socket órfão; recusa se outro servidor estiver escutando nele"""
+        if not os.path.exists(self.caminho_socket):
+            return
+        teste = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            teste.connect(self.caminho_socket)
+        except OSError:
+            os.unlink(self.caminho_socket)
+        else:
+            raise RuntimeError(f'Já existe um servidor em {self.caminho_socket}')
+        finally:
+            teste.close()
+
+    async def executar(self):
+        """Sobe o servidor e atende até receber SIGTERM/SIGINT"""
+        loop = asyncio.get_running_loop()
+        parar = asyncio.Event()
+        for sinal in (signal.SIGTERM, signal.SIGINT):
+            loop.add_signal_handler(sinal, parar.set)
+
+        self._vagas = asyncio.Semaphore(self.workers)
+        self._ocioso = asyncio.Event()
+        self._ocioso.set()
+
+        # Aquecer antes do fork: os processos do pool herdam os imports prontos
+        _modulo('proposal_generator').aquecer_dependencias()
+        self._executor = self._novo_executor()
+
+        self._liberar_socket()
+        self._servidor = await asyncio.start_unix_server(
+            self._atender, path=self.caminho_socket, limit=LIMITE_LINHA
+        )
+        os.chmod(self.caminho_socket, 0o660)
+        print(f'[job_server] Escutando em {self.caminho_socket} '
+              f'({self.workers} processos, fila {self.max_fila}, pid {os.getpid()})',
+              file=sys.stderr, flush=True)
+
+        try:
+            await parar.wait()
+        finally:
+            print('[job_server] Encerrando...', file=sys.stderr, flush=True)
+            self._servidor.close()
+            try:
+                await asyncio.wait_for(self._ocioso.wait(), TIMEOUT_ENCERRAMENTO)
+            except asyncio.TimeoutError:
+                print(f'[job_server] {self.pendentes} job(s) interrompido(s)', file=sys.stderr)
+            # Conexões ociosas: fim de stream para os handlers terminarem
+            for writer in list(self._conexoes):
+                writer.close()
+            await asyncio.sleep(0)
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            if os.path.exists(self.caminho_socket):
+                os.unlink(self.caminho_socket)
+
+
+def consultar_health(caminho_socket=None, timeout=5.0):
+    """
+    Consulta o evento health de um servidor em execução
+
+    Returns:
+        dict: Evento health
+    """
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as conexao:
+        conexao.settimeout(timeout)
+        conexao.connect(caminho_socket or CAMINHO_SOCKET)
+        conexao.sendall(json.dumps({'type': 'health', 'id': 'health'}).encode('utf-8') + b'\n')
+        with conexao.makefile('r', encoding='utf-8') as leitura:
+            return json.loads(leitura.readline())
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Servidor de jobs do gerador de propostas')
+    parser.add_argument('--socket', help=f'Socket Unix (padrão: {CAMINHO_SOCKET})')
+    parser.add_argument('--workers', type=int, help='Processos do pool (padrão: núcleos)')
+    parser.add_argument('--max-queue', type=int, help=f'Jobs aguardando além dos em execução '
+                                                     f'(padrão: {MAX_FILA})')
+    parser.add_argument('--health', action='store_true',
+                        help='Consultar o servidor em execução e sair (código 1 se indisponível)')
+    args = parser.parse_args()
+
+    if not hasattr(asyncio, 'start_unix_server'):
+        print('Socket Unix não disponível nesta plataforma', file=sys.stderr)
+        sys.exit(1)
+
+    if args.health:
+        try:
+            print(json.dumps(consultar_health(args.socket), indent=2))
+        except (OSError, ValueError) as e:
+            print(f'Servidor indisponível: {e}', file=sys.stderr)
+            sys.exit(1)
+        sys.exit(0)
+
+    # Prints do gerador nunca devem ir para o stdout do servidor
+    sys.stdout = sys.stderr
+    try:
+        asyncio.run(ServidorJobs(args.socket, args.workers, args.max_queue).executar())
+    except RuntimeError as e:
+        print(f'ERRO: {e}', file=sys.stderr)
+        sys.exit(1)
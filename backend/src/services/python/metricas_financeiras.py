@@ -0,0 +1,142 @@
+"""
+Indicadores financeiros das propostas: payback mensal, TIR, VPL e LCOE
+
+Calculados direto das colunas numéricas do fluxo de caixa (cash_flow.calcular_fluxo),
+então batem com a tabela 'fluxo' e o gráfico de retorno do mesmo documento. Como o
+fluxo, aceitam uma proposta (arrays (anos,)) ou um lote ((..., anos)) e devolvem um
+valor por proposta:
+
+- payback_meses: meses até a economia acumulada cobrir o investimento, com a economia
+  de cada ano distribuída igualmente pelos 12 meses
+- tir: taxa interna de retorno anual, por Newton vetorizado sobre o log do fator de
+  desconto (todas as propostas do lote convergem juntas, em poucas iterações)
+- vpl: valor presente líquido à taxa de desconto
+- lcoe: custo nivelado da energia gerada (R$/kWh): investimento / energia descontada
+
+Uso em lote:
+    fluxo = calcular_fluxo(valor_investimento=[25000, 32000], economia_mensal=[900, 1100], ...)
+    calcular_metricas(fluxo)['tir']   # array([0.43, 0.41])
+"""
+
+import numpy as np
+
+
+# Taxa de desconto anual do VPL e do LCOE (custo de oportunidade do cliente)
+TAXA_DESCONTO = 0.10
+
+# Newton para na tolerância (no log do fator de desconto) ou após este número de iterações
+TOLERANCIA_TIR = 1e-12
+MAX_ITERACOES_TIR = 50
+
+
+def _investimento(fluxo):
+    return np.asarray(fluxo['investimento'], dtype=float)[..., 0]
+
+
+def payback_meses(fluxo):
+    """
+    Meses até o payback
+
+    Args:
+        fluxo (dict): Resultado de calcular_fluxo
+
+    Returns:
+        ndarray: Meses (inteiros, como float) por proposta; inf se a economia acumulada
+            não cobrir o investimento no horizonte
+    """
+    eco = np.asarray(fluxo['eco'], dtype=float)
+    eco_ac = np.asarray(fluxo['eco_ac'], dtype=float)
+    investimento = _investimento(fluxo)
+
+    atingiu = eco_ac >= investimento[..., np.newaxis]
+    ano = np.argmax(atingiu, axis=-1)
+    no_ano = ano[..., np.newaxis]
+    anterior = np.take_along_axis(eco_ac - eco, no_ano, axis=-1)[..., 0]
+    mensal = np.take_along_axis(eco, no_ano, axis=-1)[..., 0] / 12
+    with np.errstate(divide='ignore', invalid='ignore'):
+        meses_no_ano = np.ceil(np.clip((investimento - anterior) / mensal, 0, 12))
+    meses = np.where(investimento <= 0, 0.0, ano * 12 + meses_no_ano)
+    return np.where(atingiu.any(axis=-1) | (investimento <= 0), meses, np.inf)
+
+
+def vpl(fluxo, taxa=TAXA_DESCONTO):
+    """
+    Valor presente líquido: economia de cada ano descontada menos o investimento
+
+    Returns:
+        ndarray: VPL em R$ por proposta
+    """
+    eco = np.asarray(fluxo['eco'], dtype=float)
+    desconto = (1 + np.asarray(taxa, dtype=float)[..., np.newaxis]) ** -np.arange(1, eco.shape[-1] + 1)
+    return (eco * desconto).sum(axis=-1) - _investimento(fluxo)
+
+
+def tir(fluxo):
+    """
+    Taxa interna de retorno anual (taxa em que o VPL é zero)
+
+    Com investimento positivo e economias não negativas, a raiz é a de
+    g(u) = log(soma eco_t * e^(u*t)) - log(investimento), com u = -log(1 + taxa): g é
+    crescente e convexa, então o Newton partindo de um u acima da raiz desce
+    monotonamente até ela, e g é quase linear longe da raiz (poucas iterações mesmo
+    com TIR muito alta ou negativa). O ponto de partida u = log(max(1, investimento /
+    economia total)) já tem g >= 0 (para e^u >= 1, cada e^(u*t) >= e^u).
+
+    Returns:
+        ndarray: TIR por proposta (0.25 = 25% a.a.); nan se o fluxo não tiver essa forma
+            (investimento <= 0, economia negativa ou toda nula)
+    """
+    eco = np.asarray(fluxo['eco'], dtype=float)
+    investimento = _investimento(fluxo)
+    eco, investimento = np.broadcast_arrays(eco, investimento[..., np.newaxis])
+    investimento = investimento[..., 0]
+    expoentes = np.arange(1, eco.shape[-1] + 1)
+
+    total = eco.sum(axis=-1)
+    valido = (investimento > 0) & (total > 0) & (eco >= 0).all(axis=-1)
+    investimento = np.where(valido, investimento, 1.0)
+    u = np.where(valido, np.log(np.maximum(1.0, investimento / np.where(valido, total, 1.0))), 0.0)
+    eco = np.where(valido[..., np.newaxis], eco, 1.0)
+    log_investimento = np.log(investimento)
+
+    for _ in range(MAX_ITERACOES_TIR):
+        termos = eco * np.exp(u[..., np.newaxis] * expoentes)
+        soma = termos.sum(axis=-1)
+        passo = (np.log(soma) - log_investimento) * soma / (termos * expoentes).sum(axis=-1)
+        u = u - passo
+        if np.all(np.abs(passo) <= TOLERANCIA_TIR):
+            break
+
+    return np.where(valido, np.exp(-u) - 1, np.nan)
+
+
+def lcoe(fluxo, taxa=TAXA_DESCONTO):
+    """
+    Custo nivelado da energia: investimento / energia gerada descontada no horizonte
+
+    Returns:
+        ndarray: R$/kWh por proposta (inf sem geração)
+    """
+    energia = np.asarray(fluxo['en_g'], dtype=float)
+    desconto = (1 + np.asarray(taxa, dtype=float)[..., np.newaxis]) ** -np.arange(1, energia.shape[-1] + 1)
+    with np.errstate(divide='ignore'):
+        return _investimento(fluxo) / (energia * desconto).sum(axis=-1)
+
+
+def calcular_metricas(fluxo, taxa=TAXA_DESCONTO):
+    """
+    Todos os indicadores de uma vez
+
+    Args:
+        fluxo (dict): Resultado de calcular_fluxo (uma proposta ou lote)
+        taxa: Taxa de desconto anual do VPL e do LCOE
+
+    Returns:
+        dict: payback_meses, tir, vpl e lcoe (arrays com os eixos de lote do fluxo)
+    """
+    return {
+        'payback_meses': payback_meses(fluxo),
+        'tir': tir(fluxo),
+        'vpl': vpl(fluxo, taxa),
+        'lcoe': lcoe(fluxo, taxa),
+    }
@@ -0,0 +1,327 @@
+"""
+Inserção de imagens (gráficos) no DOCX sem cópias nem trabalho repetido
+
+No fluxo padrão do docxtpl cada InlineImage recebe um BytesIO e, a cada inserção no
+template, o python-docx lê o stream inteiro (cópia dos bytes), reanalisa o cabeçalho
+do PNG, calcula o SHA-1 da imagem e de todas as imagens do pacote para achar uma
+parte igual e percorre o XML inteiro da parte (xpath //@id) para escolher o id do
+desenho. Em templates grandes, ou que usam o mesmo gráfico várias vezes, isso se
+repete em cada inserção de cada documento do lote.
+
+Aqui:
+- imagem_png guarda, por processo, o Image do python-docx de cada PNG do cache de
+  gráficos (charts.MotorGraficos devolve o mesmo objeto bytes nos acertos): cabeçalho e
+  SHA-1 são calculados uma vez e a parte de mídia aponta para esses mesmos bytes, sem
+  cópia, em todos os documentos gerados
+- MidiaDocumento indexa as partes de imagem de um documento por SHA-1 (as do template
+  vêm pré-calculadas do TemplateCompilado), então a mesma imagem vira uma única parte
+  em /word/media, e memoriza o id do desenho e o XML do <wp:inline> por parte
+
+O XML e as partes gerados são os mesmos do InlineImage do docxtpl.
+
+ImagemSvgInline insere um SVG do jeito do Word 2016+: o <a:blip> aponta para o PNG de
+fallback (lido por versões antigas e outros leitores) e carrega a extensão svgBlip com
+a relação para a parte image/svg+xml.
+
+GraficoInline insere um gráfico nativo (graficos_nativos.GraficoNativo): uma parte
+word/charts/chartN.xml por inserção, com a planilha embutida relacionada a ela.
+"""
+
+import hashlib
+import re
+import threading
+from collections import OrderedDict
+
+from docx.image.image import Image
+from docx.opc.constants import CONTENT_TYPE as CT
+from docx.opc.constants import RELATIONSHIP_TYPE as RT
+from docx.opc.packuri import PackURI
+from docx.opc.part import Part
+from docx.oxml.ns import qn
+from docx.oxml.parser import parse_xml
+from docx.oxml.shape import CT_Inline
+from docx.parts.image import ImagePart
+from docxtpl import InlineImage
+
+try:
+    from .graficos_nativos import GraficoNativo
+except ImportError:
+    from graficos_nativos import GraficoNativo
+
+
+CT_SVG = 'image/svg+xml'
+
+# Extensão DrawingML do Office 2016 para imagens SVG
+_EXTENSAO_SVG = (
+    '<a:extLst xmlns:a="http://schemas.openxmlformats.org/drawingml/2006/main">'
+    '<a:ext uri="{{96DAC541-7B7A-43D3-8B79-37D633B846F1}}">'
+    '<asvg:svgBlip xmlns:asvg="http://schemas.microsoft.com/office/drawing/2016/SVG/main" '
+    'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships" '
+    'r:embed="{rid}"/></a:ext></a:extLst>'
+)
+
+
+# PNGs distintos mantidos com o Image já analisado (mesma ordem do cache de gráficos)
+CAPACIDADE_IMAGENS = 64
+
+_imagens = OrderedDict()
+_imagens_lock = threading.Lock()
+
+
+def _memorizado(objeto, criar):
+    """Valor derivado de um objeto bytes, memorizado pela identidade do objeto"""
+    chave = id(objeto)
+    with _imagens_lock:
+        entrada = _imagens.get(chave)
+        if entrada is not None and entrada[0] is objeto:
+            _imagens.move_to_end(chave)
+            return entrada[1]
+
+    valor = criar(objeto)
+    with _imagens_lock:
+        _imagens[chave] = (objeto, valor)
+        while len(_imagens) > CAPACIDADE_IMAGENS:
+            _imagens.popitem(last=False)
+    return valor
+
+
+def _analisar_png(png):
+    # from_blob não copia: a parte de mídia referencia os mesmos bytes
+    imagem = Image.from_blob(png)
+    return imagem, imagem.sha1
+
+
+_PARTE_GRAFICO = re.compile(r'/word/charts/chart(\d+)\.xml')
+
+# <wp:inline> de um gráfico nativo
+_INLINE_GRAFICO = (
+    '<wp:inline distT="0" distB="0" distL="0" distR="0" '
+    'xmlns:wp="http://schemas.openxmlformats.org/drawingml/2006/wordprocessingDrawing" '
+    'xmlns:a="http://schemas.openxmlformats.org/drawingml/2006/main" '
+    'xmlns:c="http://schemas.openxmlformats.org/drawingml/2006/chart" '
+    'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+    '<wp:extent cx="{cx}" cy="{cy}"/><wp:effectExtent l="0" t="0" r="0" b="0"/>'
+    '<wp:docPr id="{id}" name="Gráfico {numero}"/><wp:cNvGraphicFramePr/>'
+    '<a:graphic><a:graphicData uri="http://schemas.openxmlformats.org/drawingml/2006/chart">'
+    '<c:chart r:id="{rid}"/></a:graphicData></a:graphic></wp:inline>'
+)
+
+
+def imagem_png(png):
+    """
+    Image do python-docx e SHA-1 de um PNG, reaproveitados enquanto o mesmo objeto
+    bytes for usado
+
+    A chave é a identidade do objeto (o cache de gráficos devolve sempre o mesmo bytes
+    para a mesma série); a entrada guarda uma referência aos bytes, então o id não é
+    reaproveitado por outro objeto enquanto ela existir.
+
+    Returns:
+        tuple: (Image, sha1)
+    """
+    return _memorizado(png, _analisar_png)
+
+
+def digest_svg(svg):
+    """SHA-1 de um SVG (mesma memorização de imagem_png)"""
+    return _memorizado(svg, lambda conteudo: hashlib.sha1(conteudo).hexdigest())
+
+
+class MidiaDocumento:
+    """Partes de imagem e ids de desenho de um documento durante uma renderização"""
+
+    def __init__(self, documento, sha1_conhecidos=None):
+        """
+        Args:
+            documento: Document do python-docx sendo renderizado
+            sha1_conhecidos (dict): partname -> SHA-1 das imagens do template (opcional,
+                evita re-hashear as imagens do template a cada documento)
+        """
+        self.documento = documento
+        self._partes_imagem = documento.part.package.image_parts
+        self._sha1_conhecidos = sha1_conhecidos or {}
+        self._por_sha1 = None
+        self._ids = {}
+        self._inlines = {}
+        self._graficos = None
+
+    def parte_imagem_existente(self, sha1):
+        """Parte de imagem do documento com esse SHA-1, ou None"""
+        if self._por_sha1 is None:
+            # Mesma regra do python-docx: vale a primeira parte com o mesmo conteúdo
+            self._por_sha1 = {}
+            for parte in self._partes_imagem:
+                digest = self._sha1_conhecidos.get(str(parte.partname)) or parte.sha1
+                self._por_sha1.setdefault(digest, parte)
+        return self._por_sha1.get(sha1)
+
+    def parte_imagem(self, imagem, sha1):
+        """ImagePart com esse conteúdo (criada na primeira vez)"""
+        parte = self.parte_imagem_existente(sha1)
+        if parte is None:
+            parte = self._por_sha1[sha1] = self._partes_imagem._add_image_part(imagem)
+        return parte
+
+    def parte_svg(self, svg, sha1):
+        """Parte image/svg+xml com esse conteúdo (criada na primeira vez)"""
+        parte = self.parte_imagem_existente(sha1)
+        if parte is None:
+            nome = self._partes_imagem._next_image_partname('svg')
+            parte = self._por_sha1[sha1] = ImagePart(nome, CT_SVG, svg)
+            self._partes_imagem.append(parte)
+        return parte
+
+    def proximo_id(self, parte):
+        """
+        Id do próximo desenho na parte (StoryPart.next_id)
+
+        O XML renderizado só substitui o da parte no fim da renderização, então o
+        valor não muda entre inserções e basta percorrer o documento uma vez.
+        """
+        id_desenho = self._ids.get(parte)
+        if id_desenho is None:
+            id_desenho = self._ids[parte] = parte.next_id
+        return id_desenho
+
+    def inline(self, parte, imagem, sha1, largura, altura, svg=None, sha1_svg=None):
+        """
+        XML <wp:inline> da imagem na parte (o mesmo para inserções repetidas)
+
+        Com svg, a imagem é o PNG de fallback e o SVG entra pela extensão svgBlip.
+        """
+        rid = parte.relate_to(self.parte_imagem(imagem, sha1), RT.IMAGE)
+        rid_svg = parte.relate_to(self.parte_svg(svg, sha1_svg), RT.IMAGE) if svg else None
+        cx, cy = imagem.scaled_dimensions(largura, altura)
+        chave = (parte, rid, rid_svg, cx, cy)
+        xml = self._inlines.get(chave)
+        if xml is None:
+            inline = CT_Inline.new_pic_inline(self.proximo_id(parte), rid, imagem.filename, cx, cy)
+            if rid_svg:
+                blip = inline.find('.//' + qn('a:blip'))
+                blip.append(parse_xml(_EXTENSAO_SVG.format(rid=rid_svg)))
+            xml = self._inlines[chave] = inline.xml
+        return xml
+
+
+    def inline_grafico(self, parte, grafico, largura):
+        """
+        Cria as partes de um gráfico nativo e devolve o XML <wp:inline>
+
+        Args:
+            parte: Parte sendo renderizada (corpo, cabeçalho ou rodapé)
+            grafico (GraficoNativo): XML do gráfico e planilha
+            largura (Length): Largura no documento (a altura vem da proporção)
+        """
+        if self._graficos is None:
+            # Números já usados por gráficos do próprio template
+            self._graficos = set()
+            for existente in parte.package.iter_parts():
+                encontrado = _PARTE_GRAFICO.fullmatch(str(existente.partname))
+                if encontrado:
+                    self._graficos.add(int(encontrado.group(1)))
+        numero = max(self._graficos, default=0) + 1
+        self._graficos.add(numero)
+
+        parte_grafico = Part(
+            PackURI(f'/word/charts/chart{numero}.xml'), CT.DML_CHART, grafico.xml, parte.package
+        )
+        parte_planilha = Part(
+            PackURI(f'/word/embeddings/grafico{numero}.xlsx'), CT.SML_SHEET, grafico.planilha,
+            parte.package
+        )
+        # O XML do gráfico referencia a planilha como rId1 (primeira relação da parte)
+        parte_grafico.relate_to(parte_planilha, RT.PACKAGE)
+        rid = parte.relate_to(parte_grafico, RT.CHART)
+        return _INLINE_GRAFICO.format(
+            cx=int(largura), cy=int(largura * grafico.proporcao), id=self.proximo_id(parte),
+            numero=numero, rid=rid,
+        )
+
+
+def midia_documento(tpl):
+    """MidiaDocumento do documento atual do template (novo a cada renderização)"""
+    midia = getattr(tpl, '_midia_docx', None)
+    if midia is None or midia.documento is not tpl.docx:
+        compilado = getattr(tpl, 'compilado', None)
+        midia = tpl._midia_docx = MidiaDocumento(
+            tpl.docx, compilado.sha1_imagens if compilado is not None else None
+        )
+    return midia
+
+
+class ImagemInline(InlineImage):
+    """InlineImage de um PNG em memória, inserido via MidiaDocumento"""
+
+    svg = sha1_svg = None
+
+    def __init__(self, tpl, png, width=None, height=None):
+        """
+        Args:
+            tpl: DocxTemplate que vai renderizar a imagem
+            png (bytes): Imagem PNG (idealmente o objeto devolvido pelo cache de gráficos)
+            width, height: Tamanho no documento (docx.shared.Length)
+        """
+        super().__init__(tpl, None, width, height)
+        self.imagem, self.sha1 = imagem_png(png)
+
+    def _insert_image(self):
+        midia = midia_documento(self.tpl)
+        xml = midia.inline(
+            self.tpl.current_rendering_part, self.imagem, self.sha1, self.width, self.height,
+            self.svg, self.sha1_svg
+        )
+        return '</w:t></w:r><w:r><w:drawing>%s</w:drawing></w:r><w:r>' \
+               '<w:t xml:space="preserve">' % xml
+
+
+class ImagemSvgInline(ImagemInline):
+    """Imagem SVG com PNG de fallback (ver graficos_svg)"""
+
+    def __init__(self, tpl, svg, png, width=None, height=None):
+        """
+        Args:
+            tpl: DocxTemplate que vai renderizar a imagem
+            svg (bytes): Documento SVG
+            png (bytes): Fallback em baixa resolução (define a proporção da imagem)
+            width, height: Tamanho no documento (docx.shared.Length)
+        """
+        super().__init__(tpl, png, width, height)
+        self.svg = svg
+        self.sha1_svg = digest_svg(svg)
+
+
+class GraficoInline(InlineImage):
+    """Gráfico nativo do Word, inserido como InlineImage pelo docxtpl"""
+
+    def __init__(self, tpl, grafico, width):
+        """
+        Args:
+            tpl: DocxTemplate que vai renderizar o gráfico
+            grafico (GraficoNativo): Gráfico de graficos_nativos
+            width: Largura no documento (docx.shared.Length)
+        """
+        super().__init__(tpl, None, width)
+        self.grafico = grafico
+
+    def _insert_image(self):
+        xml = midia_documento(self.tpl).inline_grafico(
+            self.tpl.current_rendering_part, self.grafico, self.width
+        )
+        return '</w:t></w:r><w:r><w:drawing>%s</w:drawing></w:r><w:r>' \
+               '<w:t xml:space="preserve">' % xml
+
+
+def inline_grafico(tpl, grafico, largura):
+    """
+    InlineImage para um gráfico de charts.MotorGraficos (*_docx)
+
+    Args:
+        grafico: bytes PNG, tupla (svg, png de fallback) ou GraficoNativo
+        largura (Length): Largura no documento
+    """
+    if isinstance(grafico, GraficoNativo):
+        return GraficoInline(tpl, grafico, largura)
+    if isinstance(grafico, tuple):
+        svg, png = grafico
+        return ImagemSvgInline(tpl, svg, png, width=largura)
+    return ImagemInline(tpl, grafico, width=largura)
@@ -0,0 +1,290 @@
+"""
+Cache em disco das saídas geradas (DOCX e PDF), endereçado pelo conteúdo
+
+Vendedores costumam clicar em "gerar" várias vezes na mesma proposta sem mudar nada.
+As saídas ficam em um diretório compartilhado pelos processos do usuário no host
+(workers, lote, job_server), uma entrada por arquivo:
+
+- <chave>.docx: chave_proposta = SHA-256 de (hash do template, dados_cliente
+  normalizados, versão do gerador)
+- <chave>.pdf: chave_pdf = SHA-256 de (bytes do DOCX, conversor)
+
+A versão do gerador é o hash do código-fonte dos módulos que definem a saída
+(MODULOS_GERADOR) e das variáveis de ambiente que a alteram (CONFIG_GERADOR), então
+um deploy que muda cálculo, formatação ou gráficos invalida o cache sem passo manual.
+
+O tamanho total é limitado (PROPOSAL_OUTPUT_CACHE_MB, 0 desliga) com descarte LRU:
+cada acerto atualiza o mtime do arquivo e, quando uma gravação passa do limite, os
+arquivos com mtime mais antigo são removidos até sobrar FRACAO_APOS_LIMPEZA do limite.
+Gravações são atômicas (arquivo temporário + os.replace), então um processo nunca lê
+uma entrada pela metade.
+
+As entradas contêm dados do cliente (nome, CPF/CNPJ, endereço): o diretório padrão é
+por usuário (<tmp>/proposal_output_cache-<uid>), criado com permissão 0700, e um
+diretório que não seja do usuário do processo ou que outros possam gravar é recusado
+(o cache fica desligado no processo em vez de ler ou gravar nele).
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import stat
+import sys
+import tempfile
+import threading
+from functools import lru_cache
+
+
+_UID = os.geteuid() if hasattr(os, 'geteuid') else None
+
+DIRETORIO_CACHE = os.environ.get('PROPOSAL_OUTPUT_CACHE_DIR') or os.path.join(
+    tempfile.gettempdir(), 'proposal_output_cache' if _UID is None else f'proposal_output_cache-{_UID}'
+)
+LIMITE_MB = float(os.environ.get('PROPOSAL_OUTPUT_CACHE_MB', '512'))
+
+# Após uma limpeza sobra esta fração do limite (a próxima gravação não limpa de novo)
+FRACAO_APOS_LIMPEZA = 0.9
+
+# Módulos cujo código define o conteúdo do DOCX gerado
+MODULOS_GERADOR = (
+    'proposal_generator', 'cash_flow', 'metricas_financeiras', 'simulacao_risco', 'charts',
+    'graficos_svg', 'graficos_nativos', 'formatacao', 'template_cache', 'plano_render',
+    'midia_docx', 'escritor_docx',
+)
+# Variáveis de ambiente que mudam o DOCX gerado
+CONFIG_GERADOR = (
+    'PROPOSAL_CHART_PNG', 'PROPOSAL_CHART_FORMAT', 'PROPOSAL_RENDER_PLAN', 'PROPOSAL_DOCX_COMPRESSION',
+)
+
+EXTENSOES = ('.docx', '.pdf')
+
+
+@lru_cache(maxsize=None)
+def versao_gerador():
+    """Hash do código-fonte dos módulos e da configuração do gerador (uma vez por processo)"""
+    sha = hashlib.sha256()
+    diretorio = os.path.dirname(os.path.abspath(__file__))
+    for nome in MODULOS_GERADOR:
+        with open(os.path.join(diretorio, f'{nome}.py'), 'rb') as f:
+            sha.update(f.read())
+    for variavel in CONFIG_GERADOR:
+        sha.update(f'{variavel}={os.environ.get(variavel, "")}\0'.encode('utf-8'))
+    return sha.hexdigest()[:16]
+
+
+_digests = {}
+_digests_lock = threading.Lock()
+
+
+def digest_arquivo(caminho):
+    """
+    SHA-256 do conteúdo de um arquivo, memorizado por (caminho, mtime, tamanho)
+
+    Não compila o template: em um acerto do cache o docxtpl nem é importado.
+    """
+    stat = os.stat(caminho)
+    chave = (os.path.realpath(caminho), stat.st_mtime_ns, stat.st_size)
+    with _digests_lock:
+        digest = _digests.get(chave)
+    if digest is None:
+        sha = hashlib.sha256()
+        with open(caminho, 'rb') as f:
+            for bloco in iter(lambda: f.read(1024 * 1024), b''):
+                sha.update(bloco)
+        digest = sha.hexdigest()
+        with _digests_lock:
+            # Templates baixados pelo backend mudam de nome a cada proposta
+            if len(_digests) > 256:
+                _digests.clear()
+            _digests[chave] = digest
+    return digest
+
+
+def chave_proposta(template_digest, dados_cliente):
+    """
+    Chave do DOCX de uma proposta
+
+    Os dados são normalizados em JSON canônico (chaves ordenadas, sem espaços), então
+    a ordem dos campos enviada pelo backend não importa. Tipos continuam distintos
+    (10 e "10" renderizam diferente).
+    """
+    canonico = json.dumps(
+        {'template': template_digest, 'dados': dados_cliente, 'gerador': versao_gerador()},
+        sort_keys=True, ensure_ascii=False, separators=(',', ':'), default=str,
+    )
+    return hashlib.sha256(canonico.encode('utf-8')).hexdigest()
+
+
+def chave_pdf(conteudo_docx, conversor):
+    """Chave do PDF de um DOCX: bytes do documento + conversor (LibreOffice e Word diferem)"""
+    sha = hashlib.sha256(conversor.encode('utf-8') + b'\0')
+    sha.update(conteudo_docx)
+    return sha.hexdigest()
+
+
+def diretorio_privado(diretorio):
+    """
+    Cria o diretório (0700) e confere que é do usuário do processo e que grupo e outros
+    não podem gravar nele (também usado pelos perfis de instrumentacao)
+
+    Returns:
+        str | None: Motivo da recusa, ou None se o diretório pode ser usado
+    """
+    try:
+        os.makedirs(diretorio, mode=0o700, exist_ok=True)
+        info = os.lstat(diretorio)
+    except OSError as e:
+        return str(e)
+    if not stat.S_ISDIR(info.st_mode):
+        return 'não é um diretório'
+    if _UID is not None and info.st_uid != _UID:
+        return f'pertence ao uid {info.st_uid}, não ao usuário do processo ({_UID})'
+    if _UID is not None and info.st_mode & (stat.S_IWGRP | stat.S_IWOTH):
+        return f'grupo ou outros podem gravar (permissão {stat.S_IMODE(info.st_mode):o})'
+    return None
+
+
+class CacheSaidas:
+    """Diretório de saídas com tamanho limitado e descarte LRU (por mtime)"""
+
+    def __init__(self, diretorio=None, limite_mb=None):
+        """
+        Args:
+            diretorio (str): Diretório do cache (padrão: PROPOSAL_OUTPUT_CACHE_DIR)
+            limite_mb (float): Tamanho máximo em MB (padrão: PROPOSAL_OUTPUT_CACHE_MB; 0 desliga)
+        """
+        self.diretorio = diretorio or DIRETORIO_CACHE
+        self.limite_bytes = int((LIMITE_MB if limite_mb is None else limite_mb) * 1024 * 1024)
+        self.hits = 0
+        self.misses = 0
+        self._verificado = None
+
+    @property
+    def ativo(self):
+        return self.limite_bytes > 0 and self._diretorio_seguro()
+
+    def _diretorio_seguro(self):
+        """Diretório aprovado por diretorio_privado; verificado uma vez por instância"""
+        if self._verificado is None:
+            self._verificado = self._verificar_diretorio()
+        return self._verificado
+
+    def _verificar_diretorio(self):
+        motivo = diretorio_privado(self.diretorio)
+        if motivo:
+            print(f'[output_cache] Cache desligado: {self.diretorio}: {motivo}', file=sys.stderr)
+            return False
+        return True
+
+    def caminho(self, chave, extensao):
+        return os.path.join(self.diretorio, f'{chave}{extensao}')
+
+    def obter(self, chave, extensao):
+        """
+        Caminho da entrada em cache (marcada como usada agora), ou None
+
+        A entrada pode ser removida por outro processo logo depois: quem a usa deve
+        tratar OSError como falta no cache.
+        """
+        if not self._diretorio_seguro():
+            self.misses += 1
+            return None
+        caminho = self.caminho(chave, extensao)
+        try:
+            os.utime(caminho)
+        except OSError:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return caminho
+
+    def ler(self, chave, extensao):
+        """Bytes da entrada em cache, ou None"""
+        caminho = self.obter(chave, extensao)
+        if caminho is None:
+            return None
+        try:
+            with open(caminho, 'rb') as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def copiar(self, chave, extensao, destino):
+        """Copia a entrada para destino; False se não estiver em cache"""
+        caminho = self.obter(chave, extensao)
+        if caminho is None:
+            return False
+        try:
+            shutil.copyfile(caminho, destino)
+        except FileNotFoundError:
+            return False
+        return True
+
+    def gravar(self, chave, extensao, conteudo=None, origem=None):
+        """
+        Grava uma entrada a partir de bytes ou de um arquivo já gerado
+
+        Falhas de disco não interrompem a geração: a entrada só fica de fora do cache.
+        """
+        if not self._diretorio_seguro():
+            return
+        destino = self.caminho(chave, extensao)
+        temporario = f'{destino}.{os.getpid()}.{threading.get_ident()}.tmp'
+        try:
+            if origem is not None:
+                shutil.copyfile(origem, temporario)
+            else:
+                with open(temporario, 'wb') as f:
+                    f.write(conteudo)
+            os.replace(temporario, destino)
+        except OSError:
+            try:
+                os.unlink(temporario)
+            except OSError:
+                pass
+            return
+        self.limpar()
+
+    def limpar(self, limite_bytes=None):
+        """
+        Remove as entradas usadas há mais tempo se o diretório passar do limite
+
+        Returns:
+            int: Entradas removidas
+        """
+        limite = self.limite_bytes if limite_bytes is None else limite_bytes
+        entradas = []
+        total = 0
+        try:
+            with os.scandir(self.diretorio) as itens:
+                for item in itens:
+                    if not item.name.endswith(EXTENSOES):
+                        continue
+                    try:
+                        stat = item.stat()
+                    except OSError:
+                        continue
+                    entradas.append((stat.st_mtime, stat.st_size, item.path))
+                    total += stat.st_size
+        except OSError:
+            return 0
+
+        if total <= limite:
+            return 0
+
+        alvo = limite * FRACAO_APOS_LIMPEZA
+        removidas = 0
+        for _, tamanho, caminho in sorted(entradas):
+            if total <= alvo:
+                break
+            try:
+                os.unlink(caminho)
+            except OSError:
+                continue
+            total -= tamanho
+            removidas += 1
+        return removidas
+
+
+cache_saidas = CacheSaidas()
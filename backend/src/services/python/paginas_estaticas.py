@@ -0,0 +1,391 @@
+"""
+Páginas estáticas pré-renderizadas: divisão do DOCX em trechos de página e junção de PDFs
+
+As propostas são, em boa parte, páginas fixas de apresentação com poucas páginas que
+mudam por cliente (dados, tabela de fluxo, gráficos). No modo de páginas estáticas
+(PROPOSAL_PDF_STATIC_PAGES, ver docx_to_pdf.py) o corpo do documento é dividido em
+blocos nas quebras explícitas de página:
+
+- parágrafo que termina em quebra de página (<w:br w:type="page"/> sem conteúdo depois)
+- parágrafo com "quebra de página antes" (pageBreakBefore)
+- quebra de seção do tipo próxima página
+
+Um bloco é estático quando seu XML (normalizado) é o de um bloco do template sem tags
+Jinja2. Blocos vizinhos do mesmo tipo formam um trecho; cada trecho vira um DOCX
+próprio (mesmo pacote, só o corpo recortado). Os trechos estáticos são convertidos uma
+vez e ficam no cache de saídas, indexados pelo conteúdo (chave_trecho); a cada proposta
+só os trechos dinâmicos são convertidos, e os PDFs são concatenados por página (pypdf).
+
+Documentos em que converter trechos separados mudaria o resultado não são divididos
+(motivo_inelegivel): numeração de página ou sumário (campos PAGE, NUMPAGES, TOC...),
+cabeçalho/rodapé com tags ou primeira página diferente, páginas pares/ímpares, notas
+de rodapé e listas numeradas que atravessam trechos.
+"""
+
+import hashlib
+import importlib.util
+import io
+import posixpath
+import re
+import zipfile
+from collections import OrderedDict
+
+from lxml import etree
+
+try:
+    from .escritor_docx import substituir_membros
+except ImportError:
+    from escritor_docx import substituir_membros
+
+
+W = '{http://schemas.openxmlformats.org/wordprocessingml/2006/main}'
+R = '{http://schemas.openxmlformats.org/officeDocument/2006/relationships}'
+_RELS = '{http://schemas.openxmlformats.org/package/2006/relationships}'
+_TIPO_RELACAO = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships/'
+
+# Campos cujo resultado depende das outras páginas do documento
+_CAMPOS_PAGINACAO = re.compile(r'\b(PAGE|NUMPAGES|SECTIONPAGES|PAGEREF|TOC|SEQ|NOTEREF)\b')
+_TAGS_JINJA = ('{{', '{%', '{#')
+_DOCPR_ID = re.compile(r'(<wp:docPr\b[^>]*?\sid=")\d+"')
+# Conteúdo visível de um parágrafo (o que impede cortar depois de uma quebra de página)
+_CONTEUDO = frozenset(
+    W + nome for nome in ('t', 'drawing', 'pict', 'object', 'sym', 'tab', 'fldSimple', 'instrText')
+)
+
+CAPACIDADE_MODELOS = 16
+
+
+def pypdf_disponivel():
+    """A junção dos PDFs usa pypdf (dependência opcional)"""
+    return importlib.util.find_spec('pypdf') is not None
+
+
+def _ligado(elemento, nome):
+    """Propriedade booleana do OOXML presente e não desligada (w:val="0"/"false")"""
+    filho = elemento.find(W + nome) if elemento is not None else None
+    return filho is not None and filho.get(W + 'val') not in ('0', 'false', 'off')
+
+
+def _texto(elemento):
+    return ''.join(t.text or '' for t in elemento.iter(W + 't'))
+
+
+def _tem_tags(texto):
+    return any(tag in texto for tag in _TAGS_JINJA)
+
+
+def _quebra_final(paragrafo):
+    """
+    Quebra de página no fim do parágrafo (sem conteúdo depois dela)
+
+    Returns:
+        Element | None: O <w:br> da quebra
+    """
+    quebra = None
+    for elemento in paragrafo.iter():
+        if elemento.tag == W + 'br' and elemento.get(W + 'type') == 'page':
+            quebra = elemento
+        elif quebra is not None and elemento.tag in _CONTEUDO and (
+            elemento.tag != W + 't' or elemento.text
+        ):
+            quebra = None
+    return quebra
+
+
+def _tipo_secao(paragrafo):
+    """Tipo da quebra de seção que o parágrafo encerra (None se não encerra seção)"""
+    propriedades = paragrafo.find(W + 'pPr')
+    secao = propriedades.find(W + 'sectPr') if propriedades is not None else None
+    if secao is None:
+        return None
+    tipo = secao.find(W + 'type')
+    return tipo.get(W + 'val', 'nextPage') if tipo is not None else 'nextPage'
+
+
+def dividir_blocos(corpo):
+    """
+    Divide os filhos do <w:body> nas quebras explícitas de página
+
+    Args:
+        corpo: Elemento <w:body>
+
+    Returns:
+        list: Blocos (listas de elementos), sem o <w:sectPr> final do corpo
+    """
+    blocos = [[]]
+    for elemento in corpo:
+        if elemento.tag == W + 'sectPr':
+            continue
+        if elemento.tag == W + 'p' and blocos[-1] and _ligado(elemento.find(W + 'pPr'), 'pageBreakBefore'):
+            blocos.append([])
+        blocos[-1].append(elemento)
+        if elemento.tag == W + 'p' and (
+            _tipo_secao(elemento) == 'nextPage' or _quebra_final(elemento) is not None
+        ):
+            blocos.append([])
+    return [bloco for bloco in blocos if bloco]
+
+
+def chave_bloco(bloco):
+    """Hash do XML do bloco (C14N exclusivo, ids de desenho zerados: o docxtpl os renumera)"""
+    sha = hashlib.sha256()
+    for elemento in bloco:
+        xml = etree.tostring(elemento, method='c14n', exclusive=True).decode('utf-8')
+        sha.update(_DOCPR_ID.sub(r'\g<1>0"', xml).encode('utf-8'))
+    return sha.hexdigest()
+
+
+class PacoteDocx:
+    """Zip de um DOCX com a parte principal e suas relações já lidas"""
+
+    def __init__(self, conteudo):
+        self.conteudo = conteudo
+        self.zip = zipfile.ZipFile(io.BytesIO(conteudo))
+        self.nomes = set(self.zip.namelist())
+        self.principal = self._alvos('', tipo='officeDocument')[0]
+        self.raiz = etree.fromstring(self.zip.read(self.principal))
+        self.corpo = self.raiz.find(W + 'body')
+        self.relacoes = self._relacoes(self.principal)
+
+    def _relacoes(self, parte):
+        """rId -> (tipo, parte alvo ou None se externa) das relações da parte"""
+        pasta, nome = posixpath.split(parte)
+        rels = posixpath.join(pasta, '_rels', f'{nome}.rels')
+        if rels not in self.nomes:
+            return {}
+        relacoes = {}
+        for rel in etree.fromstring(self.zip.read(rels)).iter(_RELS + 'Relationship'):
+            tipo = rel.get('Type').rsplit('/', 1)[-1]
+            alvo = None
+            if rel.get('TargetMode') != 'External':
+                alvo = posixpath.normpath(posixpath.join(pasta, rel.get('Target'))).lstrip('/')
+            relacoes[rel.get('Id')] = (tipo, alvo)
+        return relacoes
+
+    def _alvos(self, parte, tipo):
+        relacoes = self._relacoes(parte) if parte else {
+            rid: (t, alvo.lstrip('/')) for rid, (t, alvo) in self._relacoes_pacote().items()
+        }
+        return [alvo for t, alvo in relacoes.values() if t == tipo and alvo]
+
+    def _relacoes_pacote(self):
+        relacoes = {}
+        for rel in etree.fromstring(self.zip.read('_rels/.rels')).iter(_RELS + 'Relationship'):
+            relacoes[rel.get('Id')] = (rel.get('Type').rsplit('/', 1)[-1], rel.get('Target'))
+        return relacoes
+
+    def partes_do_tipo(self, *tipos):
+        return [alvo for tipo, alvo in self.relacoes.values() if tipo in tipos and alvo in self.nomes]
+
+    def motivo_inelegivel(self):
+        """
+        Por que o documento não pode ser convertido em trechos (None se puder)
+
+        Returns:
+            str | None: Motivo
+        """
+        cabecalhos = [etree.fromstring(self.zip.read(p)) for p in self.partes_do_tipo('header', 'footer')]
+        for raiz in (self.raiz, *cabecalhos):
+            for campo in raiz.iter(W + 'fldSimple', W + 'instrText'):
+                instrucao = campo.get(W + 'instr') if campo.tag == W + 'fldSimple' else campo.text
+                if instrucao and _CAMPOS_PAGINACAO.search(instrucao):
+                    return 'campo de paginação'
+        if any(_tem_tags(_texto(raiz)) for raiz in cabecalhos):
+            return 'cabeçalho/rodapé com tags'
+        for secao in self.raiz.iter(W + 'sectPr'):
+            if _ligado(secao, 'titlePg'):
+                return 'primeira página diferente'
+            tipo = secao.find(W + 'type')
+            if tipo is not None and tipo.get(W + 'val') in ('oddPage', 'evenPage'):
+                return 'seção em página par/ímpar'
+        for configuracoes in self.partes_do_tipo('settings'):
+            if _ligado(etree.fromstring(self.zip.read(configuracoes)), 'evenAndOddHeaders'):
+                return 'cabeçalhos pares/ímpares'
+        if next(self.corpo.iter(W + 'footnoteReference', W + 'endnoteReference'), None) is not None:
+            return 'notas de rodapé'
+        return None
+
+
+class ModeloPaginas:
+    """Análise do template: elegibilidade e chaves dos blocos estáticos"""
+
+    def __init__(self, conteudo):
+        """
+        Args:
+            conteudo (bytes): Bytes do template .docx
+        """
+        pacote = PacoteDocx(conteudo)
+        self.motivo = pacote.motivo_inelegivel()
+        self.estaticos = frozenset(
+            chave_bloco(bloco) for bloco in dividir_blocos(pacote.corpo)
+            if not _tem_tags(_texto_bloco(bloco))
+        )
+
+
+def _texto_bloco(bloco):
+    return ''.join(_texto(elemento) for elemento in bloco)
+
+
+_modelos = OrderedDict()
+
+
+def modelo_paginas(digest, ler_conteudo):
+    """
+    ModeloPaginas do template (memorizado pelo hash do conteúdo)
+
+    Args:
+        digest (str): Hash do template
+        ler_conteudo: Função que devolve os bytes do template (só chamada na 1ª vez)
+    """
+    modelo = _modelos.get(digest)
+    if modelo is None:
+        modelo = _modelos[digest] = ModeloPaginas(ler_conteudo())
+        if len(_modelos) > CAPACIDADE_MODELOS:
+            _modelos.popitem(last=False)
+    else:
+        _modelos.move_to_end(digest)
+    return modelo
+
+
+class DocumentoPaginas(PacoteDocx):
+    """DOCX renderizado dividido em trechos estáticos e dinâmicos"""
+
+    def trechos(self, modelo):
+        """
+        Args:
+            modelo (ModeloPaginas): Análise do template do documento
+
+        Returns:
+            list | None: [(estático, [blocos])] na ordem do documento, ou None se o
+                documento não puder ser dividido
+        """
+        if modelo.motivo or self.motivo_inelegivel():
+            return None
+        trechos = []
+        for bloco in dividir_blocos(self.corpo):
+            estatico = chave_bloco(bloco) in modelo.estaticos
+            if trechos and trechos[-1][0] == estatico:
+                trechos[-1][1].append(bloco)
+            else:
+                trechos.append((estatico, [bloco]))
+        if len(trechos) < 2 or not any(estatico for estatico, _ in trechos):
+            return None
+        # Listas numeradas continuam a contagem entre trechos: não dividir
+        trechos_por_lista = {}
+        for indice, (_, blocos) in enumerate(trechos):
+            for bloco in blocos:
+                for elemento in bloco:
+                    for lista in elemento.iter(W + 'numId'):
+                        trechos_por_lista.setdefault(lista.get(W + 'val'), set()).add(indice)
+        if any(len(indices) > 1 for indices in trechos_por_lista.values()):
+            return None
+        return trechos
+
+    def _secao_de(self, elemento):
+        """<w:sectPr> da seção que contém o elemento (a próxima que se encerra)"""
+        atual = elemento
+        while atual is not None:
+            if atual.tag == W + 'p' and _tipo_secao(atual) is not None:
+                return atual.find(W + 'pPr').find(W + 'sectPr')
+            atual = atual.getnext()
+        return self.corpo.find(W + 'sectPr')
+
+    def xml_trecho(self, blocos):
+        """
+        document.xml só com os blocos do trecho
+
+        A quebra de página que separa o trecho do seguinte é removida (senão sobraria
+        uma página em branco no fim) e a seção do último bloco vira a seção final.
+        """
+        elementos = [elemento for bloco in blocos for elemento in bloco]
+        secao = self._secao_de(elementos[-1])
+        copias = [etree.fromstring(etree.tostring(elemento)) for elemento in elementos]
+
+        ultimo = copias[-1]
+        if ultimo.tag == W + 'p':
+            if _tipo_secao(ultimo) is not None:
+                ultimo.find(W + 'pPr').remove(ultimo.find(W + 'pPr').find(W + 'sectPr'))
+            quebra = _quebra_final(ultimo)
+            if quebra is not None:
+                if not _texto(ultimo) and next(
+                    (e for e in ultimo.iter(*_CONTEUDO)), None
+                ) is None:
+                    copias.pop()
+                else:
+                    quebra.getparent().remove(quebra)
+
+        raiz = etree.fromstring(etree.tostring(self.raiz))
+        corpo = raiz.find(W + 'body')
+        corpo.clear()
+        corpo.extend(copias)
+        if secao is not None:
+            corpo.append(etree.fromstring(etree.tostring(secao)))
+        return etree.tostring(raiz, xml_declaration=True, encoding='UTF-8', standalone=True)
+
+    def docx_trecho(self, blocos):
+        """DOCX do trecho: o mesmo pacote, com o corpo recortado"""
+        return substituir_membros(self.conteudo, {self.principal: self.xml_trecho(blocos)})
+
+    def chave_trecho(self, blocos, conversor, versao):
+        """
+        Chave do PDF de um trecho estático
+
+        Cobre tudo o que aparece nas páginas do trecho: o XML dos blocos, as partes
+        referenciadas por eles (imagens...) e as partes do pacote que valem para o
+        documento todo (estilos, numeração, tema, cabeçalhos...). Mídia usada só por
+        outros trechos (os gráficos de cada proposta) fica de fora.
+        """
+        sha = hashlib.sha256(f'{conversor}\0{versao}\0'.encode('utf-8'))
+        referencias = set()
+        for bloco in blocos:
+            sha.update(chave_bloco(bloco).encode('ascii'))
+            for elemento in bloco:
+                for filho in elemento.iter():
+                    for atributo, valor in filho.attrib.items():
+                        if atributo.startswith(R):
+                            referencias.add(valor)
+        for rid in sorted(referencias):
+            tipo, alvo = self.relacoes.get(rid, ('', None))
+            crc = self.zip.getinfo(alvo).CRC if alvo in self.nomes else 0
+            sha.update(f'{rid}\0{tipo}\0{alvo}\0{crc}\0'.encode('utf-8'))
+
+        # Partes do pacote, exceto o corpo, metadados e alvos das relações do corpo
+        pasta, nome = posixpath.split(self.principal)
+        proprias = {self.principal, posixpath.join(pasta, '_rels', f'{nome}.rels'),
+                    '[Content_Types].xml'}
+        proprias |= {alvo for tipo, alvo in self.relacoes.values()
+                     if alvo and tipo not in ('styles', 'numbering', 'settings', 'theme',
+                                              'fontTable', 'header', 'footer', 'webSettings')}
+        for info in sorted(self.zip.infolist(), key=lambda i: i.filename):
+            if info.filename in proprias or info.filename.startswith(('docProps/', 'word/charts/',
+                                                                      'word/embeddings/')):
+                continue
+            if info.filename.startswith('word/media/') and not self._midia_global(info.filename):
+                continue
+            sha.update(f'{info.filename}\0{info.CRC}\0'.encode('utf-8'))
+        return sha.hexdigest()
+
+    def _midia_global(self, nome):
+        """Mídia referenciada por cabeçalhos/rodapés (aparece em todas as páginas)"""
+        if not hasattr(self, '_globais'):
+            self._globais = set()
+            for parte in self.partes_do_tipo('header', 'footer'):
+                self._globais |= {alvo for _, alvo in self._relacoes(parte).values() if alvo}
+        return nome in self._globais
+
+
+def concatenar_pdfs(pdfs, destino):
+    """
+    Junta PDFs página a página, na ordem
+
+    Args:
+        pdfs (list): Caminhos ou bytes dos PDFs
+        destino: Caminho do PDF final
+    """
+    from pypdf import PdfWriter
+
+    escritor = PdfWriter()
+    for pdf in pdfs:
+        escritor.append(io.BytesIO(pdf) if isinstance(pdf, (bytes, bytearray)) else str(pdf))
+    with open(destino, 'wb') as f:
+        escritor.write(f)
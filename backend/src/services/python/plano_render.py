@@ -0,0 +1,172 @@
+"""
+Plano de renderização: caminho rápido sem Jinja2 para templates simples
+
+A maioria dos templates de proposta só usa substituições {{ VAR }} / {{ item.campo }}
+e laços {% tr for item in lista %} (que o patch_xml do docxtpl já reduz a um
+{% for %} comum em volta da linha da tabela). Para esses, o XML do template é
+compilado uma vez em um plano:
+
+- trechos fixos: texto do XML já pronto, emitido como está
+- Valor: {{ nome }}, {{ a.b }} ou {{ a['b'] }}; imagens são valores também
+  (str() de um InlineImage insere a parte e devolve o <w:drawing>)
+- Repeticao: {% for x in lista %}...{% endfor %}, com um sub-plano por item
+
+Renderizar vira percorrer o plano e juntar strings. A semântica é a do Jinja2 com
+autoescape desligado (o padrão do docxtpl): atributos caem para itens de dicionário,
+variáveis ausentes viram '' e atributos de variáveis ausentes levantam UndefinedError.
+
+Qualquer outra construção (filtros, if, set, loop.index, expressões...) faz compilar()
+devolver None e o chamador usa o Jinja2 normalmente.
+"""
+
+from jinja2 import Environment, nodes
+from jinja2.exceptions import TemplateSyntaxError
+
+
+_ambiente = Environment()
+
+
+class _NaoSuportado(Exception):
+    """Construção que o plano não expressa (o template vai pelo Jinja2)"""
+
+
+class Valor:
+    """Slot {{ ... }}: nome raiz (do contexto ou de um laço) + atributos/itens"""
+
+    __slots__ = ('nome', 'local', 'acessos')
+
+    def __init__(self, nome, local, acessos):
+        self.nome = nome
+        self.local = local
+        self.acessos = acessos  # [(getattr?, chave)]
+
+    def resolver(self, contexto, locais):
+        origem = locais if self.local else contexto
+        if self.nome in origem:
+            valor = origem[self.nome]
+        else:
+            valor = _ambiente.undefined(name=self.nome)
+        for atributo, chave in self.acessos:
+            if atributo:
+                valor = _ambiente.getattr(valor, chave)
+            else:
+                valor = _ambiente.getitem(valor, chave)
+        return valor
+
+
+class Repeticao:
+    """Slot {% for alvo in lista %}: o corpo é renderizado uma vez por item"""
+
+    __slots__ = ('alvo', 'lista', 'corpo')
+
+    def __init__(self, alvo, lista, corpo):
+        self.alvo = alvo
+        self.lista = lista
+        self.corpo = corpo
+
+
+class PlanoRender:
+    """Template compilado em trechos fixos e slots"""
+
+    def __init__(self, pecas, variaveis):
+        """
+        Args:
+            pecas (list): str (trecho fixo), Valor ou Repeticao
+            variaveis (frozenset): Nomes lidos do contexto (equivale a
+                jinja2.meta.find_undeclared_variables)
+        """
+        self.pecas = pecas
+        self.variaveis = variaveis
+
+    def renderizar(self, contexto):
+        """
+        Args:
+            contexto (dict): Variáveis do template
+
+        Returns:
+            str: Saída igual à de jinja2.Template(fonte).render(contexto)
+        """
+        saida = []
+        _emitir(self.pecas, contexto, {}, saida)
+        return ''.join(saida)
+
+
+def _emitir(pecas, contexto, locais, saida):
+    for peca in pecas:
+        if peca.__class__ is str:
+            saida.append(peca)
+        elif peca.__class__ is Valor:
+            saida.append(str(peca.resolver(contexto, locais)))
+        else:
+            locais_item = dict(locais)
+            for item in peca.lista.resolver(contexto, locais):
+                locais_item[peca.alvo] = item
+                _emitir(peca.corpo, contexto, locais_item, saida)
+
+
+def compilar(fonte):
+    """
+    Compila uma fonte Jinja2 em plano
+
+    Args:
+        fonte (str): Template (XML já pré-processado pelo patch_xml do docxtpl)
+
+    Returns:
+        PlanoRender | None: None se a fonte usar algo que o plano não expressa ou tiver
+            erro de sintaxe (o Jinja2 reporta o erro no caminho normal)
+    """
+    try:
+        arvore = _ambiente.parse(fonte)
+    except TemplateSyntaxError:
+        return None
+    variaveis = set()
+    try:
+        pecas = _compilar_nos(arvore.body, frozenset(), variaveis)
+    except _NaoSuportado:
+        return None
+    return PlanoRender(pecas, frozenset(variaveis))
+
+
+def _compilar_nos(corpo, locais, variaveis):
+    pecas = []
+    for no in corpo:
+        if isinstance(no, nodes.Output):
+            for filho in no.nodes:
+                if isinstance(filho, nodes.TemplateData):
+                    # Trechos fixos vizinhos viram um só
+                    if pecas and pecas[-1].__class__ is str:
+                        pecas[-1] += filho.data
+                    else:
+                        pecas.append(filho.data)
+                else:
+                    pecas.append(_compilar_valor(filho, locais, variaveis))
+        elif isinstance(no, nodes.For):
+            if (not isinstance(no.target, nodes.Name) or no.else_ or no.test is not None
+                    or no.recursive):
+                raise _NaoSuportado(no)
+            lista = _compilar_valor(no.iter, locais, variaveis)
+            corpo_laco = _compilar_nos(no.body, locais | {no.target.name}, variaveis)
+            pecas.append(Repeticao(no.target.name, lista, corpo_laco))
+        else:
+            raise _NaoSuportado(no)
+    return pecas
+
+
+def _compilar_valor(no, locais, variaveis):
+    """Name seguido de Getattr/Getitem com chave constante"""
+    acessos = []
+    while not isinstance(no, nodes.Name):
+        if isinstance(no, nodes.Getattr):
+            acessos.append((True, no.attr))
+        elif isinstance(no, nodes.Getitem) and isinstance(no.arg, nodes.Const):
+            acessos.append((False, no.arg.value))
+        else:
+            raise _NaoSuportado(no)
+        no = no.node
+    # loop (LoopContext) e globais do Jinja2 (range, dict...) não vêm do contexto
+    if no.name == 'loop' or (no.name not in locais and no.name in _ambiente.globals):
+        raise _NaoSuportado(no)
+    local = no.name in locais
+    if not local:
+        variaveis.add(no.name)
+    return Valor(no.name, local, acessos[::-1])
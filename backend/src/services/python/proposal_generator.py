@@ -4,18 +4,69 @@ Migração de Node.js para Python usando docxtpl (Jinja2)
 
 Autor: Sistema de Geração de Propostas
 Data: 2025-12-03
+
+Dependências pesadas (numpy, docx/docxtpl/jinja2, matplotlib) são importadas no
+primeiro uso: parâmetros inválidos e template inexistente respondem em milissegundos.
+O modo --worker as carrega antes do evento ready (aquecer_dependencias) e o modo
+--warmup mostra quanto cada uma custa.
 """
 
-import matplotlib
-matplotlib.use('Agg')  # Backend sem GUI para ambientes sem display
-import matplotlib.pyplot as plt
+import importlib
 import io
+import math
 import os
 import sys
 import json
 import traceback
-from docxtpl import DocxTemplate, InlineImage
-from docx.shared import Mm
+from functools import lru_cache
+
+try:
+    from .charts import motor_graficos
+    from .formatacao import anos, interpretar_lote, interpretar_numero, kwh, moeda, percentual, tarifa
+    from .instrumentacao import (
+        Cronometro, Perfilador, relatorio_inicializacao, imprimir_relatorio_inicializacao
+    )
+    from .template_schema import carregar_schema, chaves_ausentes, podar_contexto, schema_valido
+    from .output_cache import cache_saidas, chave_proposta, digest_arquivo
+    from . import protocolo
+except ImportError:
+    from charts import motor_graficos
+    from formatacao import anos, interpretar_lote, interpretar_numero, kwh, moeda, percentual, tarifa
+    from instrumentacao import (
+        Cronometro, Perfilador, relatorio_inicializacao, imprimir_relatorio_inicializacao
+    )
+    from template_schema import carregar_schema, chaves_ausentes, podar_contexto, schema_valido
+    from output_cache import cache_saidas, chave_proposta, digest_arquivo
+    import protocolo
+
+
+def _modulo(nome):
+    """Import tardio de um módulo irmão (funciona como pacote e como script)"""
+    return importlib.import_module(f'{__package__}.{nome}' if __package__ else nome)
+
+
+# Ordem do relatório do --warmup: bibliotecas primeiro, depois os módulos irmãos
+MODULOS_PESADOS = (
+    'numpy', 'jinja2', 'lxml.etree', 'docx', 'docxtpl',
+    'matplotlib.figure', 'matplotlib.backends.backend_agg',
+)
+MODULOS_IRMAOS = (
+    'cash_flow', 'metricas_financeiras', 'simulacao_risco', 'template_cache', 'midia_docx',
+    'docx_to_pdf',
+)
+
+
+# Montar só as entradas do contexto que o template usa (PROPOSAL_LAZY_CONTEXT=0 desliga)
+CONTEXTO_SOB_DEMANDA = os.environ.get('PROPOSAL_LAZY_CONTEXT', '1') != '0'
+
+
+def _imagem_inline(doc, imagem, largura_mm):
+    """
+    InlineImage do docxtpl para um gráfico de MotorGraficos.*_docx: bytes de um PNG
+    (sem cópia, ver midia_docx), par (svg, png de fallback) ou gráfico nativo do Word
+    """
+    from docx.shared import Mm
+    return _modulo('midia_docx').inline_grafico(doc, imagem, Mm(largura_mm))
 
 
 class GeradorPropostaSolar:
@@ -29,13 +80,20 @@ class GeradorPropostaSolar:
     - Suporte a tabelas dinâmicas e imagens inline
     """
     
-    def __init__(self, template_path, silent=False):
+    def __init__(self, template_path, silent=False, usar_cache=True, cronometro=None, schema=None,
+                 contexto_sob_demanda=None):
         """
         Inicializa o gerador com o template DOCX
         
         Args:
             template_path (str): Caminho para o arquivo template .docx
             silent (bool): Se True, desabilita todos os prints (modo produção)
+            usar_cache (bool): Se True, reaproveita o template já compilado (ver template_cache)
+            cronometro (Cronometro): Onde registrar o tempo de cada etapa (padrão: novo)
+            schema (dict): Schema do template (ver template_schema); se omitido, usa o
+                <template>.schema.json ao lado do arquivo, quando existir
+            contexto_sob_demanda (bool): Se True, só calcula as variáveis (e gráficos)
+                que o template usa (padrão: PROPOSAL_LAZY_CONTEXT, ligado)
             
         Raises:
             FileNotFoundError: Se o template não existir
@@ -44,8 +102,25 @@ class GeradorPropostaSolar:
             raise FileNotFoundError(f"Template não encontrado: {template_path}")
         
         self.template_path = template_path
-        self.doc = DocxTemplate(template_path)
+        self.cronometro = cronometro or Cronometro()
+        with self.cronometro.etapa('template_load'):
+            if usar_cache:
+                self.doc = _modulo('template_cache').cache_templates.obter(template_path)
+            else:
+                from docxtpl import DocxTemplate
+                self.doc = DocxTemplate(template_path)
         self.silent = silent
+        
+        # Schema só vale para a mesma versão do template (hash do conteúdo)
+        digest = getattr(getattr(self.doc, 'compilado', None), 'digest', None)
+        if schema is not None:
+            self.schema = schema if schema_valido(schema, digest) else None
+        else:
+            self.schema = carregar_schema(template_path, digest)
+        self.chaves_ausentes = []
+        if contexto_sob_demanda is None:
+            contexto_sob_demanda = CONTEXTO_SOB_DEMANDA
+        self.contexto_sob_demanda = contexto_sob_demanda
         # Print removido em modo produção - pode causar buffering
     
     def safe_float(self, value, default):
@@ -66,15 +141,10 @@ class GeradorPropostaSolar:
         if isinstance(value, (int, float)):
             return float(value)
         
+        # Formato brasileiro (R$ 1.234,56 / 1142,00) ou numérico (1234.56)
         try:
-            value_str = str(value).strip()
-            # Se contém "R$" ou vírgula, é formato brasileiro (R$ 1.234,56)
-            if 'R$' in value_str or ',' in value_str:
-                # Formato brasileiro: remover R$, trocar ponto por nada (milhar) e vírgula por ponto (decimal)
-                value_str = value_str.replace('R$', '').replace('.', '').replace(',', '.').strip()
-            # Senão, assumir que já está em formato numérico correto (1234.56)
-            return float(value_str)
-        except (ValueError, AttributeError):
+            return interpretar_numero(value)
+        except ValueError:
             return default
     
     def format_currency(self, value):
@@ -87,7 +157,37 @@ class GeradorPropostaSolar:
         Returns:
             str: Valor formatado como moeda
         """
-        return f"R$ {value:,.2f}".replace(',', 'X').replace('.', ',').replace('X', '.')
+        return moeda(value)
+    
+    def variaveis_template(self):
+        """
+        Variáveis de nível raiz que o template usa, para montar só o contexto necessário
+        
+        Vêm do AST Jinja2 do template compilado (template_cache) ou, sem cache, do
+        schema do template.
+        
+        Returns:
+            frozenset | None: None se o modo sob demanda estiver desligado ou se as
+                variáveis não forem conhecidas (contexto completo)
+        """
+        if not self.contexto_sob_demanda:
+            return None
+        return self.chaves_template()
+
+    def chaves_template(self):
+        """
+        Nomes de nível raiz que o template lê do contexto: os do AST Jinja2 do template
+        compilado (exatos) ou, sem cache, os do schema
+
+        Returns:
+            frozenset | None: None se não houver template compilado nem schema
+        """
+        compilado = getattr(self.doc, 'compilado', None)
+        if compilado is not None:
+            return compilado.variaveis
+        if self.schema:
+            return frozenset(self.schema['root_keys'])
+        return None
     
     def _print(self, *args, **kwargs):
         """Print condicional - só imprime se não estiver em modo silencioso"""
@@ -109,125 +209,81 @@ class GeradorPropostaSolar:
         consumo_base = consumo_mensal if consumo_mensal else 1200
         producao_base = producao_mensal if producao_mensal else 1500
         
-        meses = ['Jan', 'Fev', 'Mar', 'Abr', 'Mai', 'Jun', 'Jul', 'Ago', 'Set', 'Out', 'Nov', 'Dez']
-        # Consumo constante ao longo do ano
-        consumo = [consumo_base] * 12
-        # Produção varia ±10% ao longo do ano (simula variação sazonal)
-        geracao = [
-            producao_base * 1.00, producao_base * 0.97, producao_base * 1.07, producao_base * 1.03,
-            producao_base * 0.93, producao_base * 0.87, producao_base * 0.90, producao_base * 1.00,
-            producao_base * 1.07, producao_base * 1.10, producao_base * 1.00, producao_base * 0.97
-        ]
-
-        # Criar figura
-        plt.figure(figsize=(8, 4))
-        
-        # Plotar barras lado a lado
-        x = range(len(meses))
-        width = 0.35
-        
-        plt.bar([i - width/2 for i in x], consumo, width=width, 
-                color='#76b900', label='Consumo', alpha=0.8)
-        plt.bar([i + width/2 for i in x], geracao, width=width, 
-                color='#008EC4', label='Geração', alpha=0.8)
-        
-        # Configurações visuais
-        plt.title('COMPARATIVO CONSUMO x GERAÇÃO', fontsize=14, fontweight='bold')
-        plt.xlabel('Mês', fontsize=10)
-        plt.ylabel('Energia (kWh)', fontsize=10)
-        plt.xticks(x, meses, rotation=45, ha='right')
-        plt.legend(loc='upper right')
-        plt.tight_layout()
-        
-        # Remover bordas desnecessárias
-        ax = plt.gca()
-        ax.spines['top'].set_visible(False)
-        ax.spines['right'].set_visible(False)
-        
-        # Grid leve
-        ax.grid(axis='y', alpha=0.3, linestyle='--', linewidth=0.5)
-
-        # Salvar em buffer de memória (sem arquivo em disco)
-        buffer = io.BytesIO()
-        plt.savefig(buffer, format='png', dpi=150, bbox_inches='tight')
-        plt.close()  # Liberar memória
-        buffer.seek(0)
-        
-        # Retornar como InlineImage
-        return InlineImage(self.doc, buffer, width=Mm(160))
+        # Layout fixo + cache de imagem por série (ver charts.MotorGraficos)
+        imagem = motor_graficos.comparativo_docx(consumo_base, producao_base)
+        return _imagem_inline(self.doc, imagem, 160)
 
     def gerar_grafico_retorno(self, tabela_fluxo):
         """
         Gera o gráfico de barras do retorno financeiro (25 anos)
         
         Args:
-            tabela_fluxo (list): Lista com dados do fluxo de caixa
+            tabela_fluxo (dict | list): Fluxo numérico (calcular_fluxo_numerico) ou
+                lista formatada (calcular_fluxo_caixa)
             
         Returns:
             InlineImage: Objeto de imagem para inserção no DOCX
         """
-        # Extrair dados do fluxo
-        anos = [int(item['ano']) for item in tabela_fluxo]
-        
-        # Converter economia acumulada para números (remover "R$", ".", e substituir "," por ".")
-        valores_acumulados = []
-        for item in tabela_fluxo:
-            valor_str = item['eco_ac'].replace('R$', '').replace('.', '').replace(',', '.').strip()
-            valor = float(valor_str)
-            valores_acumulados.append(valor)
-        
-        # Criar figura maior para acomodar 25 barras
-        plt.figure(figsize=(14, 5))
-        
-        # Criar barras - vermelhas para valores negativos, verdes para positivos
-        cores = ['#dc3545' if v < 0 else '#28a745' for v in valores_acumulados]
-        
-        plt.bar(anos, valores_acumulados, color=cores, width=0.7, alpha=0.85, edgecolor='white', linewidth=0.5)
-        
-        # Linha zero
-        plt.axhline(y=0, color='black', linestyle='-', linewidth=1.5, alpha=0.5)
-        
-        # Configurações visuais
-        plt.title('SEU RETORNO', fontsize=18, fontweight='bold', pad=20)
-        plt.xlabel('', fontsize=11)  # Sem label no eixo X
-        plt.ylabel('', fontsize=11)  # Sem label no eixo Y
-        
-        # Configurar eixo X para mostrar todos os anos
-        plt.xticks(anos, anos, fontsize=8, rotation=0)
-        
-        # Formatação do eixo Y - valores em milhares
-        ax = plt.gca()
-        ax.yaxis.set_major_formatter(plt.FuncFormatter(lambda x, p: f'{int(x/1000)}'))
-        
-        # Adicionar legenda do fluxo de caixa abaixo das barras
-        for i, (ano, valor) in enumerate(zip(anos, valores_acumulados)):
-            if i % 2 == 0 or ano in [1, 5, 10, 15, 20, 25]:  # Mostrar valores alternados
-                ax.text(ano, -50000, f'{int(valor/1000)}', 
-                       ha='center', va='top', fontsize=7, color='#555')
-        
-        # Remover bordas superiores e direitas
-        ax.spines['top'].set_visible(False)
-        ax.spines['right'].set_visible(False)
-        ax.spines['left'].set_visible(False)
+        if isinstance(tabela_fluxo, dict):
+            valores_acumulados = tabela_fluxo['eco_ac'].tolist()
+        else:
+            # Lista formatada: converter "R$ 1.234,56" de volta para número
+            valores_acumulados = interpretar_lote(item['eco_ac'] for item in tabela_fluxo)
         
-        # Grid horizontal leve
-        ax.grid(axis='y', alpha=0.2, linestyle='--', linewidth=0.5)
-        ax.set_axisbelow(True)
+        imagem = motor_graficos.retorno_docx(valores_acumulados)
+        return _imagem_inline(self.doc, imagem, 180)
+
+    def _economia_mensal(self, dados_cliente):
+        """Economia mensal do primeiro ano em R$ (valor sem formatação tem prioridade)"""
+        economia_mensal = dados_cliente.get('valor_economia_mensal')
+        if not economia_mensal:
+            # Fallback: tentar extrair de economia_mensal formatada
+            return self.safe_float(dados_cliente.get('economia_mensal', 'R$ 1142,00'), 1142)
+        return self.safe_float(economia_mensal, 1142)
+
+    def calcular_fluxo_numerico(self, valor_investimento, dados_cliente=None):
+        """
+        Calcula o fluxo de caixa projetado para 25 anos em forma numérica
         
-        # Ajustar limites do eixo Y
-        ymin = min(valores_acumulados) * 1.2 if min(valores_acumulados) < 0 else -10000
-        ymax = max(valores_acumulados) * 1.1
-        ax.set_ylim(ymin, ymax)
+        Args:
+            valor_investimento (float): Valor do investimento inicial em R$
+            dados_cliente (dict): Dados da proposta para usar valores reais
+            
+        Returns:
+            dict: Colunas do fluxo como arrays NumPy (ver cash_flow.calcular_fluxo)
+        """
+        dados_cliente = dados_cliente or {}
         
-        plt.tight_layout()
+        # Extrair dados reais ou usar fallbacks (com tratamento de valores vazios)
+        tarifa_base = self.safe_float(dados_cliente.get('tarifa'), 0.92)
         
-        # Salvar em buffer com DPI maior
-        buffer = io.BytesIO()
-        plt.savefig(buffer, format='png', dpi=200, bbox_inches='tight', facecolor='white')
-        plt.close()
-        buffer.seek(0)
+        return _modulo('cash_flow').calcular_fluxo(
+            valor_investimento=valor_investimento,
+            economia_mensal=self._economia_mensal(dados_cliente),
+            tarifa=tarifa_base,
+            producao_mensal=self.safe_float(dados_cliente.get('producao_media'), 1500),
+            consumo_mensal=self.safe_float(dados_cliente.get('consumo_medio'), 1350),
+        )
+
+    def simular_risco(self, valor_investimento, dados_cliente=None):
+        """
+        Percentis (10, 50, 90) do payback e da economia em 25 anos em cenários sorteados
+        de inflação, degradação e consumo (ver simulacao_risco)
         
-        return InlineImage(self.doc, buffer, width=Mm(180))
+        Args:
+            valor_investimento (float): Valor do investimento inicial em R$
+            dados_cliente (dict): Dados da proposta (mesmos campos do fluxo de caixa)
+            
+        Returns:
+            dict: Resultado de simulacao_risco.simular_cenarios
+        """
+        dados_cliente = dados_cliente or {}
+        return _modulo('simulacao_risco').simular_cenarios(
+            valor_investimento=self.safe_float(valor_investimento, 0),
+            economia_mensal=self._economia_mensal(dados_cliente),
+            producao_mensal=self.safe_float(dados_cliente.get('producao_media'), 1500),
+            consumo_mensal=self.safe_float(dados_cliente.get('consumo_medio'), 1350),
+        )
 
     def calcular_fluxo_caixa(self, valor_investimento, dados_cliente=None):
         """
@@ -240,154 +296,22 @@ class GeradorPropostaSolar:
         Returns:
             list: Lista de dicionários com dados anuais do fluxo de caixa
         """
-        # Extrair dados reais ou usar fallbacks (com tratamento de valores vazios)
-        tarifa_base = self.safe_float(dados_cliente.get('tarifa') if dados_cliente else None, 0.92)
-        
-        # Tentar pegar economia mensal sem formatação primeiro
-        economia_mensal = dados_cliente.get('valor_economia_mensal') if dados_cliente else None
-        if not economia_mensal:
-            # Fallback: tentar extrair de economia_mensal formatada
-            economia_mensal_str = dados_cliente.get('economia_mensal', 'R$ 1142,00') if dados_cliente else 'R$ 1142,00'
-            economia_mensal = self.safe_float(economia_mensal_str, 1142)
-        else:
-            economia_mensal = self.safe_float(economia_mensal, 1142)
-        
-        economia_anual_base = economia_mensal * 12
-        producao_media = self.safe_float(dados_cliente.get('producao_media') if dados_cliente else None, 1500)
-        consumo_medio = self.safe_float(dados_cliente.get('consumo_medio') if dados_cliente else None, 1350)
-        producao_anual = producao_media * 12
-        consumo_anual = consumo_medio * 12
-        
-        lista_fluxo = []
-        saldo = -valor_investimento  # Começa negativo (investimento)
-        
-        # Calcular economia acumulada para anos específicos (1, 5, 10, 25)
-        economia_ano_1 = None
-        economia_ano_5 = None
-        economia_ano_10 = None
-        economia_ano_25 = None
-        
-        for ano in range(1, 26):
-            # Inflação energética estimada em 5% ao ano
-            fator_inflacao = 1.05 ** (ano - 1)
-            econ_atual = economia_anual_base * fator_inflacao
-            saldo += econ_atual
-            
-            # Cálculos auxiliares com dados reais
-            tarifa_ano = tarifa_base * fator_inflacao
-            fatura_sem_solar = consumo_anual * tarifa_ano
-            fatura_com_solar = 100  # Custo mínimo
-            credito_acumulado = (producao_anual - consumo_anual) * (1 + (ano * 0.01))  # Degrada 1% ao ano
-            economia_acumulada = saldo + valor_investimento
-            
-            # Guardar valores específicos
-            if ano == 1:
-                economia_ano_1 = f"R$ {economia_acumulada:,.2f}".replace(',', 'X').replace('.', ',').replace('X', '.')
-            elif ano == 5:
-                economia_ano_5 = f"R$ {economia_acumulada:,.2f}".replace(',', 'X').replace('.', ',').replace('X', '.')
-            elif ano == 10:
-                economia_ano_10 = f"R$ {economia_acumulada:,.2f}".replace(',', 'X').replace('.', ',').replace('X', '.')
-            elif ano == 25:
-                economia_ano_25 = f"R$ {economia_acumulada:,.2f}".replace(',', 'X').replace('.', ',').replace('X', '.')
-            
-            # Formatação do Payback (negativo até atingir break-even)
-            if saldo > 0:
-                texto_payback = f"R$ {saldo:,.2f}".replace(',', 'X').replace('.', ',').replace('X', '.')
-            else:
-                texto_payback = f"-R$ {abs(saldo):,.2f}".replace(',', 'X').replace('.', ',').replace('X', '.')
-            
-            # Montar linha da tabela - cada linha representa UM ANO específico
-            linha_fluxo = {
-                # Ano atual (usado na primeira coluna)
-                'ano': str(ano),
-                
-                # Dados técnicos e financeiros DESTE ANO específico (VALORES REAIS)
-                # Nomes conforme template Word
-                'tar': f'{tarifa_ano:.2f}'.replace('.', ','),  # Tarifa em R$/kWh
-                'tar_fb': f'{(tarifa_ano * 0.3):.2f}'.replace('.', ','),  # Tarifa Fio B (30% da tarifa)
-                'en_g': f"{producao_anual:,.0f}".replace(',', '.'),  # Energia Gerada em kWh
-                'en_cons': f"{consumo_anual:,.0f}".replace(',', '.'),  # Energia Consumida em kWh
-                'cred_ac': f"{max(0, credito_acumulado):,.0f}".replace(',', '.'),  # Crédito Acumulado em kWh
-                
-                # Valores financeiros deste ano (VALORES REAIS)
-                'fat_s_sol': f"R$ {fatura_sem_solar:,.2f}".replace(',', 'X').replace('.', ',').replace('X', '.'),  # Fatura Sem Solar
-                'fat_c_sol': f"R$ {fatura_com_solar:,.2f}".replace(',', 'X').replace('.', ',').replace('X', '.'),  # Fatura Com Solar
-                'eco': f"R$ {econ_atual:,.2f}".replace(',', 'X').replace('.', ',').replace('X', '.'),  # Economia
-                'eco_ac': f"R$ {economia_acumulada:,.2f}".replace(',', 'X').replace('.', ',').replace('X', '.'),  # Economia Acumulada
-                'payback': texto_payback,
-                
-                # Valores para tabela de rentabilidade (mesmo em todos os anos)
-                'inves': f"R$ {valor_investimento:,.2f}".replace(',', 'X').replace('.', ',').replace('X', '.'),
-                'mensal': f"R$ {econ_atual/12:,.2f}".replace(',', 'X').replace('.', ',').replace('X', '.'),
-                
-                # Anos específicos para tabela de rentabilidade (todos os itens têm os mesmos valores)
-                'anoa': economia_ano_1 if economia_ano_1 else 'R$ 0,00',
-                'anob': economia_ano_5 if economia_ano_5 else 'R$ 0,00',
-                'anoc': economia_ano_10 if economia_ano_10 else 'R$ 0,00',
-                'anod': economia_ano_25 if economia_ano_25 else 'R$ 0,00',
-            }
-            
-            lista_fluxo.append(linha_fluxo)
-        
-        return lista_fluxo
+        return _modulo('cash_flow').formatar_fluxo(
+            self.calcular_fluxo_numerico(valor_investimento, dados_cliente)
+        )
 
-    def gerar(self, dados_cliente, output_path):
+    def calcular_rentabilidade(self, valor_inv, fluxo, tabela_fluxo):
         """
-        Gera a proposta completa em DOCX
+        Monta a comparação de rentabilidade (Energia Solar, Poupança e CDB)
         
         Args:
-            dados_cliente (dict): Dicionário com dados do cliente
-                Campos obrigatórios: nome, doc
-                Campos opcionais: email, valor_investimento
-            output_path (str): Caminho para salvar o arquivo gerado
+            valor_inv (float): Valor do investimento em R$
+            fluxo (dict): Fluxo numérico (calcular_fluxo_numerico)
+            tabela_fluxo (list): Fluxo formatado (formatar_fluxo)
             
         Returns:
-            str: Caminho do arquivo gerado
+            tuple: (economia acumulada nos anos 1, 5, 10 e 25, linhas da tabela)
         """
-        self._print("\n" + "="*70)
-        self._print("INICIANDO GERACAO DE PROPOSTA")
-        self._print("="*70)
-        
-        # 1. Gerar gráficos
-        self._print("\n1. Gerando graficos...")
-        # Extrair dados reais para o gráfico
-        consumo_mensal = self.safe_float(dados_cliente.get('consumo_medio'), 1200)
-        producao_mensal = self.safe_float(dados_cliente.get('producao_media'), 0)
-        
-        # Se produção é 0 ou muito baixa, tentar extrair do título do kit
-        if producao_mensal < 100:
-            titulo_kit = dados_cliente.get('title', '')
-            import re
-            # Buscar padrões como "4.200 KWH", "4200KWH", "1.500 KMH"
-            match = re.search(r'(\d+\.?\d*)\s*(?:KWH|KMH)', titulo_kit, re.IGNORECASE)
-            if match:
-                # Remover ponto de milhar e converter
-                valor_str = match.group(1).replace('.', '')
-                producao_mensal = float(valor_str)
-                self._print(f"   ⚠️ Produção extraída do título do kit: {producao_mensal} kWh")
-        
-        # Garantir valor mínimo razoável
-        if producao_mensal < 100:
-            producao_mensal = 1500
-            self._print(f"   ⚠️ Usando produção padrão: {producao_mensal} kWh")
-        
-        img_comparativo = self.gerar_grafico_comparativo(consumo_mensal, producao_mensal)
-        self._print(f"   OK Grafico comparativo criado (Consumo: {consumo_mensal} kWh, Produção: {producao_mensal} kWh)")
-        
-        # 2. Calcular tabelas financeiras
-        self._print("\n2. Calculando tabelas financeiras...")
-        valor_inv = dados_cliente.get('valor_investimento', 25000)
-        # Passar produção calculada para garantir consistência
-        dados_cliente_com_producao = {**dados_cliente, 'producao_media': producao_mensal}
-        tabela_fluxo = self.calcular_fluxo_caixa(valor_inv, dados_cliente_com_producao)
-        self._print(f"   OK Fluxo de caixa calculado (25 anos) com produção: {producao_mensal} kWh/mês")
-        
-        # 3. Gerar gráfico de retorno
-        self._print("\n3. Gerando grafico de retorno...")
-        img_retorno = self.gerar_grafico_retorno(tabela_fluxo)
-        self._print("   OK Grafico de retorno criado")
-        self._print(f"   OK Fluxo de caixa calculado (25 anos)")
-        
         # Extrair valores específicos para tabela de rentabilidade (anos 1, 5, 10, 25)
         valores_rentabilidade = {
             'ano_1': tabela_fluxo[0]['eco_ac'],  # Economia acumulada no ano 1
@@ -397,7 +321,8 @@ class GeradorPropostaSolar:
         }
         
         # Calcular rentabilidade para comparação (Energia Solar, Poupança, CDB)
-        mensal_solar = float(tabela_fluxo[0]['mensal'].replace('R$', '').replace('.', '').replace(',', '.').strip())
+        # Arredondado em centavos, como o valor exibido na tabela
+        mensal_solar = round(float(fluxo['mensal'][0]), 2)
         
         # Poupança (0,5% ao mês)
         poup_ano1 = mensal_solar * 12 * 1.005**6  # 6 meses de rendimento médio
@@ -415,7 +340,7 @@ class GeradorPropostaSolar:
         tabela_rentabilidade = [
             {
                 'tipo': 'Energia Solar',
-                'investimento': f"R$ {valor_inv:,.2f}".replace(',', 'X').replace('.', ',').replace('X', '.'),
+                'investimento': moeda(valor_inv),
                 'mensal': tabela_fluxo[0]['mensal'],
                 'ano1': valores_rentabilidade['ano_1'],
                 'ano5': valores_rentabilidade['ano_5'],
@@ -429,42 +354,146 @@ class GeradorPropostaSolar:
             },
             {
                 'tipo': 'Poupança',
-                'investimento': f"R$ {valor_inv:,.2f}".replace(',', 'X').replace('.', ',').replace('X', '.'),
-                'mensal': f"R$ {mensal_solar * 0.75:,.2f}".replace(',', 'X').replace('.', ',').replace('X', '.'),
-                'ano1': f"R$ {poup_ano1:,.2f}".replace(',', 'X').replace('.', ',').replace('X', '.'),
-                'ano5': f"R$ {poup_ano5:,.2f}".replace(',', 'X').replace('.', ',').replace('X', '.'),
-                'ano10': f"R$ {poup_ano10:,.2f}".replace(',', 'X').replace('.', ',').replace('X', '.'),
-                'ano25': f"R$ {poup_ano25:,.2f}".replace(',', 'X').replace('.', ',').replace('X', '.'),
+                'investimento': moeda(valor_inv),
+                'mensal': moeda(mensal_solar * 0.75),
+                'ano1': moeda(poup_ano1),
+                'ano5': moeda(poup_ano5),
+                'ano10': moeda(poup_ano10),
+                'ano25': moeda(poup_ano25),
                 # Nomes alternativos
-                '1ano': f"R$ {poup_ano1:,.2f}".replace(',', 'X').replace('.', ',').replace('X', '.'),
-                '5anos': f"R$ {poup_ano5:,.2f}".replace(',', 'X').replace('.', ',').replace('X', '.'),
-                '10anos': f"R$ {poup_ano10:,.2f}".replace(',', 'X').replace('.', ',').replace('X', '.'),
-                '25anos': f"R$ {poup_ano25:,.2f}".replace(',', 'X').replace('.', ',').replace('X', '.'),
+                '1ano': moeda(poup_ano1),
+                '5anos': moeda(poup_ano5),
+                '10anos': moeda(poup_ano10),
+                '25anos': moeda(poup_ano25),
             },
             {
                 'tipo': 'CDB',
-                'investimento': f"R$ {valor_inv:,.2f}".replace(',', 'X').replace('.', ',').replace('X', '.'),
-                'mensal': f"R$ {mensal_solar * 1.02:,.2f}".replace(',', 'X').replace('.', ',').replace('X', '.'),
-                'ano1': f"R$ {cdb_ano1:,.2f}".replace(',', 'X').replace('.', ',').replace('X', '.'),
-                'ano5': f"R$ {cdb_ano5:,.2f}".replace(',', 'X').replace('.', ',').replace('X', '.'),
-                'ano10': f"R$ {cdb_ano10:,.2f}".replace(',', 'X').replace('.', ',').replace('X', '.'),
-                'ano25': f"R$ {cdb_ano25:,.2f}".replace(',', 'X').replace('.', ',').replace('X', '.'),
+                'investimento': moeda(valor_inv),
+                'mensal': moeda(mensal_solar * 1.02),
+                'ano1': moeda(cdb_ano1),
+                'ano5': moeda(cdb_ano5),
+                'ano10': moeda(cdb_ano10),
+                'ano25': moeda(cdb_ano25),
                 # Nomes alternativos
-                '1ano': f"R$ {cdb_ano1:,.2f}".replace(',', 'X').replace('.', ',').replace('X', '.'),
-                '5anos': f"R$ {cdb_ano5:,.2f}".replace(',', 'X').replace('.', ',').replace('X', '.'),
-                '10anos': f"R$ {cdb_ano10:,.2f}".replace(',', 'X').replace('.', ',').replace('X', '.'),
-                '25anos': f"R$ {cdb_ano25:,.2f}".replace(',', 'X').replace('.', ',').replace('X', '.'),
+                '1ano': moeda(cdb_ano1),
+                '5anos': moeda(cdb_ano5),
+                '10anos': moeda(cdb_ano10),
+                '25anos': moeda(cdb_ano25),
             }
         ]
         
-        # 4. Montar contexto completo
-        self._print("\n4. Montando contexto de variaveis...")
+        return valores_rentabilidade, tabela_rentabilidade
+
+    def gerar(self, dados_cliente, output_path, progresso=None):
+        """
+        Gera a proposta completa em DOCX
         
-        # DEBUG: Verificar simulações recebidas
-        simulacoes_recebidas = dados_cliente.get('simulacoes', [])
-        print(f"[DEBUG-PYTHON] Simulações recebidas: {simulacoes_recebidas}", flush=True)
+        Args:
+            dados_cliente (dict): Dicionário com dados do cliente
+                Campos obrigatórios: nome, doc
+                Campos opcionais: email, valor_investimento
+            output_path (str | BytesIO): Caminho para salvar o arquivo gerado
+                ou stream em memória (ver gerar_em_memoria)
+            progresso: Callback progresso(etapa, **dados) chamado com charts_done,
+                rendered e saved (ver protocolo.py)
+            
+        Returns:
+            str: Caminho do arquivo gerado (ou o próprio stream)
+        """
+        self._print("\n" + "="*70)
+        self._print("INICIANDO GERACAO DE PROPOSTA")
+        self._print("="*70)
+        self.cronometro.reiniciar_marca()
         
-        contexto = {
+        # Variáveis que o template usa (None: contexto completo)
+        usadas = self.variaveis_template()
+        
+        # 1. Dados de base
+        self._print("\n1. Lendo dados de consumo e produção...")
+        consumo_mensal = self.safe_float(dados_cliente.get('consumo_medio'), 1200)
+        producao_mensal = self.safe_float(dados_cliente.get('producao_media'), 0)
+        
+        # Se produção é 0 ou muito baixa, tentar extrair do título do kit
+        if producao_mensal < 100:
+            titulo_kit = dados_cliente.get('title', '')
+            import re
+            # Buscar padrões como "4.200 KWH", "4200KWH", "1.500 KMH"
+            match = re.search(r'(\d+\.?\d*)\s*(?:KWH|KMH)', titulo_kit, re.IGNORECASE)
+            if match:
+                # Remover ponto de milhar e converter
+                valor_str = match.group(1).replace('.', '')
+                producao_mensal = float(valor_str)
+                self._print(f"   ⚠️ Produção extraída do título do kit: {producao_mensal} kWh")
+        
+        # Garantir valor mínimo razoável
+        if producao_mensal < 100:
+            producao_mensal = 1500
+            self._print(f"   ⚠️ Usando produção padrão: {producao_mensal} kWh")
+        
+        valor_inv = dados_cliente.get('valor_investimento', 25000)
+        
+        # Provedores das entradas caras: só rodam se o template usar a variável.
+        # Intermediários compartilhados (fluxo, rentabilidade) são calculados uma vez.
+        @lru_cache(maxsize=None)
+        def fluxo():
+            with self.cronometro.etapa('cash_flow'):
+                # Passar produção calculada para garantir consistência
+                dados_cliente_com_producao = {**dados_cliente, 'producao_media': producao_mensal}
+                numerico = self.calcular_fluxo_numerico(valor_inv, dados_cliente_com_producao)
+                self._print(f"   OK Fluxo de caixa calculado (25 anos) com produção: {producao_mensal} kWh/mês")
+                return numerico, _modulo('cash_flow').formatar_fluxo(numerico)
+        
+        @lru_cache(maxsize=None)
+        def rentabilidade():
+            numerico, tabela_fluxo = fluxo()
+            return self.calcular_rentabilidade(valor_inv, numerico, tabela_fluxo)
+        
+        @lru_cache(maxsize=None)
+        def risco():
+            with self.cronometro.etapa('risk'):
+                dados_cliente_com_producao = {**dados_cliente, 'producao_media': producao_mensal}
+                return self.simular_risco(valor_inv, dados_cliente_com_producao)
+        
+        @lru_cache(maxsize=None)
+        def metricas():
+            numerico, _ = fluxo()
+            with self.cronometro.etapa('metrics'):
+                return _modulo('metricas_financeiras').calcular_metricas(numerico)
+        
+        def texto_payback(anos_payback):
+            if anos_payback == float('inf'):
+                return f"mais de {len(fluxo()[1])}"
+            return anos(anos_payback)
+        
+        def texto_meses(meses):
+            if math.isinf(meses):
+                return f"mais de {len(fluxo()[1]) * 12}"
+            return str(int(meses))
+        
+        def texto_taxa(taxa, casas=0):
+            # TIR indefinida (sem investimento ou sem economia)
+            return '-' if math.isnan(taxa) else percentual(taxa * 100, casas)
+        
+        def payback_percentil(indice):
+            return texto_payback(float(risco()['payback'][indice]))
+        
+        def grafico_comparativo():
+            with self.cronometro.etapa('chart_comparativo'):
+                img = self.gerar_grafico_comparativo(consumo_mensal, producao_mensal)
+            self._print(f"   OK Grafico comparativo criado (Consumo: {consumo_mensal} kWh, Produção: {producao_mensal} kWh)")
+            return img
+        
+        def grafico_retorno():
+            numerico, _ = fluxo()
+            with self.cronometro.etapa('chart_retorno'):
+                img = self.gerar_grafico_retorno(numerico)
+            self._print("   OK Grafico de retorno criado")
+            return img
+        
+        # 2. Montar contexto: valores simples entram direto, funções são provedores
+        self._print("\n2. Montando contexto de variaveis...")
+        
+        provedores = {
             # --- Dados do Cliente ---
             'NOME_CLIENTE': dados_cliente.get('nome', 'CLIENTE NÃO INFORMADO'),
             'CPF_CNPJ_CLIENTE': dados_cliente.get('doc', '000.000.000-00'),
@@ -486,13 +515,13 @@ class GeradorPropostaSolar:
             # --- Dados Técnicos do Sistema ---
             'POT_TOTAL': f"{self.safe_float(dados_cliente.get('potencia'), 5.5)} kWp",
             'NUM_PAINEL': str(dados_cliente.get('num_paineis', '10')),
-            'PRODU_MEDIA': f"{int(producao_mensal)} kWh",  # Usar mesmo valor do gráfico
+            'PRODU_MEDIA': kwh(producao_mensal),  # Usar mesmo valor do gráfico
             # ⭐ AREA_TOTAL - USAR DADOS REAIS DO CLIENTE
             'AREA_TOTAL': dados_cliente.get('area') or (f"{self.safe_float(dados_cliente.get('area_necessaria'), 30)} m²" if dados_cliente.get('area_necessaria') else '30 m²'),
-            'CONSU_MEDIO': f"{int(self.safe_float(dados_cliente.get('consumo_medio'), 600))} kWh",
+            'CONSU_MEDIO': kwh(self.safe_float(dados_cliente.get('consumo_medio'), 600)),
             
             # --- Valores Financeiros ---
-            'VAL_INVEST': f"R$ {valor_inv:,.2f}".replace(',', 'X').replace('.', ',').replace('X', '.'),
+            'VAL_INVEST': lambda: self.format_currency(valor_inv),
             'VALOR_ENTRADA': self.format_currency(self.safe_float(dados_cliente.get('valor_entrada'), 0)),
             'VALOR_POR_WP': 'R$ 4,55',
             'VALOR_CONTA_ATUAL': self.format_currency(self.safe_float(dados_cliente.get('valor_conta_atual'), 1200)),
@@ -507,9 +536,24 @@ class GeradorPropostaSolar:
             'GARAN_ESTRU': '10 Anos',
             'GARAN_SERVI': '1 Ano',
             
-            # --- Payback e ROI ---
-            'ANO_PAYBACK': dados_cliente.get('payback_anos', '3,5'),
-            'PERC_RETORNO': dados_cliente.get('percentual_retorno', '28%'),
+            # --- Payback e ROI (calculados do fluxo de caixa, ver metricas_financeiras) ---
+            'ANO_PAYBACK': lambda: texto_payback(float(metricas()['payback_meses']) / 12),
+            'MES_PAYBACK': lambda: texto_meses(float(metricas()['payback_meses'])),
+            'PERC_RETORNO': lambda: texto_taxa(float(metricas()['tir'])),
+            'TIR': lambda: texto_taxa(float(metricas()['tir']), 1),
+            'VPL': lambda: moeda(float(metricas()['vpl'])),
+            'LCOE': lambda: f"R$ {tarifa(float(metricas()['lcoe']))}/kWh",
+            
+            # --- Risco (simulação Monte Carlo, percentis 10/50/90) ---
+            # PAYBACK_P10 é o payback curto (otimista) e PAYBACK_P90 o longo (pessimista);
+            # ECONOMIA_25_P10 é a economia menor (pessimista) e ECONOMIA_25_P90 a maior
+            'PAYBACK_P10': lambda: payback_percentil(0),
+            'PAYBACK_P50': lambda: payback_percentil(1),
+            'PAYBACK_P90': lambda: payback_percentil(2),
+            'ECONOMIA_25_P10': lambda: moeda(risco()['economia'][0]),
+            'ECONOMIA_25_P50': lambda: moeda(risco()['economia'][1]),
+            'ECONOMIA_25_P90': lambda: moeda(risco()['economia'][2]),
+            'CHANCE_PAYBACK': lambda: percentual(risco()['prob_payback'] * 100),
             
             # --- Dados Ecológicos ---
             'CO2_ARVORES': '150',
@@ -536,43 +580,67 @@ class GeradorPropostaSolar:
                 {'desc': 'Cabos e Conectores', 'qtd': '1 kit'},
             ]),
             
-            'fluxo': tabela_fluxo,
+            'fluxo': lambda: fluxo()[1],
             
             # --- Tabela de Rentabilidade (3 cenários de comparação) ---
-            'rentabilidade': tabela_rentabilidade,
+            'rentabilidade': lambda: rentabilidade()[1],
             
             # --- Variáveis da Tabela de Rentabilidade (SEM LOOP) ---
-            'inves': f"R$ {valor_inv:,.2f}".replace(',', 'X').replace('.', ',').replace('X', '.'),
-            'mensal': tabela_fluxo[0]['mensal'],  # Economia mensal do primeiro ano
+            'inves': lambda: self.format_currency(valor_inv),
+            'mensal': lambda: fluxo()[1][0]['mensal'],  # Economia mensal do primeiro ano
             
             # Variáveis com nomes alternativos (caso você use nomes diferentes no template)
-            'ano_1': valores_rentabilidade['ano_1'],
-            'ano_5': valores_rentabilidade['ano_5'],
-            'ano_10': valores_rentabilidade['ano_10'],
-            'ano_25': valores_rentabilidade['ano_25'],
+            'ano_1': lambda: rentabilidade()[0]['ano_1'],
+            'ano_5': lambda: rentabilidade()[0]['ano_5'],
+            'ano_10': lambda: rentabilidade()[0]['ano_10'],
+            'ano_25': lambda: rentabilidade()[0]['ano_25'],
             
             # Nomes alternativos para anos (anoa, anob, anoc, anod)
-            'anoa': valores_rentabilidade['ano_1'],
-            'anob': valores_rentabilidade['ano_5'],
-            'anoc': valores_rentabilidade['ano_10'],
-            'anod': valores_rentabilidade['ano_25'],
+            'anoa': lambda: rentabilidade()[0]['ano_1'],
+            'anob': lambda: rentabilidade()[0]['ano_5'],
+            'anoc': lambda: rentabilidade()[0]['ano_10'],
+            'anod': lambda: rentabilidade()[0]['ano_25'],
             
             # --- Imagens Geradas ---
-            'grafico_comparativo': img_comparativo,
-            'grafico_retorno': img_retorno,
+            'grafico_comparativo': grafico_comparativo,
+            'grafico_retorno': grafico_retorno,
         }
         
+        contexto = {
+            chave: valor() if callable(valor) else valor
+            for chave, valor in provedores.items()
+            if usadas is None or chave in usadas
+        }
+        if progresso:
+            progresso('charts_done')
+        
+        from docxtpl import InlineImage
         total_vars = len([k for k in contexto.keys() if not isinstance(contexto[k], (list, InlineImage))])
         self._print(f"   OK {total_vars} variaveis simples")
-        self._print(f"   OK {len(contexto['simulacao'])} simulacoes de financiamento")
-        if contexto['simulacao']:
-            self._print(f"      DEBUG Simulações: {contexto['simulacao']}")
-        self._print(f"   OK {len(contexto['fluxo'])} anos de fluxo de caixa")
-        self._print(f"   OK {len(contexto['rentabilidade'])} cenarios de rentabilidade")
-        self._print(f"   OK 2 graficos gerados")
-
-        # 5. Renderizar documento
-        self._print("\n5. Renderizando documento...")
+        if usadas is not None:
+            self._print(f"   OK Contexto sob demanda: {len(contexto)} de {len(provedores)} entradas usadas pelo template")
+        if 'simulacao' in contexto:
+            self._print(f"   OK {len(contexto['simulacao'])} simulacoes de financiamento")
+        if 'fluxo' in contexto:
+            self._print(f"   OK {len(contexto['fluxo'])} anos de fluxo de caixa")
+        if 'rentabilidade' in contexto:
+            self._print(f"   OK {len(contexto['rentabilidade'])} cenarios de rentabilidade")
+        graficos = [k for k in ('grafico_comparativo', 'grafico_retorno') if k in contexto]
+        self._print(f"   OK {len(graficos)} graficos gerados")
+        
+        # Validar e podar pelas variáveis do template compilado ou do schema (sem reler o DOCX)
+        chaves = self.chaves_template()
+        if chaves is not None:
+            self.chaves_ausentes = chaves_ausentes(chaves, contexto)
+            if self.chaves_ausentes:
+                self._print(f"   AVISO variaveis sem valor no contexto: {', '.join(self.chaves_ausentes)}")
+            contexto = podar_contexto(chaves, contexto)
+            self._print(f"   OK Contexto podado pelas variáveis do template ({len(contexto)} chaves usadas)")
+
+        self.cronometro.marcar('context')
+        
+        # 3. Renderizar documento
+        self._print("\n3. Renderizando documento...")
         try:
             # IMPORTANTE: NÃO passar jinja_env customizado
             # docxtpl precisa processar tags especiais do Word ({% tr %}) internamente
@@ -584,102 +652,439 @@ class GeradorPropostaSolar:
             self._print(f"   Dica: Verifique se o template usa tags Jinja2 validas")
             self._print(f"   Tags especiais do Word: {{% tr for item in lista %}} ... {{% tr endfor %}}")
             raise
+        self.cronometro.marcar('render')
+        if progresso:
+            progresso('rendered')
         
-        # 5. Salvar arquivo
-        self._print(f"\n6. Salvando em: {output_path}")
+        # 4. Salvar arquivo (em disco ou em memória)
+        em_memoria = hasattr(output_path, 'write')
+        self._print(f"\n4. Salvando em: {'memória' if em_memoria else output_path}")
         try:
             self.doc.save(output_path)
-            file_size = os.path.getsize(output_path) / 1024  # KB
+            if em_memoria:
+                file_size = output_path.getbuffer().nbytes / 1024  # KB
+            else:
+                file_size = os.path.getsize(output_path) / 1024  # KB
             self._print(f"   OK Arquivo salvo ({file_size:.1f} KB)")
         except Exception as e:
             self._print(f"   ERRO ao salvar: {str(e)}")
             raise
+        self.cronometro.marcar('save')
+        if progresso and not em_memoria:
+            progresso('saved', path=output_path)
         
         self._print("\n" + "="*70)
         self._print("PROPOSTA GERADA COM SUCESSO!")
         self._print("="*70)
-        self._print(f"Arquivo: {os.path.basename(output_path)}")
-        self._print(f"Caminho: {os.path.abspath(output_path)}")
-        self._print("="*70 + "\n")
+        if not em_memoria:
+            self._print(f"Arquivo: {os.path.basename(output_path)}")
+            self._print(f"Caminho: {os.path.abspath(output_path)}")
+            self._print("="*70 + "\n")
         
         return output_path
 
+    def gerar_em_memoria(self, dados_cliente, progresso=None):
+        """
+        Gera a proposta sem tocar o disco
+        
+        Args:
+            dados_cliente (dict): Dicionário com dados do cliente
+            progresso: Callback de progresso (ver gerar)
+            
+        Returns:
+            bytes: Conteúdo do DOCX gerado
+        """
+        buffer = io.BytesIO()
+        self.gerar(dados_cliente, buffer, progresso)
+        return buffer.getvalue()
+
+
+def processar_job(params, progresso=None):
+    """
+    Executa um job de geração a partir dos parâmetros enviados pelo backend
+    
+    Com "pdf_path", DOCX e PDF saem da mesma invocação: o documento é renderizado em
+    memória e os bytes vão direto para o conversor, sem reabrir o arquivo em outro processo.
+    Nesse modo "output_path" é opcional (sem ele só o PDF é gravado).
+    
+    Com o cache de saídas ativo (output_cache.py) uma proposta idêntica já gerada
+    (mesmo template, mesmos dados, mesma versão do gerador) é copiada do cache sem
+    renderizar; o resultado traz "output_cache": "hit" ou "miss" (e "pdf_cache" na
+    conversão). Em um acerto não há "missing_keys".
+    
+    O resultado sempre traz "timings" (ms por etapa, total e pico de RSS). Com
+    "profile" ('cprofile' ou 'tracemalloc', padrão: PROPOSAL_PROFILE) o job é
+    perfilado e o arquivo gerado volta em "profile_path" (ver instrumentacao.py).
+    
+    Args:
+        params (dict): template_path, output_path, dados_cliente, pdf_path (opcional),
+            schema (opcional, ver template_schema), lazy_context (padrão:
+            PROPOSAL_LAZY_CONTEXT), output_cache (padrão: True), profile e
+            profile_dir (opcionais)
+        progresso: Callback de progresso (ver GeradorPropostaSolar.gerar)
+        
+    Returns:
+        dict: Resultado no formato esperado pelo backend TypeScript
+    """
+    cronometro = Cronometro()
+    
+    modo_perfil = params.get('profile') or os.environ.get('PROPOSAL_PROFILE')
+    if modo_perfil:
+        try:
+            perfilador = Perfilador(modo_perfil, params.get('profile_dir'), params.get('id'))
+        except ValueError as e:
+            return {'success': False, 'error': str(e)}
+        
+        with perfilador:
+            resultado = _executar_job(params, progresso, cronometro)
+        resultado['profile_path'] = perfilador.caminho
+    else:
+        resultado = _executar_job(params, progresso, cronometro)
+    
+    resultado['timings'] = cronometro.resumo()
+    return resultado
+
+
+def _executar_job(params, progresso, cronometro):
+    template_path = params.get('template_path')
+    output_path = params.get('output_path')
+    pdf_path = params.get('pdf_path')
+    dados_cliente = params.get('dados_cliente') or {}
+    
+    if not template_path or not (output_path or pdf_path):
+        return {
+            'success': False,
+            'error': 'Parâmetros obrigatórios: template_path, output_path (ou pdf_path)'
+        }
+    
+    # Mesma proposta já gerada (template + dados + versão do gerador): reaproveitar o DOCX
+    chave = conteudo = None
+    usar_cache = cache_saidas.ativo and params.get('output_cache', True)
+    if usar_cache:
+        with cronometro.etapa('output_cache'):
+            try:
+                chave = chave_proposta(digest_arquivo(template_path), dados_cliente)
+            except OSError:
+                # Template inacessível: o gerador devolve o erro de sempre
+                usar_cache = False
+            else:
+                conteudo = cache_saidas.ler(chave, '.docx')
+    
+    resultado = {'success': True}
+    if conteudo is not None:
+        resultado['output_cache'] = 'hit'
+        if output_path:
+            with cronometro.etapa('save'), open(output_path, 'wb') as f:
+                f.write(conteudo)
+    else:
+        try:
+            gerador = GeradorPropostaSolar(
+                template_path, silent=True, cronometro=cronometro, schema=params.get('schema'),
+                contexto_sob_demanda=params.get('lazy_context')
+            )
+        except Exception as e:
+            return {
+                'success': False,
+                'error': f'Erro ao criar gerador: {str(e)}',
+                'traceback': traceback.format_exc()
+            }
+        
+        try:
+            if pdf_path:
+                conteudo = gerador.gerar_em_memoria(dados_cliente, progresso)
+                if output_path:
+                    with cronometro.etapa('save'), open(output_path, 'wb') as f:
+                        f.write(conteudo)
+            else:
+                gerador.gerar(dados_cliente, output_path, progresso)
+        except Exception as e:
+            return {
+                'success': False,
+                'error': f'Erro ao gerar documento: {str(e)}',
+                'traceback': traceback.format_exc()
+            }
+        
+        if usar_cache:
+            resultado['output_cache'] = 'miss'
+            with cronometro.etapa('output_cache'):
+                cache_saidas.gravar(chave, '.docx', conteudo, None if pdf_path else output_path)
+        if gerador.chaves_ausentes:
+            resultado['missing_keys'] = gerador.chaves_ausentes
+    
+    if output_path:
+        resultado['generated_path'] = output_path
+        resultado['file_size'] = os.path.getsize(output_path)
+    
+    if pdf_path:
+        # Import tardio: o conversor só é carregado quando há PDF no job
+        with cronometro.etapa('pdf_convert'):
+            pdf = _modulo('docx_to_pdf').convert_bytes_to_pdf(
+                conteudo, pdf_path, params.get('pdf_timeout'), params.get('output_cache', True),
+                template_path, params.get('static_pages')
+            )
+        if pdf['success']:
+            resultado['pdf_path'] = pdf['pdf_path']
+            resultado['pdf_file_size'] = pdf['file_size']
+            if 'cache' in pdf:
+                resultado['pdf_cache'] = pdf['cache']
+            if 'static_pages' in pdf:
+                resultado['pdf_static_pages'] = pdf['static_pages']
+        elif output_path:
+            # DOCX já está pronto: o backend decide o que fazer sem o PDF
+            resultado['pdf_error'] = pdf['error']
+        else:
+            return pdf
+        
+        if progresso:
+            progresso('saved', path=output_path, pdf_path=resultado.get('pdf_path'))
+    elif progresso and resultado.get('output_cache') == 'hit':
+        progresso('saved', path=output_path)
+    
+    return resultado
+
+
+def aquecer_dependencias():
+    """
+    Importa as dependências adiadas, monta os layouts dos gráficos e força a
+    inicialização preguiçosa do matplotlib (cache de fontes) para que o primeiro job
+    do worker não pague esse custo
+    """
+    for nome in ('cash_flow', 'metricas_financeiras', 'simulacao_risco', 'template_cache',
+                 'midia_docx'):
+        _modulo(nome)
+    motor_graficos.aquecer()
+
+
+def relatorio_aquecimento():
+    """
+    Custo de inicialização de cada dependência (ver instrumentacao.relatorio_inicializacao)
+
+    Returns:
+        dict: imports_ms, warmup_ms (layouts e fontes dos gráficos), total_ms e peak_rss_mb
+    """
+    irmaos = [f'{__package__}.{nome}' if __package__ else nome for nome in MODULOS_IRMAOS]
+    return relatorio_inicializacao([*MODULOS_PESADOS, *irmaos], aquecer_dependencias)
+
+
+def executar_worker(entrada=None, saida=None):
+    """
+    MODO WORKER: processo de longa duração mantido em pool pelo backend
+    
+    Um job JSON por linha no stdin; eventos do protocolo (protocolo.py) no stdout.
+    
+    Args:
+        entrada: Stream de entrada (padrão: stdin)
+        saida: Stream do protocolo (padrão: stdout)
+    """
+    protocolo.executar_worker(processar_job, aquecer_dependencias, entrada, saida)
+
+
+def _inicializar_processo_lote():
+    """Initializer dos processos do lote: aquece gráficos e protege o stdout do pai"""
+    sys.stdout = sys.stderr
+    aquecer_dependencias()
+
+
+def _executar_job_lote(params):
+    try:
+        return processar_job(params)
+    except Exception as e:
+        return protocolo.erro(e)
+
+
+def _rodada_lote(fila, max_workers):
+    """
+    Executa os jobs da fila em um pool até a fila esvaziar ou o pool quebrar
+    
+    Só max_workers + 1 jobs ficam submetidos por vez, então se um processo morrer
+    apenas os jobs em execução naquele momento são afetados.
+    
+    Yields:
+        dict: Resultados concluídos
+        
+    Returns:
+        list: Pares (índice, job) que estavam em execução quando o pool quebrou
+    """
+    from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+    from concurrent.futures.process import BrokenProcessPool
+    
+    em_execucao = {}
+    with ProcessPoolExecutor(max_workers=max_workers,
+                             initializer=_inicializar_processo_lote) as executor:
+        while fila or em_execucao:
+            while fila and len(em_execucao) <= max_workers:
+                indice, job = fila.popleft()
+                em_execucao[executor.submit(_executar_job_lote, job)] = (indice, job)
+            
+            concluidos, _ = wait(em_execucao, return_when=FIRST_COMPLETED)
+            for futuro in concluidos:
+                indice, job = em_execucao.pop(futuro)
+                try:
+                    resultado = futuro.result()
+                except BrokenProcessPool:
+                    return [(indice, job)] + list(em_execucao.values())
+                
+                resultado['job_id'] = job.get('id')
+                resultado['index'] = indice
+                yield resultado
+    return []
+
 
-# --- Modo de Execução: Teste ou Produção ---
+def gerar_lote(jobs, max_workers=None, template_path=None):
+    """
+    Gera várias propostas em paralelo, devolvendo cada resultado assim que fica pronto
+    
+    Cada processo do pool mantém o cache de templates e os layouts dos gráficos entre
+    os jobs que executa, então o template é compilado uma vez por processo (e não por
+    proposta). Um job com erro não interrompe o lote; se um processo morrer, o pool é
+    recriado e os jobs que estavam em execução são repetidos isoladamente, para
+    identificar qual deles derrubou o processo.
+    
+    Args:
+        jobs (list): Jobs no formato de processar_job (template_path, output_path,
+            dados_cliente, pdf_path opcional e id opcional)
+        max_workers (int): Número de processos (padrão: núcleos disponíveis)
+        template_path (str): Template padrão para jobs que não informam o próprio
+        
+    Yields:
+        dict: Resultado de processar_job acrescido de "job_id" e "index" (posição no lote)
+    """
+    from collections import deque
+    
+    jobs = list(jobs)
+    if template_path:
+        jobs = [job if job.get('template_path') else {**job, 'template_path': template_path}
+                for job in jobs]
+    
+    if not max_workers:
+        try:
+            max_workers = len(os.sched_getaffinity(0))
+        except AttributeError:
+            max_workers = os.cpu_count() or 1
+    max_workers = max(1, min(max_workers, len(jobs) or 1))
+    
+    fila = deque(enumerate(jobs))
+    while fila:
+        interrompidos = yield from _rodada_lote(fila, max_workers)
+        
+        # Repetir cada job interrompido sozinho em um processo novo
+        for indice, job in interrompidos:
+            if (yield from _rodada_lote(deque([(indice, job)]), 1)):
+                yield {
+                    'success': False,
+                    'error': 'Processo do lote encerrado inesperadamente durante o job',
+                    'job_id': job.get('id'),
+                    'index': indice
+                }
+
+
+def executar_lote(entrada=None, saida=None):
+    """
+    MODO LOTE: lê a lista de jobs do stdin e emite um evento por job concluído
+    
+    Entrada: um array JSON de jobs, um objeto {"jobs": [...], "workers": N,
+    "template_path": "..."} ou um job JSON por linha. Saída: um evento result/error
+    por job (na ordem de conclusão, com "index") e, por último, o evento done com o
+    resumo. Os jobs rodam em outros processos, então só os eventos terminais são emitidos.
+    
+    Args:
+        entrada: Stream de entrada (padrão: stdin)
+        saida: Stream do protocolo (padrão: stdout)
+    """
+    import time
+    
+    entrada = entrada or sys.stdin
+    canal = protocolo.CanalEventos(saida) if saida else protocolo.abrir_canal()
+    
+    texto = entrada.read().strip()
+    opcoes = {}
+    try:
+        dados = json.loads(texto) if texto else []
+    except json.JSONDecodeError:
+        # Um job por linha
+        dados = [json.loads(linha) for linha in texto.splitlines() if linha.strip()]
+    
+    if isinstance(dados, dict):
+        opcoes = dados
+        dados = dados.get('jobs', [])
+    
+    inicio = time.perf_counter()
+    total = sucessos = 0
+    for resultado in gerar_lote(dados, opcoes.get('workers'), opcoes.get('template_path')):
+        total += 1
+        sucessos += bool(resultado.get('success'))
+        canal.finalizar(resultado, resultado.pop('job_id'))
+    
+    canal.emitir(
+        'done',
+        total=total,
+        success=sucessos,
+        failed=total - sucessos,
+        elapsed=round(time.perf_counter() - inicio, 3)
+    )
+    return total == sucessos
+
+
+# --- Modo de Execução: Teste, Produção, Worker ou Lote ---
 if __name__ == "__main__":
     import sys
     import json
     
     # Detectar modo de execução
-    if len(sys.argv) > 1 and sys.argv[1] == "--production":
+    if len(sys.argv) > 1 and sys.argv[1] == "--worker":
         """
-        MODO PRODUÇÃO: Recebe JSON via stdin
-        Chamado pelo backend TypeScript
+        MODO WORKER: job JSON por linha no stdin, eventos no stdout
+        Mantido vivo pelo pool de workers do backend TypeScript
+        """
+        executar_worker()
+        sys.exit(0)
+    
+    elif len(sys.argv) > 1 and sys.argv[1] == "--warmup":
         """
+        MODO AQUECIMENTO: custo de import de cada dependência e do aquecimento
+        Detalhe por submódulo: python -X importtime proposal_generator.py --warmup
+        """
+        print("\n*** Inicialização do gerador de propostas\n")
+        imprimir_relatorio_inicializacao(relatorio_aquecimento())
+        sys.exit(0)
+    
+    elif len(sys.argv) > 1 and sys.argv[1] == "--batch":
+        """
+        MODO LOTE: lista de jobs via stdin, resultados em streaming (eventos)
+        Ex.: regenerar propostas após mudança de tarifa ou de template
+        """
+        canal = protocolo.abrir_canal()
+        try:
+            sys.exit(0 if executar_lote(saida=canal.saida) else 1)
+        except Exception as e:
+            canal.finalizar(protocolo.erro(e))
+            sys.exit(1)
+    
+    elif len(sys.argv) > 1 and sys.argv[1] == "--production":
+        """
+        MODO PRODUÇÃO: Recebe JSON via stdin, emite eventos no stdout
+        Chamado pelo backend TypeScript (a última linha é o evento result/error)
+        """
+        canal = protocolo.abrir_canal()
         try:
             # Ler JSON do stdin
             input_data = sys.stdin.read()
             
             if not input_data:
-                print(json.dumps({
+                canal.finalizar({
                     'success': False,
                     'error': 'Nenhum dado recebido via stdin'
-                }), flush=True)
+                })
                 sys.exit(1)
             
             params = json.loads(input_data)
             
-            # Extrair parâmetros
-            template_path = params.get('template_path')
-            output_path = params.get('output_path')
-            dados_cliente = params.get('dados_cliente', {})
-            
-            if not template_path or not output_path:
-                print(json.dumps({
-                    'success': False,
-                    'error': 'Parâmetros obrigatórios: template_path, output_path'
-                }), flush=True)
-                sys.exit(1)
-            
             # Gerar proposta em modo silencioso
-            try:
-                gerador = GeradorPropostaSolar(template_path, silent=True)
-            except Exception as e:
-                error_json = json.dumps({
-                    'success': False,
-                    'error': f'Erro ao criar gerador: {str(e)}',
-                    'traceback': traceback.format_exc()
-                })
-                print(error_json, flush=True)
-                sys.exit(1)
-            
-            try:
-                arquivo_gerado = gerador.gerar(dados_cliente, output_path)
-            except Exception as e:
-                error_json = json.dumps({
-                    'success': False,
-                    'error': f'Erro ao gerar documento: {str(e)}',
-                    'traceback': traceback.format_exc()
-                })
-                print(error_json, flush=True)
-                sys.exit(1)
-            
-            # Retornar sucesso
-            print(json.dumps({
-                'success': True,
-                'generated_path': arquivo_gerado,
-                'file_size': os.path.getsize(arquivo_gerado)
-            }), flush=True)
-            sys.exit(0)
+            resultado = protocolo.executar_job(canal, processar_job, params, params.get('id'))
+            sys.exit(0 if resultado['success'] else 1)
             
         except Exception as e:
-            # Retornar erro - VAI PARA STDOUT!
-            error_json = json.dumps({
-                'success': False,
-                'error': str(e),
-                'traceback': traceback.format_exc()
-            })
-            print(error_json, flush=True)  # STDOUT!
+            canal.finalizar(protocolo.erro(e))
             sys.exit(1)
     
     else:
@@ -0,0 +1,149 @@
+"""
+Protocolo de eventos dos scripts Python chamados pelo backend (um JSON por linha)
+
+Nos modos --worker, --production e --batch o stdout é reservado a este protocolo;
+logs e prints de depuração vão para o stderr. Cada linha é um evento:
+
+    {"event": "charts_done", "job_id": "a1b2", "ts": 1733241600.123}
+
+Eventos:
+- ready: worker iniciado e aquecido (sem job_id, traz o pid)
+- started: job recebido
+- charts_done: gráficos gerados
+- rendered: template renderizado
+- saved: arquivo(s) gravado(s)
+- result: fim do job com sucesso
+- error: fim do job com falha
+- done: resumo do modo --batch
+- health: estado e métricas do job_server.py (resposta a {"type": "health"})
+
+Os eventos terminais (result/error) trazem os campos do resultado (success,
+generated_path, error, traceback...) no nível raiz, então quem só lê a última linha
+do stdout continua funcionando.
+"""
+
+import json
+import os
+import sys
+import threading
+import time
+import traceback
+
+
+EVENTOS_TERMINAIS = ('result', 'error')
+
+
+def linha_evento(evento, job_id=None, **dados):
+    """Serializa um evento do protocolo (uma linha JSON terminada em \\n)"""
+    linha = {'event': evento, 'job_id': job_id, 'ts': round(time.time(), 3)}
+    linha.update(dados)
+    return json.dumps(linha) + '\n'
+
+
+class CanalEventos:
+    """Escreve eventos do protocolo em um stream, uma linha JSON por evento"""
+
+    def __init__(self, saida=None):
+        """
+        Args:
+            saida: Stream do protocolo (padrão: stdout)
+        """
+        self.saida = saida or sys.stdout
+        self._lock = threading.Lock()
+
+    def emitir(self, evento, job_id=None, **dados):
+        texto = linha_evento(evento, job_id, **dados)
+        with self._lock:
+            self.saida.write(texto)
+            self.saida.flush()
+
+    def finalizar(self, resultado, job_id=None):
+        """Emite o evento terminal (result ou error) com os campos do resultado"""
+        evento = 'result' if resultado.get('success') else 'error'
+        self.emitir(evento, job_id, **resultado)
+
+    def progresso(self, job_id):
+        """
+        Retorna o callback de progresso de um job, no formato progresso(etapa, **dados)
+        """
+        def notificar(etapa, **dados):
+            self.emitir(etapa, job_id, **dados)
+        return notificar
+
+
+def abrir_canal():
+    """
+    Reserva o stdout real para o protocolo e redireciona prints para o stderr
+
+    Returns:
+        CanalEventos: Canal ligado ao stdout original
+    """
+    saida = sys.stdout
+    sys.stdout = sys.stderr
+    return CanalEventos(saida)
+
+
+def erro(exc):
+    """Resultado de falha padrão a partir de uma exceção"""
+    return {
+        'success': False,
+        'error': str(exc),
+        'traceback': traceback.format_exc()
+    }
+
+
+def executar_job(canal, processar, params, job_id=None):
+    """
+    Executa um job emitindo started, os eventos de progresso e o evento terminal
+
+    Args:
+        canal (CanalEventos): Canal do protocolo
+        processar: Função processar(params, progresso) -> dict de resultado
+        params (dict): Parâmetros do job
+        job_id: Identificador devolvido em todos os eventos
+
+    Returns:
+        dict: Resultado do job
+    """
+    canal.emitir('started', job_id)
+    try:
+        resultado = processar(params, canal.progresso(job_id))
+    except Exception as e:
+        resultado = erro(e)
+    canal.finalizar(resultado, job_id)
+    return resultado
+
+
+def executar_worker(processar, aquecer=None, entrada=None, saida=None):
+    """
+    MODO WORKER: processo de longa duração mantido em pool pelo backend
+
+    Lê um job JSON por linha (com "id" opcional, devolvido como job_id nos eventos)
+    e processa os jobs na ordem de chegada. O backend pode enviar vários jobs sem
+    esperar o resultado do anterior. O processo termina quando o stdin é fechado.
+
+    Args:
+        processar: Função processar(params, progresso) -> dict de resultado
+        aquecer: Função chamada uma vez antes do evento ready (opcional)
+        entrada: Stream de entrada (padrão: stdin)
+        saida: Stream do protocolo (padrão: stdout)
+    """
+    entrada = entrada or sys.stdin
+    canal = CanalEventos(saida) if saida else abrir_canal()
+
+    if aquecer:
+        aquecer()
+    canal.emitir('ready', pid=os.getpid())
+
+    for linha in entrada:
+        linha = linha.strip()
+        if not linha:
+            continue
+
+        try:
+            params = json.loads(linha)
+        except json.JSONDecodeError as e:
+            canal.finalizar({'success': False, 'error': f'JSON inválido: {str(e)}'})
+            continue
+
+        executar_job(canal, processar, params, params.get('id'))
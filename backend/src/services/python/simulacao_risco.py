@@ -0,0 +1,192 @@
+"""
+Simulação Monte Carlo do retorno das propostas solares (payback e economia em 25 anos)
+
+O fluxo de caixa (cash_flow.py) projeta um único cenário, com inflação energética fixa.
+Aqui cada proposta é projetada em milhares de cenários sorteados, todos como arrays
+NumPy (cenários x propostas x anos), para uma proposta ou um lote inteiro de uma vez:
+
+- inflação da tarifa: nível de longo prazo por cenário + ruído de cada ano
+- degradação dos módulos: taxa anual por cenário, composta ano a ano
+- deriva do consumo: taxa anual por cenário (o cliente passa a consumir mais ou menos)
+
+A economia de cada ano acompanha a tarifa e a energia compensada
+(mínimo entre geração e consumo) relativa ao primeiro ano. O resultado são percentis
+do ano de payback e da economia acumulada no horizonte, prontos para a proposta e para
+pontuar leads.
+
+Os sorteios usam uma semente fixa: a mesma proposta sempre dá os mesmos números (o
+DOCX gerado é determinístico e o cache de saídas continua valendo) e todas as
+propostas de um lote veem os mesmos cenários, então a ordenação entre leads não
+depende do sorteio.
+
+Uso em lote (pontuação de leads, sem gerar documento):
+    risco = simular_cenarios(
+        valor_investimento=[25000, 32000, 18000],
+        economia_mensal=[900, 1100, 450],
+        producao_mensal=[1500, 1800, 700],
+        consumo_mensal=[1350, 1700, 800],
+    )
+    risco['payback'][1]        # P50 do payback de cada lead (anos; inf = não paga no horizonte)
+    risco['prob_payback']      # chance de pagar o investimento dentro do horizonte
+"""
+
+from functools import lru_cache
+
+import numpy as np
+
+try:
+    from .cash_flow import ANOS_PADRAO, INFLACAO_PADRAO
+except ImportError:
+    from cash_flow import ANOS_PADRAO, INFLACAO_PADRAO
+
+
+CENARIOS_PADRAO = 2000
+PERCENTIS_PADRAO = (10, 50, 90)
+SEMENTE_PADRAO = 2025
+
+# Inflação energética: nível de longo prazo do cenário (média, desvio) e ruído anual
+INFLACAO_DESVIO = 0.015
+INFLACAO_RUIDO = 0.02
+
+# Degradação anual dos módulos (média, desvio); nunca negativa
+DEGRADACAO_MEDIA = 0.005
+DEGRADACAO_DESVIO = 0.002
+
+# Variação anual do consumo do cliente (média, desvio)
+DERIVA_CONSUMO_MEDIA = 0.0
+DERIVA_CONSUMO_DESVIO = 0.02
+
+# Cenários x propostas por passo do laço dos anos (arrays que cabem no cache da CPU)
+ELEMENTOS_POR_BLOCO = 32_768
+
+
+def sortear_cenarios(cenarios=CENARIOS_PADRAO, anos=ANOS_PADRAO, semente=SEMENTE_PADRAO,
+                     inflacao=INFLACAO_PADRAO):
+    """
+    Sorteia os fatores de cada cenário e ano, comuns a todas as propostas
+
+    Args:
+        cenarios (int): Número de cenários
+        anos (int): Horizonte da projeção
+        semente (int): Semente do gerador (None: sorteio novo a cada chamada)
+        inflacao (float): Inflação energética média
+
+    Returns:
+        dict: 'tarifa' (cenários, anos): tarifa relativa ao ano 1; 'degradacao' e
+            'consumo' (cenários, anos): fatores compostos desde o ano 1
+    """
+    gerador = np.random.default_rng(semente)
+    nivel = gerador.normal(inflacao, INFLACAO_DESVIO, (cenarios, 1))
+    taxas = nivel + gerador.normal(0.0, INFLACAO_RUIDO, (cenarios, anos - 1))
+    degradacao = np.maximum(gerador.normal(DEGRADACAO_MEDIA, DEGRADACAO_DESVIO, (cenarios, 1)), 0.0)
+    deriva = gerador.normal(DERIVA_CONSUMO_MEDIA, DERIVA_CONSUMO_DESVIO, (cenarios, 1))
+
+    expoente = np.arange(anos, dtype=float)
+    tarifa = np.ones((cenarios, anos))
+    # Tarifa não cai abaixo de zero mesmo em sorteios extremos
+    np.cumprod(np.maximum(1 + taxas, 0.0), axis=-1, out=tarifa[:, 1:])
+    return {
+        'tarifa': tarifa,
+        'degradacao': (1 - degradacao) ** expoente,
+        'consumo': (1 + deriva) ** expoente,
+    }
+
+
+@lru_cache(maxsize=8)
+def _cenarios_fixos(cenarios, anos, semente, inflacao):
+    """Sorteio com semente fixa, feito uma vez por processo (arrays somente leitura)"""
+    fatores = sortear_cenarios(cenarios, anos, semente, inflacao)
+    for valores in fatores.values():
+        valores.setflags(write=False)
+    return fatores
+
+
+def simular_cenarios(valor_investimento, economia_mensal, producao_mensal, consumo_mensal,
+                     anos=ANOS_PADRAO, cenarios=CENARIOS_PADRAO, percentis=PERCENTIS_PADRAO,
+                     semente=SEMENTE_PADRAO, inflacao=INFLACAO_PADRAO):
+    """
+    Percentis do payback e da economia acumulada de uma ou várias propostas
+
+    Os parâmetros das propostas aceitam escalares ou arrays 1-D do mesmo tamanho
+    (broadcasting NumPy), como em cash_flow.calcular_fluxo. O cálculo anda ano a ano
+    sobre arrays (cenários, bloco de propostas), que cabem no cache da CPU, em vez de
+    montar o cubo cenários x propostas x anos inteiro.
+
+    Args:
+        valor_investimento: Investimento inicial em R$
+        economia_mensal: Economia mensal no primeiro ano em R$
+        producao_mensal: Produção mensal média em kWh
+        consumo_mensal: Consumo mensal médio em kWh
+        anos (int): Horizonte da projeção
+        cenarios (int): Número de cenários sorteados
+        percentis (tuple): Percentis calculados (0 a 100)
+        semente (int): Semente dos sorteios (None: sorteio novo a cada chamada)
+        inflacao (float): Inflação energética média
+
+    Returns:
+        dict: 'percentis'; 'payback' (anos, fracionário; inf = não paga no horizonte) e
+            'economia' (acumulada no horizonte, R$) com shape (len(percentis), propostas);
+            'prob_payback' com shape (propostas,). Sem o eixo das propostas se todas as
+            entradas forem escalares
+    """
+    investimento, economia, producao, consumo = np.broadcast_arrays(
+        *(np.asarray(valor, dtype=float) for valor in (
+            valor_investimento, economia_mensal, producao_mensal, consumo_mensal))
+    )
+    escalar = investimento.ndim == 0
+    investimento, economia, producao, consumo = (
+        np.atleast_1d(valor) for valor in (investimento, economia, producao, consumo)
+    )
+
+    if semente is None:
+        fatores = sortear_cenarios(cenarios, anos, semente, inflacao)
+    else:
+        fatores = _cenarios_fixos(cenarios, anos, semente, float(inflacao))
+    tarifa, degradacao, deriva = fatores['tarifa'], fatores['degradacao'], fatores['consumo']
+
+    # Energia compensada no ano t, relativa ao ano 1:
+    # min(geração * degradação, consumo * deriva) / min(geração, consumo). Sem dados de
+    # energia, geração e consumo são tratados como iguais
+    base = np.minimum(producao, consumo)
+    com_base = base > 0
+    base = np.where(com_base, base, 1.0)
+    proporcao_geracao = np.where(com_base, producao / base, 1.0)
+    proporcao_consumo = np.where(com_base, consumo / base, 1.0)
+    economia_anual = economia * 12
+
+    propostas = investimento.shape[0]
+    bloco = max(1, ELEMENTOS_POR_BLOCO // cenarios)
+    payback = np.empty((len(percentis), propostas))
+    economia_total = np.empty((len(percentis), propostas))
+    prob_payback = np.empty(propostas)
+    for inicio in range(0, propostas, bloco):
+        fatia = slice(inicio, inicio + bloco)
+        alvo = investimento[fatia]
+        acumulada = np.zeros((cenarios, alvo.shape[0]))
+        anos_payback = np.where(alvo <= 0, 0.0, np.inf) * np.ones((cenarios, 1))
+        for ano in range(anos):
+            anual = np.minimum(degradacao[:, ano, np.newaxis] * proporcao_geracao[fatia],
+                               deriva[:, ano, np.newaxis] * proporcao_consumo[fatia])
+            anual *= tarifa[:, ano, np.newaxis]
+            anual *= economia_anual[fatia]
+            nova = acumulada + anual
+            # A acumulada só cresce: o payback é o ano em que ela cruza o investimento
+            cruzou = (nova >= alvo) & (acumulada < alvo)
+            if cruzou.any():
+                with np.errstate(divide='ignore', invalid='ignore'):
+                    np.copyto(anos_payback, ano + (alvo - acumulada) / anual, where=cruzou)
+            acumulada = nova
+
+        # Sem interpolação: um percentil além do horizonte continua inf
+        payback[:, fatia] = np.percentile(anos_payback, percentis, axis=0, method='inverted_cdf')
+        economia_total[:, fatia] = np.percentile(acumulada, percentis, axis=0)
+        prob_payback[fatia] = np.isfinite(anos_payback).mean(axis=0)
+
+    if escalar:
+        payback, economia_total, prob_payback = payback[:, 0], economia_total[:, 0], prob_payback[0]
+    return {
+        'percentis': tuple(percentis),
+        'payback': payback,
+        'economia': economia_total,
+        'prob_payback': prob_payback,
+    }
@@ -0,0 +1,364 @@
+"""
+Cache de templates DOCX compilados
+
+O backend baixa o mesmo template para um arquivo temporário novo a cada proposta,
+então a chave do cache é o hash do conteúdo (caminho + mtime só evitam reler/re-hashear
+um arquivo já visto). Cada entrada guarda o XML já pré-processado pelo docxtpl
+(tags {% tr %}, {% tc %}, etc. resolvidas) e os templates Jinja2 compilados do corpo,
+cabeçalhos e rodapés. Cada renderização recebe uma cópia barata do documento,
+carregada a partir dos bytes em memória. O conjunto de variáveis lidas pelo template
+(para montar só o contexto necessário) também é calculado uma vez por entrada.
+
+Caminho rápido (PROPOSAL_RENDER_PLAN, ligado por padrão): partes que só usam {{ var }},
+{{ item.campo }} e laços {% tr for %} são compiladas em um plano de renderização
+(plano_render) e renderizadas sem Jinja2; o Jinja2 só é compilado para partes que o
+plano não expressa. Quando o corpo tem plano, cada renderização também monta o
+documento a partir das partes já lidas do zip, sem o corpo do template (que o render
+substitui) e sem parse das partes XML que o render não altera (estilos, tema,
+numeração...), que seguem como bytes até o save. O save copia do zip do template os
+membros que não mudaram, sem recomprimir (escritor_docx).
+"""
+
+import hashlib
+import io
+import os
+import re
+import threading
+from collections import OrderedDict
+
+from docx import Document
+from docx.opc.constants import CONTENT_TYPE as CT
+from docx.opc.oxml import serialize_part_xml
+from docx.opc.package import Unmarshaller
+from docx.opc.part import Part, PartFactory
+from docx.opc.pkgreader import PackageReader, _SerializedPart
+from docx.package import Package
+from docxtpl import DocxTemplate
+from jinja2 import Environment, Template, meta
+from jinja2.exceptions import TemplateError
+
+try:
+    from .escritor_docx import MembrosZip, salvar_pacote
+    from .plano_render import compilar as compilar_plano
+except ImportError:
+    from escritor_docx import MembrosZip, salvar_pacote
+    from plano_render import compilar as compilar_plano
+
+
+PLANO_RENDER = os.environ.get('PROPOSAL_RENDER_PLAN', '1') != '0'
+
+# Partes XML que a renderização altera; as demais partes XML conhecidas pelo python-docx
+# ficam como bytes no caminho rápido
+TIPOS_RENDERIZADOS = frozenset((
+    CT.WML_DOCUMENT_MAIN, CT.WML_HEADER, CT.WML_FOOTER, CT.OPC_CORE_PROPERTIES,
+))
+
+# <w:t> com caractere que DocxTemplate.resolve_listing converte (o conteúdo de <w:t>
+# não tem '<': é texto escapado)
+_TEXTO_COM_LISTAGEM = re.compile(r'<w:t(?: [^>]*)?>[^<]*[\t\a\n\f]')
+
+PROPRIEDADES = ('author', 'comments', 'identifier', 'language', 'subject', 'title')
+
+
+def _fabrica_partes(partname, content_type, reltype, blob, package):
+    """PartFactory que não faz parse das partes XML fora de TIPOS_RENDERIZADOS"""
+    if content_type in PartFactory.part_type_for and content_type not in TIPOS_RENDERIZADOS:
+        return Part.load(partname, content_type, blob, package)
+    return PartFactory(partname, content_type, reltype, blob, package)
+
+
+class TemplateCompilado:
+    """Template DOCX pré-processado e compilado, compartilhado entre renderizações"""
+
+    def __init__(self, conteudo, digest):
+        """
+        Pré-processa o template (patch_xml do docxtpl) e compila os planos de
+        renderização (os templates Jinja2 só são compilados quando usados)
+
+        Args:
+            conteudo (bytes): Bytes do arquivo .docx
+            digest (str): Hash SHA-256 do conteúdo
+        """
+        self.conteudo = conteudo
+        self.digest = digest
+        self._variaveis = None
+        self._templates = {}  # None (corpo) ou relKey -> Template
+
+        tpl = DocxTemplate(io.BytesIO(conteudo))
+        tpl.init_docx()
+
+        # Corpo do documento
+        self.xml_corpo, self.plano_corpo = self._preparar_xml(tpl, tpl.get_xml())
+
+        # Cabeçalhos e rodapés: relKey -> (xml, encoding, plano)
+        self.partes = {}
+        for uri in (DocxTemplate.HEADER_URI, DocxTemplate.FOOTER_URI):
+            for rel_key, part in tpl.get_headers_footers(uri):
+                xml = tpl.get_part_xml(part)
+                encoding = tpl.get_headers_footers_encoding(xml)
+                xml, plano = self._preparar_xml(tpl, xml)
+                self.partes[rel_key] = (xml, encoding, plano)
+
+        # SHA-1 das imagens do template (midia_docx não precisa re-hasheá-las por documento)
+        self.sha1_imagens = {
+            str(parte.partname): parte.sha1 for parte in tpl.docx.part.package.image_parts
+        }
+
+        # Propriedades do documento também são renderizadas pelo docxtpl (render_properties)
+        props = tpl.docx.core_properties
+        self.propriedades = [getattr(props, nome) or '' for nome in PROPRIEDADES]
+        self.planos_propriedades = [
+            compilar_plano(fonte) if PLANO_RENDER else None for fonte in self.propriedades
+        ]
+
+        # Membros do zip para o save copiar os que não mudarem (escritor_docx)
+        leitor = PackageReader.from_file(io.BytesIO(conteudo))
+        self.membros = MembrosZip(
+            conteudo, {s.partname.membername: s.blob for s in leitor._sparts}
+        )
+
+        # Partes serializadas para o caminho rápido, com o corpo do template vazio
+        self.leitor = None
+        if self.plano_corpo is not None:
+            documento = tpl.docx.element
+            documento.body.clear()
+            principal = tpl.docx.part.partname
+            partes = tuple(
+                _SerializedPart(s.partname, s.content_type, s.reltype,
+                                serialize_part_xml(documento), s.srels)
+                if s.partname == principal else s
+                for s in leitor._sparts
+            )
+            self.leitor = PackageReader(None, leitor._pkg_srels, partes)
+
+    @property
+    def variaveis(self):
+        """
+        Nomes de nível raiz que o template lê do contexto (corpo, cabeçalhos, rodapés
+        e propriedades), obtidos dos planos ou do AST Jinja2 na primeira consulta
+
+        Returns:
+            frozenset: Nomes das variáveis
+        """
+        if self._variaveis is None:
+            env = Environment()
+            fontes = [
+                (self.xml_corpo, self.plano_corpo),
+                *((xml, plano) for xml, _, plano in self.partes.values()),
+                *zip(self.propriedades, self.planos_propriedades),
+            ]
+            nomes = set()
+            for fonte, plano in fontes:
+                if plano is not None:
+                    nomes |= plano.variaveis
+                else:
+                    nomes |= meta.find_undeclared_variables(env.parse(fonte))
+            self._variaveis = frozenset(nomes)
+        return self._variaveis
+
+    def template(self, rel_key=None):
+        """Template Jinja2 do corpo (rel_key None) ou de um cabeçalho/rodapé, compilado no 1º uso"""
+        template = self._templates.get(rel_key)
+        if template is None:
+            xml = self.xml_corpo if rel_key is None else self.partes[rel_key][0]
+            template = self._templates[rel_key] = Template(xml)
+        return template
+
+    def abrir_documento(self):
+        """
+        Document do caminho rápido: partes já lidas do zip, corpo vazio e partes XML
+        não renderizadas sem parse
+
+        Returns:
+            Document | None: None se o corpo não tiver plano de renderização
+        """
+        if self.leitor is None:
+            return None
+        pacote = Package()
+        Unmarshaller.unmarshal(self.leitor, pacote, _fabrica_partes)
+        return pacote.main_document_part.document
+
+    @staticmethod
+    def _preparar_xml(tpl, xml):
+        """
+        Aplica o mesmo pré-processamento de DocxTemplate.render_xml_part antes do Jinja2
+
+        Returns:
+            tuple: (xml para o Jinja2, PlanoRender ou None)
+        """
+        xml = tpl.patch_xml(xml)
+        plano = compilar_plano(xml) if PLANO_RENDER else None
+        return re.sub(r'<w:p([ >])', r'\n<w:p\1', xml), plano
+
+
+class DocxTemplateCompilado(DocxTemplate):
+    """
+    DocxTemplate que reaproveita um TemplateCompilado
+
+    Mantém a API do DocxTemplate (render, save, InlineImage...), mas pula a leitura do
+    disco, o patch do XML e a compilação Jinja2, e usa os planos de renderização onde
+    existirem. Se um jinja_env customizado for passado ao render, volta ao fluxo
+    padrão do docxtpl.
+    """
+
+    def __init__(self, compilado):
+        super().__init__(io.BytesIO(compilado.conteudo))
+        self.compilado = compilado
+
+    def init_docx(self, reload=True):
+        if not self.docx or (self.is_rendered and reload):
+            self.docx = self.compilado.abrir_documento()
+            if self.docx is None:
+                self.docx = Document(io.BytesIO(self.compilado.conteudo))
+            self.is_rendered = False
+
+    def render(self, context, jinja_env=None, autoescape=False):
+        if (jinja_env or autoescape) and self.compilado.leitor is not None:
+            # O fluxo padrão lê o corpo do template: documento completo
+            self.docx = Document(io.BytesIO(self.compilado.conteudo))
+            self.is_rendered = False
+        super().render(context, jinja_env, autoescape)
+
+    def save(self, filename, *args, **kwargs):
+        substituicoes = (self.pics_to_replace or self.crc_to_new_media
+                         or self.crc_to_new_embedded or self.zipname_to_replace)
+        if not self.is_rendered or substituicoes or args or kwargs:
+            return super().save(filename, *args, **kwargs)
+        # Membros inalterados saem copiados do zip do template (escritor_docx)
+        salvar_pacote(self.docx.part.package, filename, self.compilado.membros)
+        self.is_saved = True
+
+    def build_xml(self, context, jinja_env=None):
+        if jinja_env:
+            return super().build_xml(context, jinja_env)
+        return self._renderizar_parte(None, self.docx._part, context)
+
+    def build_headers_footers_xml(self, context, uri, jinja_env=None):
+        for rel_key, part in self.get_headers_footers(uri):
+            if jinja_env or rel_key not in self.compilado.partes:
+                xml = self.get_part_xml(part)
+                encoding = self.get_headers_footers_encoding(xml)
+                xml = self.patch_xml(xml)
+                xml = self.render_xml_part(xml, part, context, jinja_env)
+            else:
+                encoding = self.compilado.partes[rel_key][1]
+                xml = self._renderizar_parte(rel_key, part, context)
+            yield rel_key, xml.encode(encoding)
+
+    def render_properties(self, context, jinja_env=None):
+        if jinja_env:
+            return super().render_properties(context, jinja_env)
+        props = self.docx.core_properties
+        for nome, plano in zip(PROPRIEDADES, self.compilado.planos_propriedades):
+            if plano is not None:
+                setattr(props, nome, plano.renderizar(context))
+            else:
+                setattr(props, nome, Environment().from_string(getattr(props, nome)).render(context))
+
+    def _renderizar_parte(self, rel_key, part, context):
+        """Equivalente a DocxTemplate.render_xml_part com o plano ou o template já compilado"""
+        if rel_key is None:
+            src_xml, plano = self.compilado.xml_corpo, self.compilado.plano_corpo
+        else:
+            src_xml, _, plano = self.compilado.partes[rel_key]
+        self.current_rendering_part = part
+
+        if plano is not None:
+            dst_xml = plano.renderizar(context)
+            # Sem as quebras que _preparar_xml insere para o Jinja2: o re.sub abaixo só
+            # tem o que fazer se algum valor trouxer '\n<w:p'
+            if '\n' in dst_xml:
+                dst_xml = re.sub(r'\n<w:p([ >])', r'<w:p\1', dst_xml)
+        else:
+            try:
+                dst_xml = self.compilado.template(rel_key).render(context)
+            except TemplateError as exc:
+                if hasattr(exc, 'lineno') and exc.lineno is not None:
+                    line_number = max(exc.lineno - 4, 0)
+                    exc.docx_context = map(lambda x: re.sub(r'<[^>]+>', '', x),
+                                           src_xml.splitlines()[line_number:(line_number + 7)])
+                raise exc
+            dst_xml = re.sub(r'\n<w:p([ >])', r'<w:p\1', dst_xml)
+        dst_xml = (dst_xml
+                   .replace('{_{', '{{')
+                   .replace('}_}', '}}')
+                   .replace('{_%', '{%')
+                   .replace('%_}', '%}'))
+        # resolve_listing só altera \t, \a, \n e \f dentro de <w:t> (o <wp:inline> das
+        # imagens traz quebras de linha fora deles)
+        if _TEXTO_COM_LISTAGEM.search(dst_xml) is None:
+            return dst_xml
+        return self.resolve_listing(dst_xml)
+
+
+class CacheTemplates:
+    """Cache LRU de templates compilados, indexado pelo hash do conteúdo"""
+
+    def __init__(self, capacidade=16):
+        """
+        Args:
+            capacidade (int): Número máximo de templates compilados em memória
+        """
+        self.capacidade = capacidade
+        self._compilados = OrderedDict()  # digest -> TemplateCompilado
+        self._digests = {}  # (caminho, mtime_ns, tamanho) -> digest
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def obter(self, template_path):
+        """
+        Retorna um DocxTemplate pronto para renderizar, compilando o template se necessário
+
+        Args:
+            template_path (str): Caminho do arquivo .docx
+
+        Returns:
+            DocxTemplateCompilado: Cópia independente para uma renderização
+        """
+        stat = os.stat(template_path)
+        chave_arquivo = (os.path.realpath(template_path), stat.st_mtime_ns, stat.st_size)
+
+        with self._lock:
+            digest = self._digests.get(chave_arquivo)
+            compilado = self._compilados.get(digest) if digest else None
+            if compilado is not None:
+                self._compilados.move_to_end(digest)
+                self.hits += 1
+                return DocxTemplateCompilado(compilado)
+
+        with open(template_path, 'rb') as f:
+            conteudo = f.read()
+        digest = hashlib.sha256(conteudo).hexdigest()
+
+        with self._lock:
+            compilado = self._compilados.get(digest)
+            if compilado is not None:
+                self.hits += 1
+            else:
+                self.misses += 1
+                compilado = TemplateCompilado(conteudo, digest)
+                self._compilados[digest] = compilado
+            self._compilados.move_to_end(digest)
+            self._digests[chave_arquivo] = digest
+
+            while len(self._compilados) > self.capacidade:
+                antigo, _ = self._compilados.popitem(last=False)
+                self._digests = {k: v for k, v in self._digests.items() if v != antigo}
+
+            # Arquivos temporários do backend mudam de nome a cada proposta
+            if len(self._digests) > self.capacidade * 8:
+                self._digests = {chave_arquivo: digest}
+
+        return DocxTemplateCompilado(compilado)
+
+    def limpar(self):
+        """Descarta todos os templates compilados"""
+        with self._lock:
+            self._compilados.clear()
+            self._digests.clear()
+
+
+cache_templates = CacheTemplates(
+    capacidade=int(os.environ.get('PROPOSAL_TEMPLATE_CACHE_SIZE', '16'))
+)
@@ -0,0 +1,339 @@
+"""
+Introspecção de templates DOCX (variáveis, loops e imagens Jinja2)
+
+Lê as partes XML com texto do .docx (corpo, cabeçalhos, rodapés, notas de rodapé e
+de fim; caixas de texto vêm dentro dessas partes) direto do zip, com iterparse do
+lxml: cada parágrafo é remontado a partir dos seus <w:t> assim que termina e
+descartado em seguida, então o uso de memória não cresce com o tamanho do template.
+Como o texto é juntado por parágrafo, tags quebradas pelo Word em vários runs
+({{ NOME_<w:t>CLIENTE }}) são reconhecidas na mesma passada. As propriedades do
+documento (docProps/core.xml: título, assunto...), que o docxtpl também renderiza, são
+lidas como parágrafos da parte 'docProps/core.xml'.
+
+A leitura é por parágrafo, então uma tag que atravessa parágrafos ({% if X no fim de
+um, %} no início do outro, que o docxtpl junta) não é reconhecida: o resultado serve
+para mostrar o template ao usuário; a lista exata de variáveis de nível raiz vem do
+AST Jinja2 (template_cache.TemplateCompilado.variaveis, usado por template_schema).
+
+Uso:
+    for evento in iterar_tags('template.docx'):
+        print(evento)  # {'tipo': 'variavel', 'nome': 'NOME_CLIENTE', 'parte': 'word/document.xml'}
+
+    resultado = introspectar('template.docx')
+    resultado.variaveis_simples   # ['NOME_CLIENTE', ...]
+    resultado.loops['fluxo']      # {'item': 'f', 'loop': 'tr', 'campos': {...}, 'partes': {...}}
+"""
+
+import re
+import zipfile
+
+from lxml import etree
+
+
+NS_W = 'http://schemas.openxmlformats.org/wordprocessingml/2006/main'
+NS_MC = 'http://schemas.openxmlformats.org/markup-compatibility/2006'
+
+TAG_P = f'{{{NS_W}}}p'
+TAG_T = f'{{{NS_W}}}t'
+TAG_INSTR = f'{{{NS_W}}}instrText'
+TAG_FLD_SIMPLE = f'{{{NS_W}}}fldSimple'
+ATTR_INSTR = f'{{{NS_W}}}instr'
+TAG_FALLBACK = f'{{{NS_MC}}}Fallback'
+
+# Propriedades do documento renderizadas pelo docxtpl (render_properties: author,
+# comments, identifier, language, subject, title), pelo nome do elemento em core.xml
+PARTE_PROPRIEDADES = 'docProps/core.xml'
+NS_DC = 'http://purl.org/dc/elements/1.1/'
+TAGS_PROPRIEDADES = frozenset(f'{{{NS_DC}}}{nome}' for nome in
+                              ('creator', 'description', 'identifier', 'language', 'subject', 'title'))
+
+# Partes do pacote que podem conter texto do template
+PARTES_TEXTO = re.compile(r'^word/(document|header\d*|footer\d*|footnotes|endnotes)\.xml$')
+
+# Gráficos gerados pelo backend (InlineImage)
+IMAGENS_CONHECIDAS = frozenset({
+    'grafico_retorno', 'grafico_comparativo', 'grafico_geracao', 'grafico_economia'
+})
+
+_TAG_JINJA = re.compile(r'\{\{(.*?)\}\}|\{%(.*?)%\}', re.S)
+# Prefixos especiais do docxtpl: {%tr %}, {%tc %}, {%p %}, {{r }}, ...
+_PREFIXO_DOCXTPL = re.compile(r'^(tr|tc|p|r)\s+')
+_CAMINHO = re.compile(r'[A-Za-z_]\w*(?:\.[A-Za-z_]\w*)*')
+_FOR = re.compile(r'^for\s+([A-Za-z_]\w*)(?:\s*,\s*[A-Za-z_]\w*)*\s+in\s+(.+?)\s*$')
+_MERGEFIELD = re.compile(r'MERGEFIELD\s+"?([^\s"\\]+)')
+_ENDFOR = re.compile(r'^endfor\b')
+_CONDICAO = re.compile(r'^(?:if|elif|set\s+(\w+)\s*=)\s*(.*)$', re.S)
+_STRINGS = re.compile(r'"[^"]*"|\'[^\']*\'')
+_TESTE_IS = re.compile(r'\bis\s*$')
+
+_PALAVRAS_JINJA = frozenset({
+    'and', 'or', 'not', 'in', 'is', 'if', 'else', 'true', 'false', 'none',
+    'True', 'False', 'None', 'loop', 'defined', 'undefined',
+    # Globais do ambiente Jinja2 (não vêm do contexto)
+    'range', 'dict', 'lipsum', 'cycler', 'joiner', 'namespace',
+})
+
+
+def partes_texto(zf):
+    """Nomes das partes XML com texto do template, corpo primeiro"""
+    nomes = [nome for nome in zf.namelist() if PARTES_TEXTO.match(nome)]
+    return sorted(nomes, key=lambda nome: (nome != 'word/document.xml', nome))
+
+
+def iterar_propriedades(stream):
+    """
+    Texto de cada propriedade do documento (docProps/core.xml)
+
+    Yields:
+        tuple: ('texto', str), no formato de iterar_paragrafos
+    """
+    raiz = etree.parse(stream).getroot()
+    for elem in raiz:
+        if elem.tag in TAGS_PROPRIEDADES and elem.text and elem.text.strip():
+            yield 'texto', elem.text
+
+
+def iterar_paragrafos(stream):
+    """
+    Texto de cada parágrafo de uma parte XML, na ordem do documento
+
+    Parágrafos de caixas de texto saem como parágrafos próprios; o conteúdo
+    duplicado em mc:Fallback (versão VML das caixas de texto) é ignorado.
+
+    Yields:
+        tuple: ('texto', str) para cada parágrafo ou ('campo', instr) para campos do Word
+    """
+    pilha = []
+    dentro_fallback = 0
+
+    for evento, elem in etree.iterparse(stream, events=('start', 'end'), huge_tree=True):
+        tag = elem.tag
+
+        if evento == 'start':
+            if tag == TAG_FALLBACK:
+                dentro_fallback += 1
+            elif tag == TAG_P and not dentro_fallback:
+                pilha.append([])
+            continue
+
+        if tag == TAG_FALLBACK:
+            dentro_fallback -= 1
+            elem.clear()
+        elif dentro_fallback:
+            continue
+        elif tag == TAG_T:
+            if pilha and elem.text:
+                pilha[-1].append(elem.text)
+        elif tag == TAG_INSTR:
+            if elem.text:
+                yield 'campo', elem.text
+        elif tag == TAG_FLD_SIMPLE:
+            yield 'campo', elem.get(ATTR_INSTR, '')
+        elif tag == TAG_P and pilha:
+            texto = ''.join(pilha.pop())
+            if texto:
+                yield 'texto', texto
+            if not pilha:
+                # Parágrafo externo já consumido: liberar memória
+                elem.clear()
+                while elem.getprevious() is not None:
+                    del elem.getparent()[0]
+
+
+class _Escopo:
+    """Loops abertos ({% for %}) e variáveis locais ({% set %}) enquanto uma parte é lida"""
+
+    def __init__(self):
+        self.loops = []  # (item, colecao)
+        self.locais = set()
+
+    def item(self, nome):
+        for item, colecao in reversed(self.loops):
+            if item == nome:
+                return colecao
+        return None
+
+
+def _nomes_expressao(expressao):
+    """Caminhos (a.b.c) referenciados em uma expressão Jinja, sem literais e palavras-chave"""
+    sem_strings = _STRINGS.sub(' ', expressao)
+    for match in _CAMINHO.finditer(sem_strings):
+        inicio = match.start()
+        # Ignorar atributos de resultados de chamadas/índices e nomes de filtros/testes
+        anterior = sem_strings[:inicio].rstrip()
+        if anterior.endswith(('.', '|')) or _TESTE_IS.search(anterior):
+            continue
+        # Argumentos nomeados de filtros/chamadas: round(2, method='floor')
+        posterior = sem_strings[match.end():].lstrip()
+        if posterior.startswith('=') and not posterior.startswith('=='):
+            continue
+        caminho = match.group(0)
+        if caminho.split('.')[0] not in _PALAVRAS_JINJA:
+            yield caminho
+
+
+def _eventos_tag(expressao, bloco, escopo, parte, imagens):
+    # Controle de espaços do Jinja2: {%- ... -%}, {{- ... -}}
+    expressao = expressao.strip().strip('-+').strip()
+    prefixo = _PREFIXO_DOCXTPL.match(expressao)
+    expressao = _PREFIXO_DOCXTPL.sub('', expressao)
+
+    if bloco:
+        tipo_loop = prefixo.group(1) if prefixo else None
+        match_for = _FOR.match(expressao)
+        if match_for:
+            item, origem = match_for.groups()
+            # Coleção vazia ('') para iteráveis que não vêm do contexto: range(3)
+            colecao = next(_nomes_expressao(origem), '')
+            escopo.loops.append((item, colecao))
+            if not colecao:
+                return
+            yield {'tipo': 'loop', 'nome': colecao, 'item': item,
+                   'loop': tipo_loop or 'for', 'parte': parte}
+            return
+        if _ENDFOR.match(expressao):
+            if escopo.loops:
+                escopo.loops.pop()
+            return
+        match_cond = _CONDICAO.match(expressao)
+        if not match_cond:
+            return
+        local, expressao = match_cond.groups()
+        if local:
+            escopo.locais.add(local)
+
+    for caminho in _nomes_expressao(expressao):
+        raiz, _, resto = caminho.partition('.')
+        if raiz in escopo.locais:
+            continue
+        colecao = escopo.item(raiz)
+        if colecao is not None:
+            if resto and colecao:
+                yield {'tipo': 'campo_loop', 'nome': resto.split('.')[0], 'loop': colecao,
+                       'parte': parte}
+        elif raiz in imagens:
+            yield {'tipo': 'imagem', 'nome': raiz, 'parte': parte}
+        else:
+            yield {'tipo': 'variavel', 'nome': caminho, 'parte': parte}
+
+
+def iterar_tags(template_path, imagens=IMAGENS_CONHECIDAS):
+    """
+    Percorre o template emitindo um evento por tag Jinja2 encontrada
+
+    Args:
+        template_path (str): Caminho do .docx (ou file-like)
+        imagens (set): Nomes de variáveis que são imagens (InlineImage)
+
+    Yields:
+        dict: Evento com 'tipo' ('variavel', 'loop', 'campo_loop', 'imagem' ou
+            'campo_word'), 'nome' e 'parte'; loops trazem 'item' e 'loop'
+            (tr, tc, p ou for) e campos de loop trazem 'loop' (nome da coleção)
+    """
+    with zipfile.ZipFile(template_path) as zf:
+        partes = partes_texto(zf)
+        if PARTE_PROPRIEDADES in zf.namelist():
+            partes.append(PARTE_PROPRIEDADES)
+        for parte in partes:
+            escopo = _Escopo()
+            leitor = iterar_propriedades if parte == PARTE_PROPRIEDADES else iterar_paragrafos
+            with zf.open(parte) as stream:
+                for tipo, conteudo in leitor(stream):
+                    if tipo == 'campo':
+                        match = _MERGEFIELD.search(conteudo)
+                        if match:
+                            yield {'tipo': 'campo_word', 'nome': match.group(1), 'parte': parte}
+                        continue
+                    for match in _TAG_JINJA.finditer(conteudo):
+                        variavel, bloco = match.groups()
+                        yield from _eventos_tag(
+                            bloco if bloco is not None else variavel,
+                            bloco, escopo, parte, imagens
+                        )
+
+
+def texto_paragrafos(template_path):
+    """
+    Texto de todos os parágrafos, parte por parte (runs já reunidos)
+
+    Yields:
+        tuple: (parte, texto do parágrafo)
+    """
+    with zipfile.ZipFile(template_path) as zf:
+        for parte in partes_texto(zf):
+            with zf.open(parte) as stream:
+                for tipo, texto in iterar_paragrafos(stream):
+                    if tipo == 'texto':
+                        yield parte, texto
+
+
+class ResultadoIntrospeccao:
+    """Agregado dos eventos de iterar_tags"""
+
+    def __init__(self):
+        self.variaveis = {}  # nome -> set de partes
+        self.loops = {}  # coleção -> {'item', 'loop', 'campos', 'partes'}
+        self.imagens = {}  # nome -> set de partes
+        self.campos_word = set()
+        self.partes = set()
+
+    def adicionar(self, evento):
+        nome, parte = evento['nome'], evento['parte']
+        self.partes.add(parte)
+        tipo = evento['tipo']
+        if tipo == 'variavel':
+            self.variaveis.setdefault(nome, set()).add(parte)
+        elif tipo == 'imagem':
+            self.imagens.setdefault(nome, set()).add(parte)
+        elif tipo == 'campo_word':
+            self.campos_word.add(nome)
+        else:
+            colecao = nome if tipo == 'loop' else evento['loop']
+            loop = self.loops.setdefault(
+                colecao, {'item': evento.get('item'), 'loop': evento.get('loop'),
+                          'campos': set(), 'partes': set()}
+            )
+            loop['partes'].add(parte)
+            if tipo == 'campo_loop':
+                loop['campos'].add(nome)
+
+    @property
+    def variaveis_simples(self):
+        """Variáveis de nível raiz ({{ NOME }}), sem atributos e sem coleções de loop"""
+        return sorted(
+            nome for nome in self.variaveis if '.' not in nome and nome not in self.loops
+        )
+
+    def para_dict(self):
+        return {
+            'variables': {nome: sorted(partes) for nome, partes in sorted(self.variaveis.items())},
+            'loops': {
+                colecao: {
+                    'item': loop['item'],
+                    'loop': loop['loop'],
+                    'fields': sorted(loop['campos']),
+                    'parts': sorted(loop['partes']),
+                }
+                for colecao, loop in sorted(self.loops.items())
+            },
+            'images': {nome: sorted(partes) for nome, partes in sorted(self.imagens.items())},
+            'word_fields': sorted(self.campos_word),
+            'parts': sorted(self.partes),
+        }
+
+
+def introspectar(template_path, imagens=IMAGENS_CONHECIDAS):
+    """
+    Analisa o template inteiro em uma passada
+
+    Args:
+        template_path (str): Caminho do .docx (ou file-like)
+        imagens (set): Nomes de variáveis que são imagens
+
+    Returns:
+        ResultadoIntrospeccao
+    """
+    resultado = ResultadoIntrospeccao()
+    for evento in iterar_tags(template_path, imagens):
+        resultado.adicionar(evento)
+    return resultado
@@ -0,0 +1,244 @@
+"""
+Índice (schema) das variáveis de um template DOCX
+
+Calculado uma vez por versão do template, no upload, e gravado ao lado dele como
+<template>.schema.json. Na geração o schema permite validar e podar o contexto em
+O(chaves), sem abrir o DOCX de novo:
+
+    {
+      "schema_version": 1,
+      "content_hash": "<sha256 do .docx>",
+      "simple_keys": ["NOME_CLIENTE", "VAL_INVEST"],
+      "dynamic_tables": {"fluxo": ["ano", "eco_ac"]},
+      "images_to_generate": ["grafico_retorno"],
+      "root_keys": ["NOME_CLIENTE", "VAL_INVEST", "fluxo", "grafico_retorno"]
+    }
+
+As chaves seguem o formato de TemplateAnalyzer.analyze() (scripts/analyze_docx_template.py).
+simple_keys, dynamic_tables e images_to_generate vêm da leitura por parágrafo de
+template_introspection e são indicativos (validação e telas do backend Node). root_keys
+são os nomes de nível raiz que o template lê do contexto, exatos: os do AST Jinja2 do
+template compilado (template_cache), somados aos da leitura. O content_hash é o mesmo
+digest usado pelo template_cache, então um schema de outra versão do template é
+descartado.
+
+Na geração com o template compilado em memória, poda e chaves ausentes usam
+compilado.variaveis direto; o schema só é usado sem o cache de templates.
+"""
+
+import hashlib
+import json
+import os
+import sys
+
+try:
+    from . import protocolo
+except ImportError:
+    import protocolo
+
+
+SCHEMA_VERSION = 1
+SUFIXO_SCHEMA = '.schema.json'
+
+
+def caminho_schema(template_path):
+    """Caminho do schema gravado ao lado do template (proposta.docx -> proposta.schema.json)"""
+    base, _ = os.path.splitext(template_path)
+    return base + SUFIXO_SCHEMA
+
+
+def hash_conteudo(template_path):
+    """SHA-256 do arquivo, lido em blocos"""
+    sha = hashlib.sha256()
+    with open(template_path, 'rb') as f:
+        for bloco in iter(lambda: f.read(1024 * 1024), b''):
+            sha.update(bloco)
+    return sha.hexdigest()
+
+
+def extrair_schema(template_path, imagens=None, digest=None):
+    """
+    Calcula o schema do template (uma passada em streaming pelo DOCX)
+
+    Args:
+        template_path (str): Caminho do .docx
+        imagens (set): Variáveis que são imagens geradas pelo backend
+            (padrão: template_introspection.IMAGENS_CONHECIDAS)
+        digest (str): Hash do conteúdo, se já conhecido
+
+    Returns:
+        dict: Schema no formato descrito no topo do módulo
+    """
+    # Import tardio: a geração só lê schemas prontos e não precisa do lxml
+    try:
+        from .template_introspection import IMAGENS_CONHECIDAS, introspectar
+    except ImportError:
+        from template_introspection import IMAGENS_CONHECIDAS, introspectar
+
+    resultado = introspectar(template_path, IMAGENS_CONHECIDAS if imagens is None else imagens)
+
+    raizes = {nome.split('.')[0] for nome in resultado.variaveis}
+    raizes.update(colecao.split('.')[0] for colecao in resultado.loops)
+    raizes.update(resultado.imagens)
+
+    with open(template_path, 'rb') as f:
+        conteudo = f.read()
+    digest = digest or hashlib.sha256(conteudo).hexdigest()
+    raizes.update(variaveis_jinja(conteudo, digest))
+
+    return {
+        'schema_version': SCHEMA_VERSION,
+        'content_hash': digest,
+        'simple_keys': resultado.variaveis_simples,
+        'dynamic_tables': {
+            colecao: sorted(loop['campos'])
+            for colecao, loop in sorted(resultado.loops.items())
+        },
+        'images_to_generate': sorted(resultado.imagens),
+        'root_keys': sorted(raizes),
+    }
+
+
+def variaveis_jinja(conteudo, digest):
+    """
+    Nomes de nível raiz do AST Jinja2 do template (os mesmos de template_cache na
+    geração); vazio se o template não compilar (a geração reporta o erro)
+    """
+    try:
+        from .template_cache import TemplateCompilado
+    except ImportError:
+        from template_cache import TemplateCompilado
+    from jinja2 import TemplateSyntaxError
+
+    try:
+        return TemplateCompilado(conteudo, digest).variaveis
+    except TemplateSyntaxError:
+        return frozenset()
+
+
+def gravar_schema(template_path, destino=None, schema=None):
+    """
+    Calcula (se necessário) e grava o schema em JSON compacto
+
+    Args:
+        template_path (str): Caminho do .docx
+        destino (str): Arquivo de saída (padrão: caminho_schema(template_path))
+        schema (dict): Schema já calculado
+
+    Returns:
+        tuple: (schema, caminho gravado)
+    """
+    schema = schema or extrair_schema(template_path)
+    destino = destino or caminho_schema(template_path)
+
+    # Grava em arquivo temporário e troca: leitores nunca veem JSON pela metade
+    temporario = f'{destino}.{os.getpid()}.tmp'
+    with open(temporario, 'w', encoding='utf-8') as f:
+        json.dump(schema, f, ensure_ascii=False, separators=(',', ':'))
+    os.replace(temporario, destino)
+    return schema, destino
+
+
+def schema_valido(schema, digest=None):
+    """Confere versão, formato e (se informado) o hash do template"""
+    return (
+        isinstance(schema, dict)
+        and schema.get('schema_version') == SCHEMA_VERSION
+        and isinstance(schema.get('root_keys'), list)
+        and (digest is None or schema.get('content_hash') == digest)
+    )
+
+
+def carregar_schema(template_path, digest=None):
+    """
+    Lê o schema gravado ao lado do template
+
+    Args:
+        template_path (str): Caminho do .docx
+        digest (str): Hash do conteúdo do template (padrão: calculado do arquivo)
+
+    Returns:
+        dict | None: Schema, ou None se não existir, for inválido ou de outra versão do template
+    """
+    try:
+        with open(caminho_schema(template_path), encoding='utf-8') as f:
+            schema = json.load(f)
+    except (OSError, ValueError):
+        return None
+
+    if digest is None:
+        digest = hash_conteudo(template_path)
+    return schema if schema_valido(schema, digest) else None
+
+
+def chaves_ausentes(chaves, contexto):
+    """
+    Chaves de nível raiz usadas pelo template que o contexto não fornece
+
+    Args:
+        chaves: Nomes usados pelo template (compilado.variaveis ou schema['root_keys'])
+        contexto (dict): Contexto montado
+
+    Returns:
+        list: Nomes ausentes, em ordem alfabética
+    """
+    return sorted(chave for chave in chaves if chave not in contexto)
+
+
+def podar_contexto(chaves, contexto):
+    """Contexto apenas com as chaves que o template usa (ver chaves_ausentes)"""
+    return {chave: contexto[chave] for chave in chaves if chave in contexto}
+
+
+def processar_job(params, progresso=None):
+    """
+    Calcula e grava o schema de um template
+
+    Args:
+        params (dict): template_path, schema_path (opcional) e gravar (padrão: True)
+        progresso: Não utilizado (assinatura de protocolo.executar_job)
+
+    Returns:
+        dict: success, schema e schema_path (se gravado)
+    """
+    template_path = params.get('template_path')
+    if not template_path:
+        return {'success': False, 'error': 'Parâmetro obrigatório: template_path'}
+    if not os.path.exists(template_path):
+        return {'success': False, 'error': f'Template não encontrado: {template_path}'}
+
+    schema = extrair_schema(template_path)
+    resultado = {'success': True, 'schema': schema}
+    if params.get('gravar', True):
+        _, resultado['schema_path'] = gravar_schema(
+            template_path, params.get('schema_path'), schema
+        )
+    return resultado
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "--production":
+        """
+        MODO PRODUÇÃO: Recebe JSON via stdin, emite eventos no stdout
+        Chamado pelo backend TypeScript no upload do template
+        """
+        canal = protocolo.abrir_canal()
+        try:
+            params = json.loads(sys.stdin.read() or '{}')
+            resultado = protocolo.executar_job(canal, processar_job, params, params.get('id'))
+            sys.exit(0 if resultado['success'] else 1)
+        except Exception as e:
+            canal.finalizar(protocolo.erro(e))
+            sys.exit(1)
+
+    elif len(sys.argv) > 1:
+        # Uso manual: python template_schema.py template.docx [outro.docx ...]
+        for template in sys.argv[1:]:
+            schema, destino = gravar_schema(template)
+            print(f"✅ {destino}: {len(schema['simple_keys'])} variáveis, "
+                  f"{len(schema['dynamic_tables'])} tabelas, "
+                  f"{len(schema['images_to_generate'])} imagens")
+
+    else:
+        print("Uso: python template_schema.py template.docx [...] | --production")
+        sys.exit(1)
@@ -0,0 +1,12 @@
+"""
+Testes dos módulos do gerador de propostas (pytest)
+
+Os módulos são importados como no worker (python proposal_generator.py), pelo nome,
+com este diretório no sys.path. Rodar a partir de backend/src/services/python:
+    pip install pytest && python -m pytest tests
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,112 @@
+"""Gravação do DOCX copiando membros inalterados: zip válido e partes iguais ao save normal"""
+
+import io
+import zipfile
+
+import docx
+import pytest
+from docxtpl import DocxTemplate
+from PIL import Image
+
+import escritor_docx
+from escritor_docx import MembrosZip, salvar_pacote, substituir_membros
+
+
+CONTEXTO = {'NOME_CLIENTE': 'José da Silva', 'VAL_INVEST': 'R$ 25.000,00'}
+
+
+@pytest.fixture(scope='module')
+def template():
+    """Bytes de um .docx com variáveis, tabela e uma imagem (mídia estática)"""
+    imagem = io.BytesIO()
+    Image.new('RGB', (64, 32), (30, 120, 200)).save(imagem, 'PNG')
+    documento = docx.Document()
+    documento.add_paragraph('Proposta para {{ NOME_CLIENTE }}')
+    documento.add_paragraph('Investimento: {{ VAL_INVEST }}')
+    documento.add_table(rows=2, cols=2).cell(0, 0).text = 'texto fixo'
+    documento.add_picture(io.BytesIO(imagem.getvalue()))
+    saida = io.BytesIO()
+    documento.save(saida)
+    return saida.getvalue()
+
+
+def _renderizado(conteudo):
+    modelo = DocxTemplate(io.BytesIO(conteudo))
+    modelo.render(CONTEXTO)
+    return modelo
+
+
+def _partes(conteudo):
+    with zipfile.ZipFile(io.BytesIO(conteudo)) as arquivo:
+        return {nome: arquivo.read(nome) for nome in arquivo.namelist()}
+
+
+def _salvar(conteudo, nivel=None):
+    destino = io.BytesIO()
+    escritor = salvar_pacote(_renderizado(conteudo).docx.part.package, destino,
+                             MembrosZip(conteudo), nivel)
+    return destino.getvalue(), escritor
+
+
+def test_zip_valido_e_abre_no_python_docx(template):
+    saida, _ = _salvar(template)
+    with zipfile.ZipFile(io.BytesIO(saida)) as arquivo:
+        assert arquivo.testzip() is None
+    textos = [p.text for p in docx.Document(io.BytesIO(saida)).paragraphs]
+    assert 'Proposta para José da Silva' in textos
+
+
+@pytest.mark.parametrize('nivel', [0, 1, 9])
+def test_partes_iguais_ao_save_do_docxtpl(template, nivel):
+    normal = io.BytesIO()
+    _renderizado(template).save(normal)
+    saida, _ = _salvar(template, nivel)
+    assert _partes(saida) == _partes(normal.getvalue())
+
+
+def test_membros_inalterados_sao_copiados(template):
+    saida, escritor = _salvar(template)
+    assert escritor.copiados > 0
+    assert escritor.comprimidos > 0
+    assert escritor.copiados + escritor.comprimidos == len(_partes(saida))
+
+    # A imagem sai com os mesmos bytes comprimidos do template
+    with zipfile.ZipFile(io.BytesIO(template)) as original, \
+            zipfile.ZipFile(io.BytesIO(saida)) as gerado:
+        midia = [nome for nome in original.namelist() if nome.startswith('word/media/')]
+        assert midia
+        for nome in midia:
+            assert gerado.getinfo(nome).compress_size == original.getinfo(nome).compress_size
+            assert gerado.getinfo(nome).CRC == original.getinfo(nome).CRC
+
+
+def test_saida_deterministica(template):
+    assert _salvar(template)[0] == _salvar(template)[0]
+
+
+def test_substituir_membros_com_nome_nao_ascii():
+    origem = io.BytesIO()
+    with zipfile.ZipFile(origem, 'w', zipfile.ZIP_DEFLATED) as arquivo:
+        arquivo.writestr('word/document.xml', '<w:document>antes</w:document>')
+        arquivo.writestr('word/media/gráfico_retorno.png', b'\x89PNG' + bytes(range(256)) * 8)
+        arquivo.writestr('docProps/ação.xml', 'não muda')
+
+    novo = substituir_membros(origem.getvalue(), {'word/document.xml': b'<w:document>depois</w:document>'})
+
+    with zipfile.ZipFile(io.BytesIO(novo)) as arquivo:
+        assert arquivo.testzip() is None
+        assert arquivo.namelist() == ['word/document.xml', 'word/media/gráfico_retorno.png',
+                                      'docProps/ação.xml']
+        assert arquivo.read('word/document.xml') == b'<w:document>depois</w:document>'
+        assert arquivo.read('docProps/ação.xml') == 'não muda'.encode('utf-8')
+    assert _partes(novo)['word/media/gráfico_retorno.png'] == _partes(origem.getvalue())[
+        'word/media/gráfico_retorno.png']
+
+
+@pytest.mark.parametrize('valor', ['10', '-1', 'rapido', ''])
+def test_compressao_invalida_levanta(monkeypatch, template, valor):
+    monkeypatch.setattr(escritor_docx, '_NIVEL_COMPRESSAO', valor)
+    with pytest.raises(RuntimeError, match='PROPOSAL_DOCX_COMPRESSION'):
+        escritor_docx.nivel_compressao()
+    with pytest.raises(RuntimeError, match='PROPOSAL_DOCX_COMPRESSION'):
+        _salvar(template)
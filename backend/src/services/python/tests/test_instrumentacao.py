@@ -0,0 +1,49 @@
+"""Perfis por job: gravados só em diretório privado do usuário"""
+
+import os
+import stat
+
+import pytest
+
+from instrumentacao import Perfilador
+from output_cache import diretorio_privado
+
+
+def test_diretorio_privado_criado_com_0700(tmp_path):
+    destino = tmp_path / 'perfis'
+    assert diretorio_privado(str(destino)) is None
+    assert stat.S_IMODE(os.stat(destino).st_mode) == 0o700
+
+
+@pytest.mark.skipif(not hasattr(os, 'geteuid'), reason='permissões POSIX')
+def test_diretorio_gravavel_por_outros_e_recusado(tmp_path):
+    destino = tmp_path / 'perfis'
+    destino.mkdir()
+    destino.chmod(0o777)
+    assert 'grupo ou outros' in diretorio_privado(str(destino))
+
+
+def test_diretorio_que_e_arquivo_e_recusado(tmp_path):
+    destino = tmp_path / 'perfis'
+    destino.write_text('')
+    assert diretorio_privado(str(destino))
+
+
+@pytest.mark.parametrize('modo, sufixo', [('cprofile', '.prof'), ('tracemalloc', '.tracemalloc.txt')])
+def test_perfil_gravado_em_diretorio_privado(tmp_path, modo, sufixo):
+    with Perfilador(modo, str(tmp_path / 'perfis'), 'job/1') as perfilador:
+        sum(range(1000))
+    assert perfilador.caminho == str(tmp_path / 'perfis' / f'proposta_job_1{sufixo}')
+    assert os.path.getsize(perfilador.caminho) > 0
+
+
+@pytest.mark.skipif(not hasattr(os, 'geteuid'), reason='permissões POSIX')
+def test_perfil_nao_gravado_em_diretorio_compartilhado(tmp_path, capsys):
+    destino = tmp_path / 'perfis'
+    destino.mkdir()
+    destino.chmod(0o777)
+    with Perfilador('cprofile', str(destino), 'job') as perfilador:
+        pass
+    assert perfilador.caminho is None
+    assert os.listdir(destino) == []
+    assert '[instrumentacao] Perfil não gravado' in capsys.readouterr().err
@@ -0,0 +1,89 @@
+"""Indicadores financeiros: TIR, payback, VPL e LCOE sobre o fluxo de caixa"""
+
+import numpy as np
+import pytest
+
+from cash_flow import calcular_fluxo
+from metricas_financeiras import calcular_metricas, payback_meses, tir, vpl
+
+
+def _fluxo(investimento=25000, economia=1142, inflacao=0.05, **kwargs):
+    return calcular_fluxo(valor_investimento=investimento, economia_mensal=economia, tarifa=0.92,
+                          producao_mensal=1500, consumo_mensal=1350, inflacao=inflacao, **kwargs)
+
+
+def _tir_bissecao(fluxo, baixo=-0.99, alto=1000.0):
+    """Raiz do VPL por bisseção (referência independente do Newton)"""
+    for _ in range(200):
+        meio = (baixo + alto) / 2
+        if vpl(fluxo, meio) > 0:
+            baixo = meio
+        else:
+            alto = meio
+    return (baixo + alto) / 2
+
+
+@pytest.mark.parametrize('taxa', [-0.05, 0.0001, 0.08, 0.35, 1.5])
+def test_tir_de_anuidade_em_forma_fechada(taxa):
+    # Economia constante A por 25 anos: investimento = A * (1 - (1 + r)^-25) / r
+    anual = 12 * 1000
+    investimento = anual * (1 - (1 + taxa) ** -25) / taxa
+    fluxo = _fluxo(investimento=investimento, economia=1000, inflacao=0)
+    assert tir(fluxo) == pytest.approx(taxa, abs=1e-9)
+
+
+@pytest.mark.parametrize('investimento, economia', [
+    (25000, 1142), (60000, 1142), (400000, 300), (1000, 5000),
+])
+def test_tir_igual_a_bissecao(investimento, economia):
+    fluxo = _fluxo(investimento, economia)
+    resultado = tir(fluxo)
+    assert resultado == pytest.approx(_tir_bissecao(fluxo), abs=1e-9)
+    assert vpl(fluxo, resultado) == pytest.approx(0, abs=1e-6)
+
+
+def test_payback_exato_na_virada_do_ano():
+    # 1.200/ano sem inflação: 2.400 são cobertos exatamente no fim do ano 2
+    assert payback_meses(_fluxo(investimento=2400, economia=100, inflacao=0)) == 24
+    assert payback_meses(_fluxo(investimento=2401, economia=100, inflacao=0)) == 25
+    assert payback_meses(_fluxo(investimento=2399, economia=100, inflacao=0)) == 24
+
+
+def test_payback_conhecido():
+    assert payback_meses(_fluxo(25000, 1142)) == 22
+    assert payback_meses(_fluxo(60000, 1142)) == 49
+
+
+def test_economia_nula():
+    metricas = calcular_metricas(_fluxo(investimento=25000, economia=0))
+    assert np.isnan(metricas['tir'])
+    assert np.isinf(metricas['payback_meses'])
+    assert metricas['vpl'] == pytest.approx(-25000)
+
+
+def test_investimento_nulo():
+    metricas = calcular_metricas(_fluxo(investimento=0))
+    assert np.isnan(metricas['tir'])
+    assert metricas['payback_meses'] == 0
+    assert metricas['lcoe'] == 0
+
+
+def test_lote_com_um_valor_por_proposta():
+    fluxo = _fluxo(investimento=[25000, 60000], economia=[1142, 1142])
+    assert np.shape(fluxo['eco']) == (2, 25)
+    metricas = calcular_metricas(fluxo)
+    for valores in metricas.values():
+        assert np.shape(valores) == (2,)
+
+    # Cada proposta do lote bate com o cálculo individual
+    for i, investimento in enumerate((25000, 60000)):
+        individual = calcular_metricas(_fluxo(investimento, 1142))
+        for nome, valor in individual.items():
+            assert metricas[nome][i] == pytest.approx(float(valor))
+
+
+def test_lote_com_propostas_invalidas_no_meio():
+    fluxo = _fluxo(investimento=[25000, 0, 25000], economia=[1142, 1142, 0])
+    resultado = tir(fluxo)
+    assert resultado[0] == pytest.approx(0.59814493, abs=1e-6)
+    assert np.isnan(resultado[1:]).all()
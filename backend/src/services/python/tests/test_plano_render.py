@@ -0,0 +1,86 @@
+"""Plano de renderização x Jinja2: mesma saída, mesmos erros, mesma recusa"""
+
+import jinja2
+import pytest
+from docxtpl import DocxTemplate
+from jinja2.exceptions import UndefinedError
+
+from plano_render import compilar
+
+
+def _patch_xml(xml):
+    """Pré-processamento do docxtpl ({% tr %} -> {% for %} em volta da linha)"""
+    return DocxTemplate.patch_xml(object.__new__(DocxTemplate), xml)
+
+
+LINHA_TR = (
+    '<w:tbl>'
+    '<w:tr><w:tc><w:p><w:r><w:t>{%tr for linha in fluxo %}</w:t></w:r></w:p></w:tc></w:tr>'
+    '<w:tr><w:tc><w:p><w:r><w:t>{{ linha.ano }}</w:t></w:r></w:p></w:tc>'
+    '<w:tc><w:p><w:r><w:t>{{ linha.eco }}</w:t></w:r></w:p></w:tc></w:tr>'
+    '<w:tr><w:tc><w:p><w:r><w:t>{%tr endfor %}</w:t></w:r></w:p></w:tc></w:tr>'
+    '</w:tbl>'
+)
+
+CASOS = [
+    ('substituicao', '<w:t>{{ NOME_CLIENTE }} - {{ VAL_INVEST }}</w:t>',
+     {'NOME_CLIENTE': 'Maria', 'VAL_INVEST': 'R$ 25.000,00'}),
+    ('laco_tr', _patch_xml(LINHA_TR),
+     {'fluxo': [{'ano': 1, 'eco': 'R$ 1,00'}, {'ano': 2, 'eco': 'R$ 2,00'}]}),
+    ('laco_tr_vazio', _patch_xml(LINHA_TR), {'fluxo': []}),
+    ('lacos_aninhados',
+     '{% for grupo in grupos %}[{{ grupo.nome }}:{% for item in grupo.itens %}'
+     '{{ item }}{{ grupo.nome }};{% endfor %}]{% endfor %}',
+     {'grupos': [{'nome': 'a', 'itens': [1, 2]}, {'nome': 'b', 'itens': []}]}),
+    ('alvo_sombreia_contexto',
+     '{{ x }}|{% for x in lista %}{{ x }},{% endfor %}|{{ x }}',
+     {'x': 'fora', 'lista': ['d1', 'd2']}),
+    ('variavel_ausente', '<w:t>[{{ AUSENTE }}]</w:t>', {}),
+    ('atributo_de_ausente_em_dict', '{{ dados.inexistente }}', {'dados': {}}),
+    ('item_com_colchetes', "{{ a['b'] }}/{{ a['c'].d }}", {'a': {'b': 'B', 'c': {'d': 'D'}}}),
+    ('atributo_cai_para_item', '{{ a.b }}', {'a': {'b': 'via getitem'}}),
+]
+
+
+@pytest.mark.parametrize('fonte, contexto', [caso[1:] for caso in CASOS],
+                         ids=[caso[0] for caso in CASOS])
+def test_mesma_saida_do_jinja2(fonte, contexto):
+    plano = compilar(fonte)
+    assert plano is not None
+    assert plano.renderizar(contexto) == jinja2.Template(fonte).render(contexto)
+
+
+def test_laco_tr_repete_a_linha():
+    fonte = _patch_xml(LINHA_TR)
+    saida = compilar(fonte).renderizar({'fluxo': [{'ano': 1, 'eco': 'x'}, {'ano': 2, 'eco': 'y'}]})
+    assert saida.count('<w:tr>') == 2
+    assert '{%' not in saida
+
+
+def test_atributo_de_variavel_ausente_levanta_como_jinja2():
+    fonte = '{{ AUSENTE.campo }}'
+    with pytest.raises(UndefinedError):
+        jinja2.Template(fonte).render({})
+    with pytest.raises(UndefinedError):
+        compilar(fonte).renderizar({})
+
+
+def test_variaveis_lidas_do_contexto():
+    plano = compilar('{{ a }}{% for x in lista %}{{ x.v }}{{ b }}{% endfor %}')
+    assert plano.variaveis == frozenset({'a', 'lista', 'b'})
+
+
+@pytest.mark.parametrize('fonte', [
+    '{{ valor | upper }}',
+    '{% if mostrar %}sim{% endif %}',
+    '{% for x in lista %}{{ loop.index }}{% endfor %}',
+    '{% for x in lista %}{{ x }}{% else %}vazio{% endfor %}',
+    '{% set y = 1 %}{{ y }}',
+    '{{ a + b }}',
+    '{{ a[chave] }}',
+    '{% for x in range(3) %}{{ x }}{% endfor %}',
+    '{{ aberto',
+], ids=['filtro', 'if', 'loop_index', 'for_else', 'set', 'expressao', 'item_variavel',
+        'global_range', 'erro_sintaxe'])
+def test_construcoes_nao_suportadas_vao_pelo_jinja2(fonte):
+    assert compilar(fonte) is None
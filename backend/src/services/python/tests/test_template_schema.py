@@ -0,0 +1,70 @@
+"""Schema do template: root_keys iguais às variáveis do AST Jinja2 usadas na geração"""
+
+import io
+
+import docx
+import pytest
+from docxtpl import DocxTemplate
+
+from proposal_generator import GeradorPropostaSolar
+from template_cache import TemplateCompilado
+from template_schema import chaves_ausentes, extrair_schema, gravar_schema, podar_contexto
+
+
+def _template(caminho, paragrafos, titulo=''):
+    documento = docx.Document()
+    for texto in paragrafos:
+        documento.add_paragraph(texto)
+    documento.core_properties.title = titulo
+    documento.save(caminho)
+    return str(caminho)
+
+
+def _variaveis(caminho):
+    with open(caminho, 'rb') as f:
+        return TemplateCompilado(f.read(), 'teste').variaveis
+
+
+CASOS = {
+    'simples': (['Proposta para {{ NOME_CLIENTE }}', '{% for item in itens %}{{ item.nome }}{% endfor %}'], ''),
+    'titulo': (['Cliente: {{ NOME_CLIENTE }}'], 'Proposta {{ NOME_CLIENTE }} {{ TITULO_DOC }}'),
+    'if_entre_paragrafos': (['{{ NOME_CLIENTE }} {% if MOSTRAR', '%}sim{% endif %}'], '{{ TITULO_DOC }}'),
+}
+
+
+@pytest.mark.parametrize('caso', sorted(CASOS))
+def test_root_keys_iguais_ao_ast_jinja(tmp_path, caso):
+    paragrafos, titulo = CASOS[caso]
+    caminho = _template(tmp_path / 'modelo.docx', paragrafos, titulo)
+    assert set(extrair_schema(caminho)['root_keys']) == set(_variaveis(caminho))
+
+
+def test_if_entre_paragrafos_entra_no_schema(tmp_path):
+    caminho = _template(tmp_path / 'modelo.docx', *CASOS['if_entre_paragrafos'])
+    assert extrair_schema(caminho)['root_keys'] == ['MOSTRAR', 'NOME_CLIENTE', 'TITULO_DOC']
+
+
+def test_titulo_e_lido_pela_introspeccao(tmp_path):
+    caminho = _template(tmp_path / 'modelo.docx', ['texto fixo'], 'Proposta {{ NOME_CLIENTE }}')
+    assert 'NOME_CLIENTE' in extrair_schema(caminho)['simple_keys']
+
+
+def test_poda_e_ausentes():
+    contexto = {'NOME_CLIENTE': 'Maria', 'SOBRA': 1}
+    assert podar_contexto(frozenset({'NOME_CLIENTE', 'MOSTRAR'}), contexto) == {'NOME_CLIENTE': 'Maria'}
+    assert chaves_ausentes(['TITULO_DOC', 'NOME_CLIENTE', 'MOSTRAR'], contexto) == ['MOSTRAR', 'TITULO_DOC']
+
+
+@pytest.mark.parametrize('usar_cache', [True, False])
+def test_titulo_renderizado_com_schema_gravado(tmp_path, usar_cache):
+    caminho = _template(tmp_path / 'modelo.docx', ['Cliente: {{ NOME_CLIENTE }}'], 'Proposta {{ NOME_CLIENTE }}')
+    gravar_schema(caminho)
+    gerador = GeradorPropostaSolar(caminho, silent=True, usar_cache=usar_cache)
+    assert gerador.chaves_template() == {'NOME_CLIENTE'}
+
+    contexto = podar_contexto(gerador.chaves_template(), {'NOME_CLIENTE': 'Maria', 'SOBRA': 1})
+    modelo = DocxTemplate(caminho)
+    modelo.render(contexto)
+    saida = io.BytesIO()
+    modelo.save(saida)
+    assert docx.Document(io.BytesIO(saida.getvalue())).core_properties.title == 'Proposta Maria'